@@ -0,0 +1,103 @@
+import time
+
+from botocore.exceptions import ClientError
+
+# How long the daily lookup statistics are kept
+STATS_RETENTION_SECONDS = 90 * 24 * 3600
+
+
+class CacheEntries:
+    """
+    The bookkeeping shared by every kind of entry in the ClipCacheTable
+    (clips, voiceovers and final videos): each entry records its size, its
+    last access and its hit count, which `tools/clip_cache_admin.py` uses to
+    evict entries and report statistics.
+
+    With `ttl_seconds` set, an entry expires once it has not been used for
+    that long (the table's TTL attribute 'expiresAt' is pushed back on every
+    hit). Lookups are counted per day on 'stats#<date>' items, unless
+    `count_lookups` is off (e.g. for the pre-warming job).
+
+    Args:
+        table: A boto3 DynamoDB Table resource keyed on 'promptHash'.
+        ttl_seconds (float): How long an unused entry is kept, 0 for ever.
+        count_lookups (bool): Whether `record` counts lookup outcomes.
+    """
+
+    def __init__(self, table, ttl_seconds=0, clock=time.time, count_lookups=True):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.count_lookups = count_lookups
+
+    def is_live(self, item):
+        """
+        Tells whether an item is a cache entry that has not expired.
+        """
+        if not item or not item.get("s3_uri"):
+            return False
+        return "expiresAt" not in item or int(item["expiresAt"]) > self.clock()
+
+    def _expiry(self, now):
+        return {"expiresAt": now + int(self.ttl_seconds)} if self.ttl_seconds else {}
+
+    def touch(self, key):
+        """
+        Reads an entry and records a hit on it in a single conditional
+        update: its last access and hit count are updated, and its expiry
+        pushed back.
+
+        Returns:
+            dict: The entry, or None if there is none (or it has expired).
+        """
+        now = int(self.clock())
+        update = "SET lastAccessedAt = :now"
+        values = {":now": now, ":one": 1}
+        if self.ttl_seconds:
+            update += ", expiresAt = :expires"
+            values[":expires"] = now + int(self.ttl_seconds)
+        try:
+            return self.table.update_item(
+                Key={"promptHash": key},
+                UpdateExpression=f"{update} ADD hitCount :one",
+                ConditionExpression="attribute_exists(s3_uri) AND (attribute_not_exists(expiresAt) OR expiresAt > :now)",
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW",
+            )["Attributes"]
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+
+    def record(self, outcome):
+        """
+        Counts a lookup outcome (e.g. 'hits', 'misses' or 'renderHits') on
+        today's statistics item. Failures are only logged.
+        """
+        if not self.count_lookups:
+            return
+        now = int(self.clock())
+        try:
+            self.table.update_item(
+                Key={"promptHash": f"stats#{time.strftime('%Y-%m-%d', time.gmtime(now))}"},
+                UpdateExpression="SET expiresAt = :expires ADD #outcome :one",
+                ExpressionAttributeNames={"#outcome": outcome},
+                ExpressionAttributeValues={":expires": now + STATS_RETENTION_SECONDS, ":one": 1},
+            )
+        except Exception as e:
+            print(f"Could not record cache {outcome}: {e}")
+
+    def store(self, entry, size_bytes=None):
+        """
+        Writes a new entry with fresh bookkeeping: created and last accessed
+        now, no hits yet, and the TTL if one is configured.
+
+        Returns:
+            dict: The stored item.
+        """
+        now = int(self.clock())
+        item = {**entry, **self._expiry(now), "createdAt": now, "lastAccessedAt": now, "hitCount": 0}
+        if size_bytes is not None:
+            item["sizeBytes"] = size_bytes
+        self.table.put_item(Item=item)
+        return item
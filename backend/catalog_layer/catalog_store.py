@@ -0,0 +1,200 @@
+"""
+Product catalog lookups shared by the forge and worker functions (deployed
+as the CatalogLayer Lambda layer).
+
+Two backends answer `get(sku)` the same way:
+
+* `DynamoCatalog`: one item per SKU in the ProductCatalogTable, for
+  catalogs of any size. Only the requested SKU is read.
+* `ProductCatalog`: the whole `product_db.json` from S3, kept in memory.
+  Used when no catalog table is configured (local runs, small catalogs).
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+_deserializer = TypeDeserializer()
+
+
+def _from_item(item):
+    """
+    Converts a low-level DynamoDB item into its SKU and normalised entry.
+    """
+    fields = {key: _deserializer.deserialize(value) for key, value in item.items()}
+    sku = fields.pop('sku')
+    return sku, normalize_product(fields)
+
+
+def validate_product(sku, product):
+    """
+    Checks a catalog entry before it is imported.
+
+    Returns:
+        list: The problems found, empty if the entry is valid.
+    """
+    errors = []
+    if not isinstance(sku, str) or not sku.strip():
+        errors.append(f"{sku!r}: the SKU must be a non-empty string")
+    if not isinstance(product, dict):
+        return errors + [f"{sku}: the entry must be an object"]
+    if not isinstance(product.get('productName'), str) or not product['productName'].strip():
+        errors.append(f"{sku}: 'productName' must be a non-empty string")
+    shots = product.get('product_shot_url')
+    shots = [shots] if isinstance(shots, str) else shots
+    if not isinstance(shots, list) or not shots:
+        errors.append(f"{sku}: 'product_shot_url' must be an S3 URI or a non-empty list of them")
+    elif not all(isinstance(uri, str) and uri.startswith('s3://') for uri in shots):
+        errors.append(f"{sku}: every 'product_shot_url' must start with 's3://'")
+    return errors
+
+
+def normalize_product(product):
+    """
+    Brings a catalog entry into its canonical shape: 'product_shot_url' is
+    always a list of 's3://' URIs (some entries store a single string).
+    """
+    product = dict(product)
+    shots = product.get('product_shot_url') or []
+    product['product_shot_url'] = [shots] if isinstance(shots, str) else list(shots)
+    return product
+
+
+class ProductCatalog:
+    """
+    The product database (`product_db.json` in S3), kept in memory for the
+    lifetime of the container and indexed by SKU.
+
+    The file is downloaded on first use. Afterwards it is revalidated at most
+    every `refresh_seconds` with a conditional GET on its ETag, so an
+    unchanged catalog costs a single empty 304 response and no parsing.
+
+    Args:
+        s3_client: A boto3 S3 client.
+        bucket (str): The bucket holding the catalog.
+        key (str): The key of the catalog file.
+        refresh_seconds (float): How long a loaded catalog is trusted without
+                                 revalidating it.
+    """
+
+    def __init__(self, s3_client, bucket, key='product_db.json', refresh_seconds=60.0,
+                 clock=time.monotonic):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.products = None
+        self.etag = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def _refresh(self):
+        request = {'Bucket': self.bucket, 'Key': self.key}
+        if self.etag:
+            request['IfNoneMatch'] = self.etag
+        try:
+            response = self.s3.get_object(**request)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('304', 'NotModified'):
+                raise
+            self.checked_at = self.clock()
+            return
+
+        database = json.loads(response['Body'].read().decode('utf-8'))
+        self.products = {sku: normalize_product(product) for sku, product in database.items()}
+        self.etag = response.get('ETag')
+        self.checked_at = self.clock()
+        print(f"Loaded product catalog with {len(self.products)} SKUs (ETag {self.etag}).")
+
+    def get(self, sku):
+        """
+        Returns the (normalised) catalog entry of a SKU, or None if there is none.
+        """
+        with self.lock:
+            if self.products is None or self.clock() - self.checked_at >= self.refresh_seconds:
+                self._refresh()
+            return self.products.get(sku)
+
+    def items(self):
+        """
+        Returns every (sku, entry) pair of the catalog.
+        """
+        with self.lock:
+            if self.products is None or self.clock() - self.checked_at >= self.refresh_seconds:
+                self._refresh()
+            return list(self.products.items())
+
+
+class DynamoCatalog:
+    """
+    Per-SKU lookups against the catalog table (partition key 'sku').
+
+    Each lookup is a single GetItem, whatever the size of the catalog.
+    Recently used entries are kept in memory for `cache_seconds`, so a warm
+    container answers repeated lookups without a call. Unknown SKUs are
+    remembered too, for the shorter `miss_cache_seconds`, so repeated
+    requests for a SKU that does not exist (rejected by the forge function)
+    do not each cost a read, while a newly imported SKU is found soon. It works on the
+    low-level DynamoDB client, which is cheaper to create than a resource
+    in latency-critical functions.
+
+    Args:
+        client: A boto3 DynamoDB client (e.g. `boto3.client("dynamodb")` or
+                `dynamodb_resource.meta.client`).
+        table_name (str): The name of the catalog table.
+        cache_seconds (float): How long a looked-up entry is reused.
+        miss_cache_seconds (float): How long an unknown SKU stays unknown.
+        max_cached (int): The maximum number of entries (and unknown SKUs)
+                          kept in memory.
+    """
+
+    def __init__(self, client, table_name, cache_seconds=60.0, miss_cache_seconds=10.0, max_cached=1024,
+                 clock=time.monotonic):
+        self.client = client
+        self.table_name = table_name
+        self.cache_seconds = cache_seconds
+        self.miss_cache_seconds = miss_cache_seconds
+        self.max_cached = max_cached
+        self.clock = clock
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, sku):
+        """
+        Returns the (normalised) catalog entry of a SKU, or None if there is none.
+        """
+        with self.lock:
+            cached = self.cache.get(sku)
+            if cached:
+                product, cached_at = cached
+                ttl = self.cache_seconds if product is not None else self.miss_cache_seconds
+                if self.clock() - cached_at < ttl:
+                    self.cache.move_to_end(sku)
+                    return product
+
+        item = self.client.get_item(TableName=self.table_name, Key={'sku': {'S': sku}}).get('Item')
+        product = _from_item(item)[1] if item is not None else None
+        with self.lock:
+            self.cache[sku] = (product, self.clock())
+            self.cache.move_to_end(sku)
+            while len(self.cache) > self.max_cached:
+                self.cache.popitem(last=False)
+        return product
+
+    def items(self):
+        """
+        Scans the whole table and returns every (sku, entry) pair. Meant for
+        building indexes over the catalog, not for per-request lookups.
+        """
+        scan = {'TableName': self.table_name}
+        products = []
+        while True:
+            response = self.client.scan(**scan)
+            products.extend(_from_item(item) for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return products
+            scan['ExclusiveStartKey'] = response['LastEvaluatedKey']
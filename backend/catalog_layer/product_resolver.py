@@ -0,0 +1,143 @@
+import re
+import unicodedata
+from collections import defaultdict
+
+
+def normalize_text(text):
+    """
+    Lower-cases a product name or query and splits it into word tokens.
+    Trademark signs and accents are dropped and joined-up names such as
+    'GalaxyS24Ultra' are split where the case changes.
+
+    Returns:
+        list: The tokens, e.g. ['galaxy', 's24', 'ultra'].
+    """
+    # Drop symbols such as ™ and ® first, NFKD would spell them out as letters
+    text = "".join(ch for ch in str(text) if unicodedata.category(ch) != "So")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"(?<=[a-z])(?=[A-Z])|(?<=[A-Z0-9])(?=[A-Z][a-z])", " ", text)
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def trigrams(compact):
+    """
+    Returns the set of character trigrams of a word, padded at both ends so
+    even one- and two-letter queries have some.
+    """
+    padded = f"  {compact} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PrefixTrie:
+    """
+    A character trie over name tokens. Every node keeps the ids of the
+    entries with a token under it, so a prefix lookup costs O(len(prefix)).
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, token, entry_id):
+        node = self.root
+        for ch in token:
+            node = node.setdefault(ch, {})
+            node.setdefault("$ids", set()).add(entry_id)
+
+    def search(self, prefix):
+        node = self.root
+        for ch in prefix:
+            node = node.get(ch)
+            if node is None:
+                return set()
+        return node.get("$ids", set())
+
+
+class ProductResolver:
+    """
+    Resolves free-text product names ('galaxy s24', 'neo qled tv',
+    'BespokeAIWasher') to catalog SKUs.
+
+    The index is built once from the catalog: a character-trigram inverted
+    index for fuzzy matching (typos, joined-up words) and a prefix trie over
+    the name tokens for partially typed or spoken names. A query touches
+    only the entries sharing a trigram or a token prefix with it.
+
+    Each match is scored by the trigram Dice similarity of the query and the
+    name (spaces removed), plus up to 0.5 for the share of query words that
+    are a prefix of a word in the name. A query that is exactly a SKU scores
+    highest.
+
+    Args:
+        products (iterable): (sku, product entry) pairs.
+    """
+
+    def __init__(self, products):
+        self.entries = []
+        self.by_sku = {}
+        self.trigram_index = defaultdict(set)
+        self.trie = PrefixTrie()
+        for sku, product in products:
+            name = product.get("productName") or sku
+            tokens = normalize_text(name)
+            grams = trigrams("".join(tokens))
+            entry_id = len(self.entries)
+            self.entries.append({"sku": sku, "productName": name, "trigrams": grams})
+            self.by_sku[sku.lower()] = entry_id
+            for gram in grams:
+                self.trigram_index[gram].add(entry_id)
+            for token in tokens + normalize_text(sku):
+                self.trie.add(token, entry_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def resolve(self, query, limit=5, min_score=0.25):
+        """
+        Returns the best matching products for a query.
+
+        Args:
+            query (str): The spoken or typed product name (or a SKU).
+            limit (int): The maximum number of matches.
+            min_score (float): Matches scoring below this are dropped.
+
+        Returns:
+            list: Dicts with 'sku', 'productName' and 'score', best first.
+        """
+        tokens = normalize_text(query)
+        if not tokens:
+            return []
+
+        scores = {}
+        exact = self.by_sku.get(query.strip().lower())
+        if exact is not None:
+            scores[exact] = 2.0
+
+        query_grams = trigrams("".join(tokens))
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for entry_id in self.trigram_index.get(gram, ()):
+                shared[entry_id] += 1
+        prefix_hits = defaultdict(int)
+        for token in tokens:
+            for entry_id in self.trie.search(token):
+                prefix_hits[entry_id] += 1
+
+        for entry_id in set(shared) | set(prefix_hits):
+            entry_grams = self.entries[entry_id]["trigrams"]
+            dice = 2 * shared[entry_id] / (len(query_grams) + len(entry_grams))
+            score = dice + 0.5 * prefix_hits[entry_id] / len(tokens)
+            scores[entry_id] = max(scores.get(entry_id, 0.0), score)
+
+        ranked = sorted(
+            (entry_id for entry_id, score in scores.items() if score >= min_score),
+            key=lambda entry_id: (-scores[entry_id], self.entries[entry_id]["sku"]),
+        )
+        return [
+            {
+                "sku": self.entries[entry_id]["sku"],
+                "productName": self.entries[entry_id]["productName"],
+                "score": round(scores[entry_id], 3),
+            }
+            for entry_id in ranked[:limit]
+        ]
@@ -0,0 +1,96 @@
+import copy
+import hashlib
+import json
+
+from cache_entries import CacheEntries
+
+
+def render_cache_key(fingerprint):
+    """
+    Returns the ClipCacheTable key of the final video of a timeline.
+    """
+    return f"render#{fingerprint}"
+
+
+def render_object_key(fingerprint):
+    """
+    Returns the S3 key the final video of a timeline is stored under.
+    """
+    return f"renders/{fingerprint}.mp4"
+
+
+def timeline_sources(payload):
+    """
+    Returns every asset 'src' of a Shotstack render payload, in track order.
+    """
+    return [
+        clip["asset"]["src"]
+        for track in payload["timeline"]["tracks"]
+        for clip in track["clips"]
+        if "src" in clip.get("asset", {})
+    ]
+
+
+def replace_sources(payload, replacement):
+    """
+    Returns a copy of a render payload with every asset 'src' mapped through
+    `replacement` (a dict or a function).
+    """
+    lookup = replacement.get if isinstance(replacement, dict) else replacement
+    payload = copy.deepcopy(payload)
+    for track in payload["timeline"]["tracks"]:
+        for clip in track["clips"]:
+            if "src" in clip.get("asset", {}):
+                clip["asset"]["src"] = lookup(clip["asset"]["src"])
+    return payload
+
+
+def timeline_fingerprint(payload, content_ids):
+    """
+    Fingerprints what a render produces: the timeline and output settings
+    with every asset replaced by its content id, so the same assets give the
+    same fingerprint however (and whenever) their URLs were presigned. The
+    callback URL is not part of it.
+
+    Args:
+        payload (dict): The Shotstack render payload, with 's3://' sources.
+        content_ids (dict): The content id of every source.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    canonical = replace_sources(payload, content_ids)
+    canonical.pop("callback", None)
+    text = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RenderCache(CacheEntries):
+    """
+    Caches final videos in the ClipCacheTable, under 'render#<fingerprint>'
+    keys, so a job whose timeline is identical to an earlier job's (same
+    clips, voiceover, music and product shots) reuses its video instead of
+    rendering it again. The video itself is copied to
+    'renders/<fingerprint>.mp4', since Shotstack only hosts it for a limited
+    time.
+
+    Entries have the same bookkeeping as clip entries (see
+    `cache_entries.CacheEntries`), so `tools/clip_cache_admin.py` evicts and
+    garbage-collects them too. The worker reads and writes them; the render
+    callback function writes them when it is notified of a finished render.
+    """
+
+    def get(self, fingerprint):
+        """
+        Returns the 's3://' reference of the stored final video (recording
+        the hit), or None.
+        """
+        item = self.touch(render_cache_key(fingerprint))
+        self.record("renderHits" if item else "renderMisses")
+        return item["s3_uri"] if item else None
+
+    def put(self, fingerprint, s3_uri, size_bytes, render_id):
+        """
+        Stores the final video of a newly rendered timeline.
+        """
+        self.store({"promptHash": render_cache_key(fingerprint), "s3_uri": s3_uri, "renderId": render_id}, size_bytes)
@@ -3,14 +3,23 @@ import os
 import boto3
 import uuid
 import time
+from boto3.dynamodb.types import TypeSerializer
+from catalog_store import DynamoCatalog
 
-# Initialize AWS clients
-dynamodb = boto3.resource("dynamodb")
+# Initialize AWS clients once per container, in the init phase. Low-level
+# clients are used because they are cheaper to create than resources,
+# and this endpoint's cold start is felt by every client.
+dynamodb_client = boto3.client("dynamodb")
 lambda_client = boto3.client("lambda")
+serializer = TypeSerializer()
 
 # Get table and function names from environment variables set in template.yaml
 JOBS_TABLE_NAME = os.environ.get("JOBS_TABLE_NAME")
 WORKER_FUNCTION_NAME = os.environ.get("WORKER_FUNCTION_NAME")
+CATALOG_TABLE_NAME = os.environ.get("CATALOG_TABLE_NAME")
+
+# Single-SKU lookups, so unknown products are rejected before a job is created
+catalog = DynamoCatalog(dynamodb_client, CATALOG_TABLE_NAME) if CATALOG_TABLE_NAME else None
 
 
 def lambda_handler(event, context):
@@ -24,7 +33,8 @@ def lambda_handler(event, context):
 
     Args:
         event (dict): API Gateway Lambda Proxy Input Format.
-                      The request body is expected to contain 'sku' and 'user_context'.
+                      The request body is expected to contain 'sku' and 'user_context',
+                      and may set 'fresh' to bypass the blueprint cache.
         context (object): Lambda Context runtime methods and attributes.
 
     Returns:
@@ -35,28 +45,58 @@ def lambda_handler(event, context):
         print("ForgeFunction started...")
         body = json.loads(event.get("body", "{}"))
 
+        sku = body.get("sku")
+        if not isinstance(sku, str) or not sku.strip():
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"message": "'sku' must be a non-empty string."}),
+            }
+
+        if catalog and not catalog.get(sku):
+            print(f"Rejected job for unknown SKU: {body.get('sku')}")
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"message": f"Unknown product SKU '{body.get('sku')}'."}),
+            }
+
+        if not isinstance(body.get("fresh", False), bool):
+            return {
+                "statusCode": 400,
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps({"message": "'fresh' must be true or false."}),
+            }
+
         # Generate a unique ID for this generation job
         job_id = str(uuid.uuid4())
         print(f"Generated new Job ID: {job_id}")
 
         # Store the initial job status and request details in DynamoDB
-        table = dynamodb.Table(JOBS_TABLE_NAME)
-        table.put_item(
-            Item={
-                "jobId": job_id,
-                "status": "PENDING",
-                "requestBody": body,
-                "createdAt": int(time.time()),
-            }
+        item = {
+            "jobId": job_id,
+            "status": "PENDING",
+            "requestBody": body,
+            "createdAt": int(time.time()),
+        }
+        dynamodb_client.put_item(
+            TableName=JOBS_TABLE_NAME,
+            Item={key: serializer.serialize(value) for key, value in item.items()},
         )
         print(f"Job {job_id} saved to DynamoDB with PENDING status.")
 
         # Asynchronously invoke the worker Lambda to do the heavy lifting
-        # We pass only the jobId as the payload
+        # We pass the jobId and the URL Shotstack should notify when the render is done
+        worker_payload = {"jobId": job_id}
+        request_context = event.get("requestContext", {})
+        if request_context.get("domainName") and request_context.get("stage"):
+            worker_payload["callbackUrl"] = (
+                f"https://{request_context['domainName']}/{request_context['stage']}/render-callback"
+            )
         lambda_client.invoke(
             FunctionName=WORKER_FUNCTION_NAME,
             InvocationType="Event",  # 'Event' means invoke asynchronously
-            Payload=json.dumps({"jobId": job_id}),
+            Payload=json.dumps(worker_payload),
         )
         print(f"Successfully invoked worker function for Job ID: {job_id}")
 
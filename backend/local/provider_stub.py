@@ -0,0 +1,168 @@
+"""
+A stand-in for the text-to-video and text-to-speech providers for local
+testing.
+
+It answers the Hugging Face Hub's model lookup, Replicate's synchronous
+predictions (GET /api/models/{model}, POST /v1/models/{owner}/{name}/predictions)
+and ElevenLabs' streaming speech endpoint (POST /v1/text-to-speech/{voice}/stream)
+with small placeholder clips and audio, and OpenRouter's streamed chat
+completions (POST /v1/chat/completions) with a canned blueprint. Every
+generation is recorded, so a run can be checked for what it would have paid
+for.
+
+Usage (from the backend directory):
+
+    python local/provider_stub.py --port 4020
+
+and run the worker with VIDEO_API_URL=http://localhost:4020,
+ELEVENLABS_API_URL=http://localhost:4020/v1 and
+OPENROUTER_API_URL=http://localhost:4020/v1.
+"""
+import argparse
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+BLUEPRINT = {
+    "acts": [
+        {"prompt": "a family watching a big TV in a bright living room"},
+        {"prompt": "a close-up view of the TV remote"},
+        {"prompt": "friends cheering at a cricket match on the TV"},
+    ],
+    "voiceover_script": "Bring the stadium home with the new Samsung TV.",
+    "voice_id": "wlmwDR77ptH6bKHZui0l",
+}
+
+
+class ProviderStub(ThreadingHTTPServer):
+    """
+    The stub server. Keeps every generation request in memory.
+    """
+
+    def __init__(self, address):
+        super().__init__(address, ProviderStubHandler)
+        self.lock = threading.Lock()
+        self.clips = []
+        self.voiceovers = []
+        self.completions = []
+        # Streamed responses (the blueprint and speech) are written in `chunk_size` pieces
+        self.chunk_size = 16
+        # The blueprint streamed back for every completion
+        self.blueprint = BLUEPRINT
+        # When set, the blueprint stream breaks off halfway with this error message
+        self.stream_error = None
+        # Speech is the placeholder audio repeated this many times
+        self.speech_repeat = 1
+        # When set, the connection drops after this many bytes of speech
+        self.speech_break_after = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, requests, request):
+        with self.lock:
+            requests.append(request)
+
+
+def placeholder(kind, text):
+    """
+    Returns placeholder bytes that differ per prompt or script, so
+    content-addressed keys do too.
+    """
+    return f"stub {kind} {hashlib.sha256(text.encode('utf-8')).hexdigest()}".encode("utf-8")
+
+
+class ProviderStubHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_completion(self):
+        """
+        Streams the blueprint as server-sent events, with a keep-alive
+        comment first, like OpenRouter.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        content = json.dumps(self.server.blueprint)
+        pieces = [content[i:i + self.server.chunk_size] for i in range(0, len(content), self.server.chunk_size)]
+        events = [": OPENROUTER PROCESSING"]
+        events += [f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}" for piece in pieces]
+        if self.server.stream_error:
+            events.insert(len(events) // 2, f"data: {json.dumps({'error': {'message': self.server.stream_error}})}")
+        events.append("data: [DONE]")
+        for event in events:
+            self.wfile.write(f"{event}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    def _stream_speech(self, audio):
+        """
+        Sends the audio in pieces, dropping the connection short of its
+        Content-Length when `speech_break_after` is set.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(audio)))
+        self.end_headers()
+        if self.server.speech_break_after is not None:
+            audio = audio[:self.server.speech_break_after]
+        for i in range(0, len(audio), self.server.chunk_size):
+            self.wfile.write(audio[i:i + self.server.chunk_size])
+            self.wfile.flush()
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path.startswith("/api/models/"):
+            return self._send(200, {"inferenceProviderMapping": {
+                "replicate": {"providerId": "stub/text-to-video", "status": "live"},
+            }})
+        if self.path.startswith("/files/"):
+            prompt = bytes.fromhex(self.path.rsplit("/", 1)[-1].removesuffix(".mp4")).decode("utf-8")
+            return self._send(200, placeholder("clip", prompt), "video/mp4")
+        self._send(404, {"message": "Not found"})
+
+    def do_POST(self):
+        body = self._json_body()
+        if self.path.startswith("/v1/models/") and self.path.endswith("/predictions"):
+            prompt = body["input"]["prompt"]
+            self.server.record(self.server.clips, body["input"])
+            clip_url = f"{self.server.base_url}/files/{prompt.encode('utf-8').hex()}.mp4"
+            return self._send(201, {"status": "succeeded", "output": [clip_url]})
+        if self.path.startswith("/v1/text-to-speech/"):
+            voice_id = self.path.split("/")[3]
+            self.server.record(self.server.voiceovers, {"voice_id": voice_id, **body})
+            audio = placeholder("voiceover", f"{voice_id}\n{body['text']}") * self.server.speech_repeat
+            return self._stream_speech(audio)
+        if self.path == "/v1/chat/completions":
+            self.server.record(self.server.completions, body)
+            return self._stream_completion()
+        self._send(404, {"message": "Not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the text-to-video, speech and LLM providers.")
+    parser.add_argument("--port", type=int, default=4020)
+    args = parser.parse_args()
+
+    server = ProviderStub(("127.0.0.1", args.port))
+    print(f"Provider stub listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
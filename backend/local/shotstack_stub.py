@@ -0,0 +1,124 @@
+"""
+A stand-in for the Shotstack render API for local testing.
+
+It accepts renders on POST /v1/render, reports them as 'rendering' on
+GET /v1/render/{id} and, after a short delay, as 'done', with a placeholder
+video served under /v1/renders/{id}.mp4. If the render was
+submitted with a 'callback' URL, the stub posts Shotstack's notification to
+it, just like the real service does.
+
+Usage (from the backend directory):
+
+    python local/shotstack_stub.py --port 4010 --render-seconds 5
+
+and run the worker with SHOTSTACK_API_URL=http://localhost:4010/v1 and
+RENDER_CALLBACK_URL pointing at the local /render-callback endpoint
+(e.g. http://127.0.0.1:3000/render-callback under `sam local start-api`).
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ShotstackStub(ThreadingHTTPServer):
+    """
+    The stub server. Keeps every submitted render in memory.
+    """
+
+    def __init__(self, address, render_seconds=5.0, fail=False):
+        super().__init__(address, ShotstackStubHandler)
+        self.render_seconds = render_seconds
+        self.fail = fail
+        self.renders = {}
+        self.callbacks = []
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def render_status(self, render_id):
+        render = self.renders[render_id]
+        if time.time() - render["submittedAt"] < self.render_seconds:
+            return {"id": render_id, "status": "rendering"}
+        if self.fail:
+            return {"id": render_id, "status": "failed", "error": "Stub render failure."}
+        return {"id": render_id, "status": "done", "url": f"{self.base_url}/renders/{render_id}.mp4"}
+
+    def notify(self, render_id, callback_url):
+        time.sleep(self.render_seconds)
+        notification = {"type": "edit", "action": "render", **self.render_status(render_id)}
+        request = urllib.request.Request(
+            callback_url,
+            data=json.dumps(notification).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                print(f"Callback for render {render_id} answered {response.status}.")
+        except Exception as e:
+            print(f"Callback for render {render_id} failed: {e}")
+        self.callbacks.append((callback_url, notification))
+
+
+class ShotstackStubHandler(BaseHTTPRequestHandler):
+    def _send(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_video(self, render_id):
+        if render_id not in self.server.renders:
+            return self._send(404, {"success": False, "message": "Not found"})
+        data = f"stub video {render_id}".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/render":
+            return self._send(404, {"success": False, "message": "Not found"})
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        render_id = str(uuid.uuid4())
+        self.server.renders[render_id] = {"payload": payload, "submittedAt": time.time()}
+        if payload.get("callback"):
+            threading.Thread(
+                target=self.server.notify, args=(render_id, payload["callback"]), daemon=True
+            ).start()
+        self._send(201, {"success": True, "message": "Created", "response": {"id": render_id}})
+
+    def do_GET(self):
+        if self.path.startswith("/v1/renders/"):
+            return self._send_video(self.path.rsplit("/", 1)[-1].removesuffix(".mp4"))
+        render_id = self.path.rstrip("/").split("/")[-1]
+        if not self.path.startswith("/v1/render/") or render_id not in self.server.renders:
+            return self._send(404, {"success": False, "message": "Not found"})
+        self._send(200, {"success": True, "response": self.server.render_status(render_id)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Shotstack render API.")
+    parser.add_argument("--port", type=int, default=4010)
+    parser.add_argument("--render-seconds", type=float, default=5.0)
+    parser.add_argument("--fail", action="store_true", help="Report every render as failed.")
+    args = parser.parse_args()
+
+    server = ShotstackStub(("127.0.0.1", args.port), args.render_seconds, args.fail)
+    print(f"Shotstack stub listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
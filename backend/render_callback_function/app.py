@@ -0,0 +1,138 @@
+import json
+import os
+import boto3
+import time
+import urllib.request
+
+from render_cache import RenderCache, render_object_key
+
+# Initialize AWS clients
+dynamodb = boto3.resource("dynamodb")
+s3 = boto3.client("s3")
+JOBS_TABLE_NAME = os.environ.get("JOBS_TABLE_NAME")
+# With RENDER_CACHE 'on', finished renders are stored for the WorkerFunction to reuse
+RENDER_CACHE = os.environ.get("RENDER_CACHE", "off")
+CLIP_CACHE_TABLE_NAME = os.environ.get("CLIP_CACHE_TABLE_NAME")
+CLIP_CACHE_TTL_SECONDS = float(os.environ.get("CLIP_CACHE_TTL_SECONDS", "0"))
+PRODUCT_DB_BUCKET = os.environ.get("PRODUCT_DB_BUCKET")
+
+
+class CountingReader:
+    """
+    Counts the bytes read through a file object, so an upload learns its size
+    without a HeadObject (which this function has no permission for).
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def store_render(video_url, fingerprint, render_id):
+    """
+    Copies a finished render to 'renders/<fingerprint>.mp4' and records it
+    under 'render#<fingerprint>' in the clip cache table, the same way the
+    WorkerFunction does when it polls for the render (see `render_cache` in
+    the CatalogLayer).
+    """
+    key = render_object_key(fingerprint)
+    with urllib.request.urlopen(video_url, timeout=20) as response:
+        video = CountingReader(response)
+        s3.upload_fileobj(video, PRODUCT_DB_BUCKET, key, ExtraArgs={"ContentType": "video/mp4"})
+    render_cache = RenderCache(dynamodb.Table(CLIP_CACHE_TABLE_NAME), ttl_seconds=CLIP_CACHE_TTL_SECONDS)
+    render_cache.put(fingerprint, f"s3://{PRODUCT_DB_BUCKET}/{key}", video.bytes_read, render_id)
+    print(f"Stored the final video of timeline {fingerprint[:12]} ({video.bytes_read} bytes).")
+
+
+def lambda_handler(event, context):
+    """
+    Receives Shotstack's render notification and finalises the job.
+
+    The WorkerFunction submits the render with this endpoint as its callback
+    (with the jobId in the query string) and exits instead of polling. When
+    Shotstack calls back, the job is set to COMPLETE with the final video URL,
+    or to FAILED. A failed render's checkpoint is removed so that retrying
+    the job submits a new render. With RENDER_CACHE on, a finished video is
+    then copied to S3 so later jobs with an identical timeline reuse it; a
+    failure to copy it is only logged.
+
+    Args:
+        event (dict): API Gateway Lambda Proxy Input Format.
+                      'queryStringParameters' is expected to contain the 'jobId'
+                      and the body is Shotstack's callback payload.
+        context (object): Lambda Context runtime methods and attributes.
+
+    Returns:
+        dict: An API Gateway Lambda Proxy Output Format object.
+    """
+    try:
+        print("RenderCallbackFunction started...")
+        job_id = (event.get("queryStringParameters") or {}).get("jobId")
+        body = json.loads(event.get("body") or "{}")
+        render_id = body.get("id")
+        status = body.get("status")
+        print(f"Render {render_id} for Job ID {job_id} reported status: {status}")
+
+        if not job_id or not render_id:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "jobId and render id are required."}),
+            }
+
+        table = dynamodb.Table(JOBS_TABLE_NAME)
+        item = table.get_item(Key={"jobId": job_id}).get("Item")
+        # Only accept notifications for the render this job actually submitted
+        if not item or item.get("checkpoints", {}).get("render_submit") != render_id:
+            return {
+                "statusCode": 404,
+                "body": json.dumps({"message": "Render not found for this job."}),
+            }
+
+        if status == "done":
+            print(f"Updating job {job_id} to COMPLETE.")
+            table.update_item(
+                Key={"jobId": job_id},
+                UpdateExpression="SET #s = :status, finalVideoUrl = :url, updatedAt = :time",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":status": "COMPLETE",
+                    ":url": body.get("url"),
+                    ":time": int(time.time()),
+                },
+            )
+            fingerprint = item.get("checkpoints", {}).get("render_fingerprint")
+            if RENDER_CACHE == "on" and CLIP_CACHE_TABLE_NAME and fingerprint:
+                try:
+                    store_render(body.get("url"), fingerprint, render_id)
+                except Exception as e:
+                    print(f"Could not store the final video of render {render_id}: {e}")
+        elif status == "failed":
+            print(f"Shotstack rendering failed: {json.dumps(body)}")
+            table.update_item(
+                Key={"jobId": job_id},
+                UpdateExpression="SET #s = :status, errorMessage = :error, updatedAt = :time REMOVE checkpoints.render_submit",
+                ExpressionAttributeNames={"#s": "status"},
+                ExpressionAttributeValues={
+                    ":status": "FAILED",
+                    ":error": f"Video rendering failed: {body.get('error')}",
+                    ":time": int(time.time()),
+                },
+            )
+
+        return {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps({"jobId": job_id, "status": status}),
+        }
+
+    except Exception as e:
+        print(f"A critical error occurred: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Internal Server Error"}),
+        }
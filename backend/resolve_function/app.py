@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import boto3
+import time
+from catalog_store import DynamoCatalog, ProductCatalog
+from product_resolver import ProductResolver
+
+# Initialize AWS clients
+dynamodb_client = boto3.client("dynamodb")
+s3 = boto3.client("s3")
+
+# Get settings from environment variables set in template.yaml
+CATALOG_TABLE_NAME = os.environ.get("CATALOG_TABLE_NAME")
+PRODUCT_DB_BUCKET = os.environ.get("PRODUCT_DB_BUCKET")
+RESOLVER_INDEX_TTL_SECONDS = float(os.environ.get("RESOLVER_INDEX_TTL_SECONDS", "300"))
+MAX_MATCHES = 10
+
+# The index is built on the first request and kept while the container is warm
+resolver = None
+resolver_built_at = 0.0
+resolver_lock = threading.Lock()
+refreshing = False
+
+
+def product_catalog():
+    """
+    Returns the catalog the index is built from: the catalog table, or the
+    product database JSON file when no table is configured.
+    """
+    if CATALOG_TABLE_NAME:
+        return DynamoCatalog(dynamodb_client, CATALOG_TABLE_NAME)
+    return ProductCatalog(s3, PRODUCT_DB_BUCKET)
+
+
+def build_resolver():
+    """
+    Builds the product index from a full catalog scan and swaps it in.
+    """
+    global resolver, resolver_built_at
+    start = time.perf_counter()
+    index = ProductResolver(product_catalog().items())
+    with resolver_lock:
+        resolver, resolver_built_at = index, time.monotonic()
+    print(f"Built product index of {len(index)} SKUs in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return index
+
+
+def refresh_resolver_in_background():
+    """
+    Rebuilds the index on a background thread, unless a rebuild is already
+    running. A failed rebuild is only logged; the next request retries it.
+    """
+    global refreshing
+    with resolver_lock:
+        if refreshing:
+            return
+        refreshing = True
+
+    def refresh():
+        global refreshing
+        try:
+            build_resolver()
+        except Exception as e:
+            print(f"Background product index refresh failed: {e}")
+        finally:
+            with resolver_lock:
+                refreshing = False
+
+    threading.Thread(target=refresh, name="resolver-refresh", daemon=True).start()
+
+
+def get_resolver():
+    """
+    Returns the product resolver. A cold container builds its index first;
+    once the index is older than its TTL it is still served, while a fresh
+    one is built in the background, so a catalog scan never holds up a
+    request of a warm container.
+    """
+    if resolver is None:
+        return build_resolver()
+    if time.monotonic() - resolver_built_at >= RESOLVER_INDEX_TTL_SECONDS:
+        refresh_resolver_in_background()
+    return resolver
+
+
+def lambda_handler(event, context):
+    """
+    Resolves a spoken or typed product name to catalog SKUs.
+
+    Clients (the Bixby capsule, the app) call this instead of shipping their
+    own name-to-SKU maps. Matching is fuzzy and prefix-aware, so partial,
+    misspelled or joined-up names ('GalaxyS24Ultra') still resolve.
+
+    Args:
+        event (dict): API Gateway Lambda Proxy Input Format.
+                      'queryStringParameters' is expected to contain 'q' (the
+                      product name) and optionally 'limit'.
+        context (object): Lambda Context runtime methods and attributes.
+
+    Returns:
+        dict: An API Gateway Lambda Proxy Output Format object with the
+              matches (sku, productName, score), best first.
+    """
+    try:
+        params = event.get("queryStringParameters") or {}
+        query = (params.get("q") or "").strip()
+        if not query:
+            return {
+                "statusCode": 400,
+                "body": json.dumps({"message": "Query parameter 'q' is required."}),
+            }
+        try:
+            limit = max(1, min(MAX_MATCHES, int(params.get("limit", 5))))
+        except ValueError:
+            limit = 5
+
+        index = get_resolver()
+        start = time.perf_counter()
+        matches = index.resolve(query, limit=limit)
+        took_ms = (time.perf_counter() - start) * 1000
+        print(f"Resolved '{query}' to {[m['sku'] for m in matches]} in {took_ms:.2f} ms")
+
+        return {
+            "statusCode": 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": json.dumps({"query": query, "matches": matches, "tookMs": round(took_ms, 3)}),
+        }
+
+    except Exception as e:
+        print(f"A critical error occurred: {e}")
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"message": "Internal Server Error"}),
+        }
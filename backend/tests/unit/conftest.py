@@ -0,0 +1,393 @@
+import copy
+import hashlib
+import io
+import operator
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+# Lambda puts each function's CodeUri on the path, so its modules import each
+# other by bare name; mirror that for the worker function in unit tests.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "worker_function"))
+# Lambda layers are unpacked onto the path as well
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "catalog_layer"))
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
+
+
+def client_error(code, operation):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+# An absent attribute: every comparison with it but '<>' is false, as in DynamoDB
+MISSING = object()
+
+EXPRESSION_TOKEN = re.compile(r"\s*(<>|<=|>=|[=<>(),]|:\w+|#?\w+(?:\.#?\w+)*)")
+
+COMPARATORS = {
+    "=": operator.eq,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def compare(comparator, left, right):
+    if left is MISSING or right is MISSING:
+        return comparator == "<>"
+    return COMPARATORS[comparator](left, right)
+
+
+class Condition:
+    """
+    Evaluates a DynamoDB condition or filter expression against one item:
+
+        condition  := and-term { OR and-term }
+        and-term   := factor { AND factor }
+        factor     := NOT factor | '(' condition ')'
+                    | attribute_exists '(' path ')' | attribute_not_exists '(' path ')'
+                    | operand comparator operand
+        operand    := ':value' | path ('a.#b.c', with '#names' substituted)
+
+    Anything else raises ValueError, so a test cannot silently pass on an
+    expression the fake does not understand.
+    """
+
+    def __init__(self, expression, lookup, values):
+        self.tokens = EXPRESSION_TOKEN.findall(expression)
+        if "".join(self.tokens) != re.sub(r"\s+", "", expression):
+            raise ValueError(f"Unsupported expression: {expression}")
+        self.position = 0
+        self.lookup = lookup
+        self.values = values
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self, expected=None):
+        token = self._peek()
+        if token is None or (expected is not None and token != expected):
+            raise ValueError(f"Expected {expected or 'a token'} at {token!r} in {' '.join(self.tokens)}")
+        self.position += 1
+        return token
+
+    def evaluate(self):
+        result = self._or()
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected {self._peek()!r} in {' '.join(self.tokens)}")
+        return result
+
+    def _or(self):
+        result = self._and()
+        while self._peek() == "OR":
+            self._take()
+            # Both sides are parsed, whatever the left one gave
+            right = self._and()
+            result = result or right
+        return result
+
+    def _and(self):
+        result = self._factor()
+        while self._peek() == "AND":
+            self._take()
+            right = self._factor()
+            result = result and right
+        return result
+
+    def _factor(self):
+        token = self._peek()
+        if token == "NOT":
+            self._take()
+            return not self._factor()
+        if token == "(":
+            self._take()
+            result = self._or()
+            self._take(")")
+            return result
+        if token in ("attribute_exists", "attribute_not_exists"):
+            self._take()
+            self._take("(")
+            value = self._path(self._take())
+            self._take(")")
+            return (value is MISSING) == (token == "attribute_not_exists")
+        left = self._operand()
+        comparator = self._take()
+        if comparator not in COMPARATORS:
+            raise ValueError(f"Unsupported comparator {comparator!r}")
+        return compare(comparator, left, self._operand())
+
+    def _operand(self):
+        token = self._take()
+        if token.startswith(":"):
+            return self.values[token]
+        return self._path(token)
+
+    def _path(self, token):
+        if not re.fullmatch(r"#?\w+(?:\.#?\w+)*", token) or token in ("AND", "OR", "NOT"):
+            raise ValueError(f"Expected an attribute path, got {token!r}")
+        return self.lookup(token)
+
+
+class FakeTable:
+    """
+    An in-memory DynamoDB table with the calls the functions and tools make.
+
+    Condition and filter expressions are evaluated by `Condition`, and update
+    expressions (SET with if_not_exists, ADD and REMOVE, on nested paths)
+    are applied, so conditional writes fail with
+    ConditionalCheckFailedException as they would against the real table.
+    tests/unit/test_fake_table.py covers the fake itself.
+
+    Set `interleave` to a function of the table to run it once before the
+    next write, e.g. to simulate another worker racing for the same item.
+    """
+
+    def __init__(self, key_name, items=()):
+        self.key_name = key_name
+        self.items = {item[key_name]: copy.deepcopy(item) for item in items}
+        self.interleave = None
+
+    # Expressions
+
+    @staticmethod
+    def _path(path, names):
+        return [names.get(part, part) for part in path.split(".")]
+
+    @staticmethod
+    def _lookup(item, path):
+        value = item
+        for part in path:
+            if not isinstance(value, dict) or part not in value:
+                return MISSING
+            value = value[part]
+        return value
+
+    def _matches(self, item, expression, names=None, values=None):
+        if not expression:
+            return True
+        names, item = names or {}, item or {}
+        return Condition(expression, lambda text: self._lookup(item, self._path(text, names)), values or {}).evaluate()
+
+    def _write(self, key, condition, names, values, operation):
+        if self.interleave:
+            interleave, self.interleave = self.interleave, None
+            interleave(self)
+        if not self._matches(self.items.get(key), condition, names, values):
+            raise client_error('ConditionalCheckFailedException', operation)
+
+    def _update(self, item, expression, names, values):
+        for clause, body in re.findall(r"(SET|ADD|REMOVE)\s+(.*?)(?=\s+(?:SET|ADD|REMOVE)\s|$)", expression):
+            for action in re.split(r",\s*(?![^()]*\))", body.strip()):
+                if clause == "REMOVE":
+                    *parents, leaf = self._path(action.strip(), names)
+                    parent = self._lookup(item, parents)
+                    if isinstance(parent, dict):
+                        parent.pop(leaf, None)
+                    continue
+                if clause == "SET":
+                    target, value = (part.strip() for part in action.split("=", 1))
+                    default = re.fullmatch(r"if_not_exists\((.+?),\s*(:\w+)\)", value)
+                    if default:
+                        current = self._lookup(item, self._path(default.group(1), names))
+                        value = values[default.group(2)] if current is MISSING else current
+                    elif re.fullmatch(r":\w+", value):
+                        value = values[value]
+                    else:
+                        raise ValueError(f"Unsupported SET value: {value}")
+                else:
+                    if not re.fullmatch(r"#?[\w.#]+\s+:\w+", action.strip()):
+                        raise ValueError(f"Unsupported ADD action: {action}")
+                    target, value = action.split()
+                    current = self._lookup(item, self._path(target, names))
+                    value = values[value] + (0 if current is MISSING else current)
+                *parents, leaf = self._path(target, names)
+                parent = item
+                for part in parents:
+                    parent = parent.setdefault(part, {})
+                parent[leaf] = copy.deepcopy(value)
+
+    # Table API
+
+    def get_item(self, Key, ConsistentRead=False, **kwargs):
+        item = self.items.get(Key[self.key_name])
+        return {'Item': copy.deepcopy(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        key = Item[self.key_name]
+        self._write(key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'PutItem')
+        self.items[key] = copy.deepcopy(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ReturnValues=None, **kwargs):
+        key = Key[self.key_name]
+        self._write(key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'UpdateItem')
+        item = self.items.setdefault(key, dict(Key))
+        self._update(item, UpdateExpression, ExpressionAttributeNames or {}, ExpressionAttributeValues or {})
+        return {'Attributes': copy.deepcopy(item)}
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        key = Key[self.key_name]
+        self._write(key, ConditionExpression, ExpressionAttributeNames, ExpressionAttributeValues, 'DeleteItem')
+        self.items.pop(key, None)
+        return {}
+
+    def scan(self, FilterExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        return {'Items': [
+            copy.deepcopy(item) for item in self.items.values()
+            if self._matches(item, FilterExpression, ExpressionAttributeNames, ExpressionAttributeValues)
+        ]}
+
+
+class FakeS3:
+    """
+    An in-memory S3 bucket with the calls the functions and tools make.
+    Objects are keyed on their key alone, whatever the bucket. Every call is
+    recorded in `requests` as (operation, key).
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.metadata = {}
+        self.requests = []
+        self.deleted = []
+        self.uploads = {}
+
+    def add(self, key, body=b"", etag=None, last_modified=None):
+        self.objects[key] = body
+        self.metadata[key] = {
+            'ETag': f'"{etag or hashlib.md5(body).hexdigest()}"',
+            'LastModified': last_modified or datetime.now(timezone.utc),
+        }
+
+    def _get(self, operation, key):
+        self.requests.append((operation, key))
+        if key not in self.objects:
+            raise client_error('404' if operation == 'HeadObject' else 'NoSuchKey', operation)
+        return self.objects[key], self.metadata[key]
+
+    def head_object(self, Bucket, Key):
+        body, metadata = self._get('HeadObject', Key)
+        return {'ContentLength': len(body), **metadata}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        body, metadata = self._get('GetObject', Key)
+        if IfNoneMatch == metadata['ETag']:
+            raise client_error('304', 'GetObject')
+        return {'Body': io.BytesIO(body), 'ContentLength': len(body), **metadata}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.requests.append(('PutObject', Key))
+        self.add(Key, Body if isinstance(Body, bytes) else Body.read())
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None):
+        self.requests.append(('UploadFileobj', Key))
+        self.add(Key, Fileobj.read())
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.requests.append(('CreateMultipartUpload', Key))
+        upload_id = f"upload-{len(self.requests)}"
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.requests.append(('UploadPart', Key))
+        self.uploads[UploadId][PartNumber] = Body
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.requests.append(('CompleteMultipartUpload', Key))
+        parts = self.uploads.pop(UploadId)
+        self.add(Key, b"".join(parts[part['PartNumber']] for part in MultipartUpload['Parts']))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.requests.append(('AbortMultipartUpload', Key))
+        self.uploads.pop(UploadId)
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        body, _ = self._get('CopyObject', CopySource['Key'])
+        self.add(Key, body)
+
+    def delete_object(self, Bucket, Key):
+        self.requests.append(('DeleteObject', Key))
+        self.deleted.append(Key)
+        self.objects.pop(Key, None)
+
+    def delete_objects(self, Bucket, Delete):
+        for obj in Delete['Objects']:
+            self.requests.append(('DeleteObject', obj['Key']))
+            self.deleted.append(obj['Key'])
+            self.objects.pop(obj['Key'], None)
+        return {}
+
+    def generate_presigned_url(self, method, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+    def get_paginator(self, name):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix=""):
+                yield {'Contents': [
+                    {'Key': key, 'Size': len(body), **s3.metadata[key]}
+                    for key, body in sorted(s3.objects.items()) if key.startswith(Prefix)
+                ]}
+
+        return Paginator()
+
+
+class FakeClock:
+    """
+    A clock that only moves when told to; `sleep` advances it at once.
+    """
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def make_table():
+    """
+    Returns a factory of fake tables: make_table(key_name, items=()).
+    """
+    return FakeTable
+
+
+@pytest.fixture
+def cache_table():
+    """
+    A fake ClipCacheTable (clips, voiceovers, renders, leases and statistics).
+    """
+    return FakeTable('promptHash')
+
+
+@pytest.fixture
+def make_s3():
+    """
+    Returns a factory of fake S3 buckets, for tests that need more than one.
+    """
+    return FakeS3
+
+
+@pytest.fixture
+def s3():
+    return FakeS3()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+import aio
+
+
+def test_run_sync_uses_one_persistent_loop():
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    first = aio.run_sync(current_loop())
+    second = aio.run_sync(current_loop())
+
+    assert first is second is aio.get_loop()
+
+
+def test_run_sync_propagates_errors():
+    async def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        aio.run_sync(boom())
+
+
+def test_aws_call_runs_blocking_function_off_the_loop():
+    def blocking(a, b=0):
+        return a + b
+
+    assert aio.run_sync(aio.aws_call(blocking, 1, b=2)) == 3
+
+
+def test_sessions_are_pooled_per_provider_with_timeouts():
+    async def sessions():
+        return aio.get_session("shotstack"), aio.get_session("shotstack"), aio.get_session("openrouter")
+
+    shotstack, again, openrouter = aio.run_sync(sessions())
+
+    assert shotstack is again
+    assert shotstack is not openrouter
+    assert shotstack.connector.limit == aio.HTTP_POOL_SIZE
+    assert shotstack.timeout.connect == aio.HTTP_CONNECT_TIMEOUT
+    assert shotstack.timeout.sock_read == aio.PROVIDER_READ_TIMEOUTS["shotstack"]
+    assert openrouter.timeout.sock_read == aio.HTTP_READ_TIMEOUT
@@ -0,0 +1,83 @@
+import hashlib
+
+from asset_store import AssetStore, SpooledAsset, split_s3_uri
+
+
+def test_assets_are_stored_under_their_content_hash_once(s3):
+    store = AssetStore(s3)
+    digest = hashlib.sha256(b"clip").hexdigest()
+
+    first = store.put(b"clip", "bucket", "cached_clips", "mp4", "video/mp4")
+    second = store.put(b"clip", "bucket", "cached_clips", "mp4", "video/mp4")
+
+    assert first == second == f"s3://bucket/cached_clips/{digest}.mp4"
+    assert [operation for operation, _ in s3.requests].count("PutObject") == 1
+
+
+def test_references_are_presigned_without_downloading(s3):
+    store = AssetStore(s3)
+
+    assert store.presign("s3://bucket/audio/a.mp3") == "https://bucket/audio/a.mp3?expires=600"
+    assert split_s3_uri("s3://bucket/curated_clips/x/y.mp4") == ("bucket", "curated_clips/x/y.mp4")
+
+
+def test_spooled_assets_are_hashed_incrementally_and_uploaded_once(s3):
+    store = AssetStore(s3)
+    digest = hashlib.sha256(b"abcdef").hexdigest()
+
+    with SpooledAsset(max_memory=2) as audio:
+        for chunk in (b"ab", b"cd", b"ef"):
+            audio.write(chunk)
+        uri = store.put_spooled(audio, "bucket", "audio", "mp3", "audio/mpeg")
+
+    assert uri == f"s3://bucket/audio/{digest}.mp3"
+    assert s3.objects == {f"audio/{digest}.mp3": b"abcdef"}
+    assert [operation for operation, _ in s3.requests].count("UploadFileobj") == 1
+
+
+def test_a_short_streamed_asset_is_put_in_one_request(s3):
+    store = AssetStore(s3, part_size=10)
+    digest = hashlib.sha256(b"abcdef").hexdigest()
+
+    with store.open_upload("bucket", "audio", "mp3", "audio/mpeg") as audio:
+        for chunk in (b"ab", b"cd", b"ef"):
+            audio.write(chunk)
+        uri = audio.complete()
+
+    assert uri == f"s3://bucket/audio/{digest}.mp3"
+    assert s3.requests == [("HeadObject", f"audio/{digest}.mp3"), ("PutObject", f"audio/{digest}.mp3")]
+
+
+def test_a_long_streamed_asset_is_uploaded_in_parts_as_it_arrives(s3):
+    store = AssetStore(s3, part_size=4)
+    content = b"0123456789"
+    key = f"audio/{hashlib.sha256(content).hexdigest()}.mp3"
+
+    with store.open_upload("bucket", "audio", "mp3", "audio/mpeg") as audio:
+        audio.write(content[:5])
+        assert [operation for operation, _ in s3.requests] == ["CreateMultipartUpload", "UploadPart"]
+        audio.write(content[5:])
+        first = audio.complete()
+    with store.open_upload("bucket", "audio", "mp3", "audio/mpeg") as audio:
+        audio.write(content)
+        second = audio.complete()
+
+    assert first == second == f"s3://bucket/{key}"
+    assert s3.objects == {key: content}
+    # The second upload found the content stored and only removed its staging object
+    assert [operation for operation, _ in s3.requests].count("CopyObject") == 1
+    assert all(key.startswith("audio/staging/") for key in s3.deleted) and len(s3.deleted) == 2
+
+
+def test_an_unfinished_streamed_asset_is_aborted(s3):
+    store = AssetStore(s3, part_size=4)
+
+    try:
+        with store.open_upload("bucket", "audio", "mp3", "audio/mpeg") as audio:
+            audio.write(b"0123456789")
+            raise ConnectionError("stream broke off")
+    except ConnectionError:
+        pass
+
+    assert s3.requests[-1][0] == "AbortMultipartUpload"
+    assert s3.objects == {} and not s3.uploads
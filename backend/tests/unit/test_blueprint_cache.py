@@ -0,0 +1,31 @@
+from blueprint_cache import BlueprintCache, blueprint_cache_key, normalize_context
+
+
+BLUEPRINT = {"acts": ["a family watching TV", "a close view of the screen", "the TV at night"],
+             "voiceover_script": "अब, अपने पसंदीदा शो का आनंद लें।", "voice_id": "2zRM7PkgwBPiau2jvVXc"}
+
+
+def test_equivalent_briefs_share_a_key():
+    key = blueprint_cache_key("PROD-TV", "Diwali offer", "Hindi", "1")
+
+    assert normalize_context("  Diwali\n  OFFER ") == "diwali offer"
+    assert blueprint_cache_key("PROD-TV", "  diwali  OFFER", "Hindi ", "1") == key
+    assert blueprint_cache_key("PROD-TV", "Diwali offer", "Tamil", "1") != key
+    assert blueprint_cache_key("PROD-S24ULTRA", "Diwali offer", "Hindi", "1") != key
+    assert blueprint_cache_key("PROD-TV", "Diwali offer", "Hindi", "2") != key
+
+
+def test_blueprints_round_trip_until_they_expire(make_table, clock):
+    table = make_table('blueprintKey')
+    cache = BlueprintCache(table, ttl_seconds=3600, clock=clock)
+    key = blueprint_cache_key("PROD-TV", "Diwali offer", "Hindi", "1")
+
+    assert cache.get(key) is None
+    cache.put(key, BLUEPRINT, sku="PROD-TV")
+
+    assert cache.get(key) == BLUEPRINT
+    assert table.items[key]['expiresAt'] == 1_000_000 + 3600
+    assert table.items[key]['sku'] == "PROD-TV"
+
+    clock.now += 3600
+    assert cache.get(key) is None
@@ -0,0 +1,164 @@
+import importlib.util
+import io
+import json
+import os
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from catalog_store import DynamoCatalog, ProductCatalog, normalize_product, validate_product
+
+spec = importlib.util.spec_from_file_location(
+    "import_catalog", os.path.join(os.path.dirname(__file__), "..", "..", "tools", "import_catalog.py")
+)
+import_catalog = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(import_catalog)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCatalogS3:
+    def __init__(self, database):
+        self.database = database
+        self.version = 1
+        self.requests = []
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.requests.append(IfNoneMatch)
+        etag = f'"v{self.version}"'
+        if IfNoneMatch == etag:
+            raise ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+        return {'Body': io.BytesIO(json.dumps(self.database).encode()), 'ETag': etag}
+
+
+DATABASE = {
+    "PROD-WW12T504DAB": {"productName": "Washer", "product_shot_url": "s3://bucket/panel.mp4"},
+    "PROD-S24ULTRA": {"productName": "S24", "product_shot_url": ["s3://bucket/a.mp4", "s3://bucket/b.mp4"]},
+}
+
+
+def test_product_shot_url_is_always_a_list():
+    assert normalize_product(DATABASE["PROD-WW12T504DAB"])["product_shot_url"] == ["s3://bucket/panel.mp4"]
+    assert normalize_product(DATABASE["PROD-S24ULTRA"])["product_shot_url"] == ["s3://bucket/a.mp4", "s3://bucket/b.mp4"]
+
+
+def test_catalog_is_loaded_once_and_revalidated_with_its_etag():
+    s3 = FakeCatalogS3(DATABASE)
+    clock = FakeClock()
+    catalog = ProductCatalog(s3, "bucket", refresh_seconds=60, clock=clock)
+
+    assert catalog.get("PROD-S24ULTRA")["productName"] == "S24"
+    assert catalog.get("PROD-WW12T504DAB")["product_shot_url"] == ["s3://bucket/panel.mp4"]
+    assert catalog.get("PROD-UNKNOWN") is None
+    assert s3.requests == [None]
+
+    clock.now = 61
+    catalog.get("PROD-S24ULTRA")
+    assert s3.requests == [None, '"v1"']
+
+    s3.database = {"PROD-NEW": {"productName": "New", "product_shot_url": []}}
+    s3.version = 2
+    clock.now = 122
+    assert catalog.get("PROD-NEW")["productName"] == "New"
+    assert catalog.etag == '"v2"'
+
+
+class FakeCatalogTable:
+    """
+    Stands in for both the Table resource (batch writes by the import tool)
+    and the low-level client (reads by DynamoCatalog).
+    """
+
+    def __init__(self):
+        self.items = {}
+        self.reads = 0
+
+    def get_item(self, TableName, Key):
+        self.reads += 1
+        item = self.items.get(Key['sku']['S'])
+        return {'Item': TypeSerializer().serialize(item)['M']} if item else {}
+
+    def scan(self, TableName, ExclusiveStartKey=None):
+        skus = sorted(self.items)
+        start = skus.index(ExclusiveStartKey['sku']['S']) + 1 if ExclusiveStartKey else 0
+        page = [TypeSerializer().serialize(self.items[sku])['M'] for sku in skus[start:start + 1]]
+        response = {'Items': page}
+        if start + 1 < len(skus):
+            response['LastEvaluatedKey'] = {'sku': {'S': skus[start]}}
+        return response
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        table = self
+
+        class Batch:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                pass
+
+            def put_item(self, Item):
+                table.items[Item['sku']] = Item
+
+        return Batch()
+
+
+def test_validate_product_reports_every_problem():
+    assert validate_product("PROD-S24ULTRA", DATABASE["PROD-S24ULTRA"]) == []
+    errors = validate_product("PROD-BAD", {"productName": "", "product_shot_url": ["https://x/a.mp4"]})
+
+    assert len(errors) == 2
+
+
+def test_imported_catalog_is_looked_up_one_sku_at_a_time():
+    table = FakeCatalogTable()
+    assert import_catalog.validate_catalog(DATABASE) == []
+    assert import_catalog.import_catalog(DATABASE, table) == 2
+
+    clock = FakeClock()
+    catalog = DynamoCatalog(table, "ProductCatalogTable", cache_seconds=60, clock=clock)
+
+    assert catalog.get("PROD-WW12T504DAB") == {
+        "productName": "Washer", "product_shot_url": ["s3://bucket/panel.mp4"]
+    }
+    catalog.get("PROD-WW12T504DAB")
+    assert table.reads == 1
+    assert catalog.get("PROD-UNKNOWN") is None
+
+    clock.now = 61
+    catalog.get("PROD-WW12T504DAB")
+    assert table.reads == 3
+    assert sorted(sku for sku, _ in catalog.items()) == sorted(DATABASE)
+
+
+def test_unknown_skus_are_remembered_for_a_short_while():
+    table = FakeCatalogTable()
+    clock = FakeClock()
+    catalog = DynamoCatalog(table, "ProductCatalogTable", cache_seconds=60, miss_cache_seconds=10, clock=clock)
+
+    assert catalog.get("PROD-NEW") is None
+    assert catalog.get("PROD-NEW") is None
+    assert table.reads == 1
+
+    table.items["PROD-NEW"] = {"sku": "PROD-NEW", "productName": "New", "product_shot_url": []}
+    clock.now = 5
+    assert catalog.get("PROD-NEW") is None
+    clock.now = 11
+    assert catalog.get("PROD-NEW")["productName"] == "New"
+    clock.now = 50
+    catalog.get("PROD-NEW")
+    assert table.reads == 2
+
+
+def test_import_tool_rejects_an_invalid_catalog(tmp_path, capsys):
+    source = tmp_path / "product_db.json"
+    source.write_text(json.dumps({"PROD-BAD": {"productName": "Bad"}}))
+
+    assert import_catalog.main([str(source), "--dry-run"]) == 1
+    assert "PROD-BAD" in capsys.readouterr().out
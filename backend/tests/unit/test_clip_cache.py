@@ -0,0 +1,154 @@
+import asyncio
+
+import aio
+from clip_cache import ClipCache, claim_or_wait, clip_cache_key, holding_lease, clip_variant, legacy_clip_cache_key, normalize_prompt
+from clip_index import ClipIndex
+from video_router import VideoRoute
+
+WAN_REPLICATE = VideoRoute("replicate", "Wan-AI/Wan2.2-T2V-A14B")
+WAN_FAL = VideoRoute("fal-ai", "Wan-AI/Wan2.2-T2V-A14B")
+NEW_MODEL = VideoRoute("replicate", "Lightricks/LTX-Video")
+
+
+def test_keys_cover_the_prompt_route_and_parameters():
+    variant = clip_variant("replicate", "Wan-AI/Wan2.2-T2V-A14B", {"seed": 42})
+    key = clip_cache_key("A family watching TV.", variant)
+
+    assert normalize_prompt("  A family\twatching TV. ") == "a family watching tv"
+    assert key.startswith("v2#")
+    assert clip_cache_key("a family  watching tv", variant) == key
+    assert clip_cache_key("A family watching TV.", clip_variant("fal-ai", "Wan-AI/Wan2.2-T2V-A14B", {"seed": 42})) != key
+    assert clip_cache_key("A family watching TV.", clip_variant("replicate", "Lightricks/LTX-Video", {"seed": 42})) != key
+    assert clip_cache_key("A family watching TV.", clip_variant("replicate", "Wan-AI/Wan2.2-T2V-A14B", {"seed": 7})) != key
+
+
+def test_clips_are_only_served_for_routes_that_generated_them(cache_table):
+    table = cache_table
+    cache = ClipCache(table)
+    cache.put("a family watching TV", WAN_FAL, "s3://bucket/fal.mp4")
+
+    assert cache.get("a family watching TV", [WAN_REPLICATE, WAN_FAL])['s3_uri'] == "s3://bucket/fal.mp4"
+    assert cache.get("a family watching TV", [NEW_MODEL]) is None
+    assert ClipCache(table, parameters={"seed": 42}).get("a family watching TV", [WAN_FAL]) is None
+
+
+def test_legacy_entries_are_read_and_copied_forward(cache_table):
+    table = cache_table
+    legacy_key = legacy_clip_cache_key("a family watching TV")
+    table.items[legacy_key] = {'promptHash': legacy_key, 'promptText': "a family watching TV",
+                               's3_uri': "s3://bucket/old.mp4", 'createdAt': 100}
+    cache = ClipCache(table, legacy_route=WAN_REPLICATE.name)
+
+    assert cache.get("a family watching TV", [NEW_MODEL]) is None
+    assert cache.get("a family watching TV", [WAN_REPLICATE])['s3_uri'] == "s3://bucket/old.mp4"
+
+    migrated = table.items[clip_cache_key("a family watching TV", cache.variant(WAN_REPLICATE))]
+    assert migrated['s3_uri'] == "s3://bucket/old.mp4"
+    assert migrated['migratedFrom'] == legacy_key
+    assert migrated['createdAt'] == 100
+    assert ClipCache(table, parameters={"seed": 1}, legacy_route=WAN_REPLICATE.name).accepted_variants(
+        [WAN_REPLICATE]
+    ) == {clip_variant(WAN_REPLICATE.provider, WAN_REPLICATE.model, {"seed": 1})}
+
+
+def test_similar_clips_are_limited_to_accepted_variants(cache_table):
+    cache = ClipCache(cache_table, legacy_route=WAN_REPLICATE.name)
+    index = ClipIndex()
+    index.add(cache.entry("a view of a family watching TV", NEW_MODEL.provider, NEW_MODEL.model, "s3://bucket/ltx.mp4"))
+
+    assert index.search("a family watching a TV", 0.85, cache.accepted_variants([WAN_REPLICATE])) == (None, 0.0)
+
+    index.add({"promptHash": "old", "promptText": "a scene showing a family watching TV", "s3_uri": "s3://bucket/old.mp4"})
+    match, _ = index.search("a family watching a TV", 0.85, cache.accepted_variants([WAN_REPLICATE]))
+    assert match["s3_uri"] == "s3://bucket/old.mp4"
+
+
+def test_only_one_job_holds_the_lease_until_it_is_released_or_expires(cache_table, clock):
+    table = cache_table
+    cache = ClipCache(table, clock=clock)
+    routes = [WAN_REPLICATE, WAN_FAL]
+
+    assert cache.acquire_lease("a family watching TV", routes, "job-1", 300)
+    assert not cache.acquire_lease("a family watching TV", routes, "job-2", 300)
+
+    cache.release_lease("a family watching TV", routes, "job-2")
+    assert not cache.acquire_lease("a family watching TV", routes, "job-2", 300)
+
+    clock.now += 301
+    assert cache.acquire_lease("a family watching TV", routes, "job-2", 300)
+    cache.release_lease("a family watching TV", routes, "job-1")
+    assert table.items[cache.lease_key("a family watching TV", routes)]['leaseOwner'] == "job-2"
+
+    cache.release_lease("a family watching TV", routes, "job-2")
+    assert cache.acquire_lease("a family watching TV", routes, "job-3", 300)
+
+
+def test_waiting_jobs_receive_the_clip_of_the_lease_holder(cache_table):
+    table = cache_table
+    cache = ClipCache(table)
+    routes = [WAN_REPLICATE]
+    assert cache.acquire_lease("a family watching TV", routes, "holder", 300)
+
+    async def holder_finishes():
+        await asyncio.sleep(0.05)
+        cache.put("a family watching TV", WAN_REPLICATE, "s3://bucket/clip.mp4")
+        cache.release_lease("a family watching TV", routes, "holder")
+
+    async def scenario():
+        waiters = [claim_or_wait(cache, "a family watching TV", routes, f"waiter-{i}", 300, 0.01) for i in range(3)]
+        results = await asyncio.gather(holder_finishes(), *waiters)
+        return results[1:]
+
+    results = aio.run_sync(scenario())
+
+    assert [item['s3_uri'] for item in results] == ["s3://bucket/clip.mp4"] * 3
+
+
+def test_a_failed_holder_is_taken_over(cache_table):
+    table = cache_table
+    cache = ClipCache(table)
+    routes = [WAN_REPLICATE]
+    assert cache.acquire_lease("a family watching TV", routes, "holder", 300)
+
+    async def holder_fails():
+        await asyncio.sleep(0.05)
+        cache.release_lease("a family watching TV", routes, "holder")
+
+    async def scenario():
+        return (await asyncio.gather(
+            holder_fails(), claim_or_wait(cache, "a family watching TV", routes, "waiter", 300, 0.01)
+        ))[1]
+
+    assert aio.run_sync(scenario()) is None
+    assert table.items[cache.lease_key("a family watching TV", routes)]['leaseOwner'] == "waiter"
+
+
+def test_a_clip_stored_just_before_the_claim_is_returned(cache_table):
+    cache = ClipCache(cache_table)
+    routes = [WAN_REPLICATE]
+    # The holder stored the clip and released the lease after our cache miss
+    cache.put("a family watching TV", WAN_REPLICATE, "s3://bucket/clip.mp4")
+
+    item = aio.run_sync(claim_or_wait(cache, "a family watching TV", routes, "late-job", 300, 0.01))
+
+    assert item['s3_uri'] == "s3://bucket/clip.mp4"
+    assert cache.lease_key("a family watching TV", routes) not in cache_table.items
+
+
+def test_the_holder_keeps_its_lease_while_generating_past_the_lease_time(cache_table, clock):
+    cache = ClipCache(cache_table, clock=clock)
+    routes = [WAN_REPLICATE]
+    lease_key = cache.lease_key("a family watching TV", routes)
+    assert cache.acquire_lease("a family watching TV", routes, "holder", 300)
+
+    async def slow_generation():
+        async with holding_lease(cache, "a family watching TV", routes, "holder", 300, renew_seconds=0.01):
+            for _ in range(3):
+                clock.now += 200
+                await asyncio.sleep(0.05)
+                assert not cache.acquire_lease("a family watching TV", routes, "waiter", 300)
+
+    aio.run_sync(slow_generation())
+
+    assert lease_key not in cache_table.items
+    assert cache.acquire_lease("a family watching TV", routes, "waiter", 300)
@@ -0,0 +1,132 @@
+import importlib.util
+import os
+from datetime import datetime, timezone
+
+import app
+from clip_cache import ClipCache
+from video_router import VideoRoute
+
+spec = importlib.util.spec_from_file_location(
+    "clip_cache_admin", os.path.join(os.path.dirname(__file__), "..", "..", "tools", "clip_cache_admin.py")
+)
+clip_cache_admin = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(clip_cache_admin)
+
+WAN = VideoRoute("replicate", "Wan-AI/Wan2.2-T2V-A14B")
+
+
+def entry(key, s3_uri, size, last_access, hits=0):
+    return {'promptHash': key, 'promptText': key, 's3_uri': s3_uri, 'sizeBytes': size,
+            'lastAccessedAt': last_access, 'hitCount': hits}
+
+
+def test_entries_track_size_access_and_hits(cache_table, clock):
+    table = cache_table
+    clock.now = 1000
+    cache = ClipCache(table, ttl_seconds=100, clock=clock)
+    cache.put("a family watching TV", WAN, "s3://bucket/cached_clips/a.mp4", 5_000_000)
+
+    clock.now = 1050
+    item = cache.get("a family watching TV", [WAN])
+    assert (item['sizeBytes'], item['hitCount'], item['lastAccessedAt'], item['expiresAt']) == (5_000_000, 1, 1050, 1150)
+
+    clock.now = 1200
+    assert cache.get("a family watching TV", [WAN]) is None
+
+    cache.record("hits")
+    cache.record("misses")
+    cache.record("misses")
+    stats = clip_cache_admin.hit_ratio(table, 1, 1200)
+    assert (stats['hits'], stats['misses']) == (1, 2)
+    assert stats['hitRatio'] == 1 / 3
+
+
+def test_eviction_follows_the_policy_and_frees_shared_objects_last():
+    entries = [
+        entry("old-popular", "s3://bucket/cached_clips/a.mp4", 40, last_access=100, hits=9),
+        entry("new-rare", "s3://bucket/cached_clips/b.mp4", 40, last_access=300, hits=1),
+        entry("mid", "s3://bucket/cached_clips/c.mp4", 40, last_access=200, hits=5),
+        entry("mid-copy", "s3://bucket/cached_clips/c.mp4", 40, last_access=250, hits=0),
+    ]
+
+    evicted, objects, freed = clip_cache_admin.plan_eviction(entries, 80, "lru")
+    assert [e['promptHash'] for e in evicted] == ["old-popular"]
+    assert (objects, freed) == (["s3://bucket/cached_clips/a.mp4"], 40)
+
+    evicted, objects, freed = clip_cache_admin.plan_eviction(entries, 40, "lfu")
+    assert [e['promptHash'] for e in evicted] == ["mid-copy", "new-rare", "mid"]
+    assert (objects, freed) == (["s3://bucket/cached_clips/b.mp4", "s3://bucket/cached_clips/c.mp4"], 80)
+
+    assert clip_cache_admin.plan_eviction(entries, 120, "lru") == ([], [], 0)
+
+
+def test_evict_removes_item_and_object_unless_the_entry_was_hit_meanwhile(cache_table, s3):
+    table = cache_table
+    for e in [entry("a", "s3://bucket/cached_clips/a.mp4", 40, 100), entry("b", "s3://bucket/cached_clips/b.mp4", 40, 200)]:
+        table.put_item(Item=e)
+    s3.add("cached_clips/a.mp4")
+    s3.add("cached_clips/b.mp4")
+    evicted = [dict(table.items["a"]), dict(table.items["b"])]
+    table.items["b"]['lastAccessedAt'] = 500
+
+    deleted = clip_cache_admin.evict(table, s3, evicted, ["s3://bucket/cached_clips/a.mp4", "s3://bucket/cached_clips/b.mp4"])
+
+    assert deleted == 1
+    assert s3.deleted == ["cached_clips/a.mp4"]
+    assert list(table.items) == ["b"]
+
+
+def test_gc_finds_old_unreferenced_assets(s3):
+    now = datetime(2026, 10, 18, tzinfo=timezone.utc).timestamp()
+    day = 86400
+
+    for key, age_days in [
+        ("cached_clips/cached.mp4", 10),
+        ("cached_clips/evicted.mp4", 10),
+        ("audio/recent-job.mp3", 10),
+        ("audio/old-job.mp3", 60),
+        ("audio/running-job.mp3", 0.1),
+        ("audio/stuck-job.mp3", 60),
+        ("generated_clips/1234.mp4", 400),
+        ("clip_index/prompts.npy", 400),
+    ]:
+        s3.add(key, b"x" * 100, last_modified=datetime.fromtimestamp(now - age_days * day, timezone.utc))
+    entries = [entry("k", "s3://bucket/cached_clips/cached.mp4", 100, 0)]
+    jobs = [
+        {'jobId': '1', 'createdAt': now - 5 * day, 'checkpoints': {'voiceover': "s3://bucket/audio/recent-job.mp3"},
+         'generatedAudioUrl': "https://bucket.s3.amazonaws.com/audio/recent-job.mp3?X-Amz-Signature=abc"},
+        {'jobId': '2', 'createdAt': now - 60 * day, 'status': 'COMPLETE',
+         'checkpoints': {'voiceover': "s3://bucket/audio/old-job.mp3"}},
+        # Still running on an old object it found already stored
+        {'jobId': '3', 'createdAt': now - 60 * day, 'status': 'RENDERING',
+         'checkpoints': {'voiceover': "s3://bucket/audio/stuck-job.mp3"}},
+    ]
+
+    referenced = clip_cache_admin.referenced_keys(entries, jobs, "bucket", 30 * day, now)
+    orphans = clip_cache_admin.find_orphans(s3, "bucket", referenced, day, now)
+
+    assert sorted(key for key, _ in orphans) == ["audio/old-job.mp3", "cached_clips/evicted.mp4", "generated_clips/1234.mp4"]
+
+
+def test_the_scheduled_eviction_trims_the_cache_to_its_budget(monkeypatch, cache_table, s3):
+    for e in [entry("a", "s3://bucket/cached_clips/a.mp4", 40, 100), entry("b", "s3://bucket/audio/b.mp3", 40, 200)]:
+        cache_table.put_item(Item=e)
+    cache_table.put_item(Item={'promptHash': "stats#2026-10-18", 'hits': 3})
+    monkeypatch.setattr(app.dynamodb, "Table", lambda name: {"clips": cache_table}[name])
+    monkeypatch.setattr(app, "CLIP_CACHE_TABLE_NAME", "clips")
+    monkeypatch.setattr(app, "s3", s3)
+
+    assert app.lambda_handler({"evict": {"budget": "40", "dryRun": True}}, None)["entries"] == 1
+    assert len(cache_table.items) == 3 and not s3.deleted
+
+    report = app.lambda_handler({"evict": {"budget": "40"}}, None)
+
+    assert report == {"entries": 1, "objects": 1, "freedBytes": 40}
+    assert s3.deleted == ["cached_clips/a.mp4"]
+    assert sorted(cache_table.items) == ["b", "stats#2026-10-18"]
+
+
+def test_sizes_parse_with_units():
+    assert clip_cache_admin.parse_size("50GB") == 50 * 1024 ** 3
+    assert clip_cache_admin.parse_size("1.5 mb") == int(1.5 * 1024 ** 2)
+    assert clip_cache_admin.parse_size("1000") == 1000
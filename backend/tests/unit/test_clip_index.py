@@ -0,0 +1,131 @@
+import io
+
+import numpy as np
+import pytest
+from botocore.exceptions import ClientError
+
+from clip_index import ClipIndex, ClipIndexStore, embed, tokenize
+
+
+def entry(prompt):
+    return {"promptHash": str(abs(hash(prompt))), "promptText": prompt, "s3_uri": f"s3://bucket/{len(prompt)}.mp4"}
+
+
+def test_framing_words_and_plurals_are_ignored():
+    assert tokenize("A view of a family watching TVs") == ["family", "watching", "tv"]
+    assert tokenize("a scene showing a family watching a TV") == ["family", "watching", "tv"]
+
+
+def test_embeddings_are_unit_vectors():
+    vector = embed("a family watching TV")
+
+    assert vector.dtype == np.float32
+    assert np.linalg.norm(vector) == pytest.approx(1.0)
+    assert not embed("a view of the").any()
+
+
+def test_near_duplicate_prompts_match_and_different_ones_do_not():
+    index = ClipIndex()
+    index.add(entry("a view of a family watching TV"))
+    index.add(entry("a phone on a marble kitchen counter"))
+
+    match, score = index.search("a scene showing a family watching a TV", 0.85)
+    assert match["promptText"] == "a view of a family watching TV"
+    assert score == pytest.approx(1.0)
+
+    match, score = index.search("a cricket stadium at night", 0.85)
+    assert match is None
+    assert score < 0.85
+
+
+def test_saved_index_is_memory_mapped(tmp_path):
+    index = ClipIndex()
+    index.add(entry("a view of a family watching TV"))
+    index.save(str(tmp_path / "prompts"))
+
+    loaded = ClipIndex.load(str(tmp_path / "prompts"))
+
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.search("a family watching a TV", 0.85)[0]["promptText"] == "a view of a family watching TV"
+
+
+class FakeIndexS3:
+    def __init__(self, files, metadata=None):
+        self.files = files
+        self.metadata = metadata or {}
+        self.etag = '"v1"'
+        self.requests = []
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.requests.append((Key, IfNoneMatch))
+        if Key not in self.files:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not Found'}}, 'GetObject')
+        if Key.endswith(".npy") and IfNoneMatch == self.etag:
+            raise ClientError({'Error': {'Code': '304', 'Message': 'Not Modified'}}, 'GetObject')
+        return {'Body': io.BytesIO(self.files[Key]), 'ETag': self.etag, 'Metadata': self.metadata.get(Key, {})}
+
+
+def test_store_downloads_once_and_keeps_clips_added_in_memory(tmp_path):
+    built = ClipIndex()
+    built.add(entry("a view of a family watching TV"))
+    built.save(str(tmp_path / "built"))
+    s3 = FakeIndexS3({
+        "clip_index/prompts.npy": (tmp_path / "built.npy").read_bytes(),
+        "clip_index/prompts.json": (tmp_path / "built.json").read_bytes(),
+    })
+    now = [0.0]
+    store = ClipIndexStore(s3, "bucket", local_dir=str(tmp_path), refresh_seconds=60, clock=lambda: now[0])
+
+    store.add(entry("a phone on a marble kitchen counter"))
+    now[0] = 61
+    match, _ = store.search("a smartphone on a marble kitchen counter", 0.5)
+
+    assert match["promptText"] == "a phone on a marble kitchen counter"
+    assert len(store.get()) == 2
+    assert s3.requests == [
+        ("clip_index/prompts.npy", None), ("clip_index/prompts.json", None), ("clip_index/prompts.npy", '"v1"'),
+    ]
+
+
+def build(tmp_path, name, prompts):
+    index = ClipIndex()
+    for prompt in prompts:
+        index.add(entry(prompt))
+    index.save(str(tmp_path / name))
+    return (tmp_path / f"{name}.npy").read_bytes(), (tmp_path / f"{name}.json").read_bytes()
+
+
+@pytest.mark.parametrize("versioned", [True, False])
+def test_store_keeps_its_index_while_the_files_are_from_different_builds(tmp_path, versioned):
+    first_npy, first_json = build(tmp_path, "first", ["a view of a family watching TV"])
+    second_npy, second_json = build(tmp_path, "second", ["a view of a family watching TV", "a phone on a counter"])
+    s3 = FakeIndexS3({"clip_index/prompts.npy": first_npy, "clip_index/prompts.json": first_json})
+    if versioned:
+        s3.metadata = {key: {"index-version": "first"} for key in s3.files}
+    now = [0.0]
+    store = ClipIndexStore(s3, "bucket", local_dir=str(tmp_path), refresh_seconds=60, clock=lambda: now[0])
+    assert len(store.get()) == 1
+
+    # A rebuild with as many rows as before is only told apart by its version
+    rows_npy = second_npy if not versioned else build(tmp_path, "third", ["a fridge in a kitchen"])[0]
+    # The rebuild's matrix is read before its entries are uploaded
+    s3.files["clip_index/prompts.npy"] = rows_npy
+    s3.metadata["clip_index/prompts.npy"] = {"index-version": "second"} if versioned else {}
+    s3.etag = '"v2"'
+    now[0] = 61
+    assert store.search("a family watching a TV", 0.85)[0]["promptText"] == "a view of a family watching TV"
+    assert store.etag == '"v1"'
+
+    s3.files.update({"clip_index/prompts.npy": second_npy, "clip_index/prompts.json": second_json})
+    if versioned:
+        s3.metadata = {key: {"index-version": "second"} for key in s3.files}
+    s3.etag = '"v3"'
+    now[0] = 122
+    assert len(store.get()) == 2
+    assert store.etag == '"v3"'
+
+
+def test_store_starts_empty_without_a_built_index(tmp_path):
+    store = ClipIndexStore(FakeIndexS3({}), "bucket", local_dir=str(tmp_path))
+
+    assert store.search("a family watching TV", 0.85) == (None, 0.0)
@@ -0,0 +1,32 @@
+import importlib.util
+import os
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "profile_cold_start",
+    os.path.join(os.path.dirname(__file__), "..", "..", "tools", "profile_cold_start.py"),
+)
+profile_cold_start = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(profile_cold_start)
+
+# Wall-clock budgets depend on the machine, so they are only checked on
+# request: COLD_START_BUDGETS=1 checks them as they are, a larger factor
+# (e.g. 2) scales them for a slower runner.
+BUDGET_FACTOR = float(os.environ.get("COLD_START_BUDGETS") or 0)
+
+
+@pytest.mark.parametrize("function", profile_cold_start.FUNCTIONS)
+def test_function_init_does_not_import_heavy_packages(function):
+    _, modules = profile_cold_start.measure_import(function)
+
+    for package in profile_cold_start.FORBIDDEN_IMPORTS[function]:
+        assert package not in modules, f"{function} imports {package} at init time"
+
+
+@pytest.mark.skipif(not BUDGET_FACTOR, reason="set COLD_START_BUDGETS=1 (or a scale factor) to check import times")
+@pytest.mark.parametrize("function", profile_cold_start.FUNCTIONS)
+def test_function_init_stays_within_its_import_budget(function):
+    total_ms, _ = profile_cold_start.measure_import(function)
+
+    assert total_ms <= profile_cold_start.IMPORT_BUDGETS_MS[function] * BUDGET_FACTOR
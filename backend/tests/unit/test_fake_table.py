@@ -0,0 +1,92 @@
+import pytest
+from botocore.exceptions import ClientError
+
+ITEM = {"id": "a", "status": "RENDERING", "leaseExpiresAt": 100, "checkpoints": {"render_submit": "r-1"}}
+
+
+@pytest.fixture
+def table(make_table):
+    return make_table("id", [ITEM])
+
+
+def matches(table, expression, values=None, names=None):
+    return table._matches(table.items["a"], expression, names, values)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("leaseExpiresAt < :n", True),
+    ("leaseExpiresAt >= :n", False),
+    ("#s = :status", True),
+    ("#s <> :status", False),
+    ("attribute_exists(checkpoints.render_submit)", True),
+    ("attribute_not_exists(checkpoints.render_submit)", False),
+    ("attribute_not_exists(expiresAt)", True),
+    # Comparisons with an absent attribute are false, except '<>'
+    ("expiresAt < :n", False),
+    ("expiresAt > :n", False),
+    ("expiresAt <> :n", True),
+    # AND binds tighter than OR; NOT tighter than both
+    ("#s = :other OR #s = :status AND leaseExpiresAt < :n", True),
+    ("(#s = :other OR #s = :status) AND leaseExpiresAt > :n", False),
+    ("NOT #s = :other AND NOT attribute_exists(expiresAt)", True),
+    ("NOT (#s = :status OR attribute_exists(expiresAt))", False),
+])
+def test_conditions_are_evaluated_like_dynamodb(table, expression, expected):
+    values = {":n": 200, ":status": "RENDERING", ":other": "COMPLETE"}
+
+    assert matches(table, expression, values, {"#s": "status"}) is expected
+
+
+@pytest.mark.parametrize("expression", [
+    "leaseExpiresAt + :n",
+    "leaseExpiresAt < :n extra",
+    "contains(status, :n)",
+    "(leaseExpiresAt < :n",
+    "leaseExpiresAt < :n; import os",
+])
+def test_unsupported_conditions_raise(table, expression):
+    with pytest.raises(ValueError):
+        matches(table, expression, {":n": 1})
+
+
+def test_a_failed_condition_leaves_the_item_untouched(table):
+    with pytest.raises(ClientError) as error:
+        table.update_item(
+            Key={"id": "a"}, UpdateExpression="SET leaseExpiresAt = :n",
+            ConditionExpression="leaseExpiresAt > :n", ExpressionAttributeValues={":n": 500},
+        )
+
+    assert error.value.response["Error"]["Code"] == "ConditionalCheckFailedException"
+    assert table.items["a"] == ITEM
+
+
+def test_updates_set_add_and_remove_nested_attributes(table):
+    attributes = table.update_item(
+        Key={"id": "a"},
+        UpdateExpression="SET checkpoints.#stage = :v, created = if_not_exists(created, :v), "
+                         "leaseExpiresAt = if_not_exists(leaseExpiresAt, :v) "
+                         "ADD hits :one REMOVE checkpoints.render_submit",
+        ExpressionAttributeNames={"#stage": "blueprint"},
+        ExpressionAttributeValues={":v": 7, ":one": 1},
+        ReturnValues="ALL_NEW",
+    )["Attributes"]
+    table.update_item(Key={"id": "a"}, UpdateExpression="ADD hits :one", ExpressionAttributeValues={":one": 1})
+
+    assert attributes["checkpoints"] == {"blueprint": 7}
+    assert (attributes["created"], attributes["leaseExpiresAt"], attributes["hits"]) == (7, 100, 1)
+    assert table.items["a"]["hits"] == 2
+
+
+def test_unsupported_updates_raise(table):
+    with pytest.raises(ValueError):
+        table.update_item(Key={"id": "a"}, UpdateExpression="SET hits = hits + :one",
+                          ExpressionAttributeValues={":one": 1})
+
+
+def test_scans_apply_the_filter(make_table):
+    table = make_table("id", [{"id": "a", "createdAt": 5}, {"id": "b", "createdAt": 9}, {"id": "c"}])
+
+    items = table.scan(FilterExpression="#since >= :since", ExpressionAttributeNames={"#since": "createdAt"},
+                       ExpressionAttributeValues={":since": 6})["Items"]
+
+    assert [item["id"] for item in items] == ["b"]
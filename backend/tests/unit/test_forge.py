@@ -0,0 +1,108 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "forge_app", os.path.join(os.path.dirname(__file__), "..", "..", "forge_function", "app.py")
+)
+forge_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(forge_app)
+
+
+class FakeCatalog:
+    def __init__(self, skus):
+        self.skus = skus
+        self.lookups = []
+
+    def get(self, sku):
+        self.lookups.append(sku)
+        return {"sku": sku} if sku in self.skus else None
+
+
+class FakeClient:
+    """
+    Records the calls made on a low-level boto3 client (DynamoDB or Lambda).
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def put_item(self, **kwargs):
+        self.calls.append(("put_item", kwargs))
+
+    def invoke(self, **kwargs):
+        self.calls.append(("invoke", kwargs))
+
+
+@pytest.fixture
+def forge(monkeypatch):
+    catalog = FakeCatalog({"PROD-TV"})
+    dynamodb_client, lambda_client = FakeClient(), FakeClient()
+    monkeypatch.setattr(forge_app, "catalog", catalog)
+    monkeypatch.setattr(forge_app, "dynamodb_client", dynamodb_client)
+    monkeypatch.setattr(forge_app, "lambda_client", lambda_client)
+    return catalog, dynamodb_client, lambda_client
+
+
+def forge_request(body):
+    return forge_app.lambda_handler({"body": json.dumps(body)}, "")
+
+
+def test_known_skus_create_a_job_and_invoke_the_worker(forge):
+    catalog, dynamodb_client, lambda_client = forge
+
+    ret = forge_request({"sku": "PROD-TV", "user_context": "Diwali offer"})
+
+    assert ret["statusCode"] == 202
+    assert catalog.lookups == ["PROD-TV"]
+    assert [name for name, _ in dynamodb_client.calls + lambda_client.calls] == ["put_item", "invoke"]
+
+
+@pytest.mark.parametrize("body", [
+    {"user_context": "Diwali offer"},
+    {"sku": "", "user_context": "Diwali offer"},
+    {"sku": "   ", "user_context": "Diwali offer"},
+    {"sku": 42, "user_context": "Diwali offer"},
+    {"sku": ["PROD-TV"], "user_context": "Diwali offer"},
+])
+def test_missing_empty_or_non_string_skus_are_rejected_before_the_lookup(forge, body):
+    catalog, dynamodb_client, lambda_client = forge
+
+    ret = forge_request(body)
+
+    assert ret["statusCode"] == 400
+    assert "sku" in json.loads(ret["body"])["message"]
+    assert catalog.lookups == [] and dynamodb_client.calls == [] and lambda_client.calls == []
+
+
+def test_unknown_skus_are_rejected(forge):
+    _, dynamodb_client, _ = forge
+
+    ret = forge_request({"sku": "PROD-UNKNOWN", "user_context": "Diwali offer"})
+
+    assert ret["statusCode"] == 400
+    assert dynamodb_client.calls == []
+
+
+@pytest.mark.parametrize("fresh", [True, False])
+def test_fresh_is_passed_on_to_the_worker(forge, fresh):
+    _, dynamodb_client, _ = forge
+
+    ret = forge_request({"sku": "PROD-TV", "user_context": "Diwali offer", "fresh": fresh})
+
+    assert ret["statusCode"] == 202
+    (_, put), = dynamodb_client.calls
+    assert put["Item"]["requestBody"]["M"]["fresh"] == {"BOOL": fresh}
+
+
+@pytest.mark.parametrize("fresh", ["true", "yes", 1, 0, None, {}])
+def test_non_boolean_fresh_values_are_rejected(forge, fresh):
+    _, dynamodb_client, lambda_client = forge
+
+    ret = forge_request({"sku": "PROD-TV", "user_context": "Diwali offer", "fresh": fresh})
+
+    assert ret["statusCode"] == 400
+    assert "fresh" in json.loads(ret["body"])["message"]
+    assert dynamodb_client.calls == [] and lambda_client.calls == []
@@ -0,0 +1,35 @@
+import json
+
+from json_stream import JsonArrayStreamParser
+
+
+BLUEPRINT = {
+    "acts": [{"prompt": 'a view of a "calm" beach ]}'}, "a scene showing a family", 3],
+    "voiceover_script": "ಈಗ ನಿಮ್ಮ ನೆಚ್ಚಿನ ಧಾರಾವಾಹಿಯನ್ನು",
+    "voice_id": "wlmwDR77ptH6bKHZui0l",
+}
+
+
+def test_elements_are_returned_as_soon_as_they_complete():
+    parser = JsonArrayStreamParser("acts")
+
+    assert parser.feed('{"acts": ["a view of') == []
+    assert parser.feed(' a beach", "a scene') == ["a view of a beach"]
+    assert parser.feed('", {"prompt": "x"}], "voice_id": "v"}') == ["a scene", {"prompt": "x"}]
+
+
+def test_any_chunking_yields_the_same_elements():
+    document = json.dumps(BLUEPRINT, ensure_ascii=False)
+    for size in (1, 2, 5, 17, len(document)):
+        parser = JsonArrayStreamParser("acts")
+        elements = []
+        for i in range(0, len(document), size):
+            elements.extend(parser.feed(document[i:i + size]))
+        assert elements == BLUEPRINT["acts"]
+
+
+def test_only_the_top_level_key_is_parsed():
+    parser = JsonArrayStreamParser("acts")
+    document = '{"meta": {"acts": ["nested"]}, "acts": ["top"], "other": ["x"]}'
+
+    assert parser.feed(document) == ["top"]
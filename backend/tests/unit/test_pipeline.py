@@ -0,0 +1,240 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline import Pipeline, PipelineError
+
+
+def test_stages_receive_inputs_in_declared_order():
+    pipeline = Pipeline(max_workers=2)
+    pipeline.add_stage("a", lambda: 1)
+    pipeline.add_stage("b", lambda: 2)
+    pipeline.add_stage("c", lambda b, a: (b, a), inputs=("b", "a"))
+
+    results = pipeline.run()
+
+    assert results["c"] == (2, 1)
+
+
+def test_independent_stages_overlap():
+    pipeline = Pipeline(max_workers=3)
+    pipeline.add_stage("root", lambda: None)
+    for name in ("x", "y", "z"):
+        pipeline.add_stage(name, lambda _: time.sleep(0.2), inputs=("root",))
+
+    started = time.time()
+    pipeline.run()
+
+    assert time.time() - started < 0.5
+    assert all(pipeline.timings[n]["start"] < pipeline.timings["x"]["end"] for n in ("y", "z"))
+
+
+def test_concurrency_cap_is_respected():
+    pipeline = Pipeline(max_workers=1)
+    for name in ("x", "y"):
+        pipeline.add_stage(name, lambda: time.sleep(0.1))
+
+    pipeline.run()
+
+    first, second = sorted(pipeline.timings.values(), key=lambda t: t["start"])
+    assert second["start"] >= first["end"]
+
+
+def test_failure_stops_dependent_stages():
+    def boom():
+        raise ValueError("provider down")
+
+    pipeline = Pipeline()
+    pipeline.add_stage("a", boom)
+    pipeline.add_stage("b", lambda a: a, inputs=("a",))
+
+    with pytest.raises(PipelineError) as excinfo:
+        pipeline.run()
+
+    assert excinfo.value.stage_name == "a"
+    assert "b" not in pipeline.timings
+
+
+def test_unknown_input_and_cycles_are_rejected():
+    pipeline = Pipeline()
+    pipeline.add_stage("a", lambda b: b, inputs=("b",))
+    pipeline.add_stage("b", lambda a: a, inputs=("a",))
+    with pytest.raises(ValueError):
+        pipeline.run()
+
+    pipeline = Pipeline()
+    pipeline.add_stage("a", lambda x: x, inputs=("missing",))
+    with pytest.raises(ValueError):
+        pipeline.run()
+
+
+def test_critical_path_follows_latest_input():
+    pipeline = Pipeline(max_workers=3)
+    pipeline.add_stage("secrets", lambda: None)
+    pipeline.add_stage("fast", lambda _: None, inputs=("secrets",))
+    pipeline.add_stage("slow", lambda _: time.sleep(0.1), inputs=("secrets",))
+    pipeline.add_stage("render", lambda a, b: None, inputs=("fast", "slow"))
+
+    pipeline.run()
+
+    assert pipeline.critical_path() == ["secrets", "slow", "render"]
+
+
+def test_run_async_awaits_coroutine_stages():
+    async def slow(value):
+        await asyncio.sleep(0.2)
+        return value * 2
+
+    pipeline = Pipeline(max_workers=3)
+    pipeline.add_stage("root", lambda: 1)
+    for name in ("x", "y", "z"):
+        pipeline.add_stage(name, slow, inputs=("root",))
+    pipeline.add_stage("sum", lambda x, y, z: x + y + z, inputs=("x", "y", "z"))
+
+    started = time.time()
+    results = asyncio.run(pipeline.run_async())
+
+    assert results["sum"] == 6
+    assert time.time() - started < 0.5
+
+
+def test_run_async_failure_stops_dependent_stages():
+    async def boom():
+        raise ValueError("provider down")
+
+    pipeline = Pipeline()
+    pipeline.add_stage("a", boom)
+    pipeline.add_stage("b", lambda a: a, inputs=("a",))
+
+    with pytest.raises(PipelineError):
+        asyncio.run(pipeline.run_async())
+    assert "b" not in pipeline.timings
+
+
+def test_checkpointed_stages_are_saved_and_skipped_on_resume():
+    calls = []
+    saved = {}
+
+    def build(completed=None):
+        pipeline = Pipeline(completed=completed, on_checkpoint=saved.__setitem__)
+        pipeline.add_stage("secrets", lambda: calls.append("secrets") or "key")
+        pipeline.add_stage("catalog", lambda: calls.append("catalog") or "product")
+        pipeline.add_stage(
+            "blueprint", lambda s, c: calls.append("blueprint") or "bp",
+            inputs=("secrets", "catalog"), checkpoint=True,
+        )
+        pipeline.add_stage(
+            "render_submit", lambda s, bp: calls.append("render_submit") or "render-1",
+            inputs=("secrets", "blueprint"), checkpoint=True,
+        )
+        pipeline.add_stage(
+            "render", lambda s, render_id: calls.append("render") or f"url:{render_id}",
+            inputs=("secrets", "render_submit"),
+        )
+        return pipeline
+
+    assert build().run()["render"] == "url:render-1"
+    assert saved == {"blueprint": "bp", "render_submit": "render-1"}
+
+    calls.clear()
+    results = build(completed={"blueprint": "bp", "render_submit": "render-1"}).run()
+
+    assert results["render"] == "url:render-1"
+    assert calls == ["secrets", "render"]
+
+
+def test_completed_results_of_uncheckpointed_stages_are_ignored():
+    pipeline = Pipeline(completed={"secrets": "stale"})
+    pipeline.add_stage("secrets", lambda: "fresh")
+
+    assert pipeline.run()["secrets"] == "fresh"
+
+
+def test_emitted_outputs_start_dependents_before_the_producer_finishes():
+    def produce(emit):
+        emit("part", "early")
+        time.sleep(0.2)
+        return {"part": "early", "rest": "late"}
+
+    pipeline = Pipeline(max_workers=2)
+    pipeline.add_stage("producer", produce, outputs={"part": lambda result: result["part"]})
+    pipeline.add_stage("consumer", lambda part: part.upper(), inputs=("part",))
+
+    results = pipeline.run()
+
+    assert results["consumer"] == "EARLY"
+    assert pipeline.timings["consumer"]["end"] < pipeline.timings["producer"]["end"]
+    assert pipeline.critical_path() == ["producer"]
+
+
+def test_outputs_are_extracted_from_checkpointed_results():
+    pipeline = Pipeline(completed={"producer": {"part": "saved"}})
+    pipeline.add_stage(
+        "producer", lambda emit: None, checkpoint=True,
+        outputs={"part": lambda result: result["part"]},
+    )
+    pipeline.add_stage("consumer", lambda part: part, inputs=("part",))
+
+    assert pipeline.run()["consumer"] == "saved"
+    assert "producer" not in pipeline.timings
+
+
+def test_run_async_supports_emitted_outputs():
+    async def produce(emit):
+        emit("part", 1)
+        await asyncio.sleep(0.2)
+        return {"part": 1}
+
+    pipeline = Pipeline(max_workers=2)
+    pipeline.add_stage("producer", produce, outputs={"part": lambda result: result["part"]})
+    pipeline.add_stage("consumer", lambda part: part + 1, inputs=("part",))
+
+    assert asyncio.run(pipeline.run_async())["consumer"] == 2
+    assert pipeline.timings["consumer"]["end"] < pipeline.timings["producer"]["end"]
+
+
+def streaming_pipeline(produce, saved, completed=None):
+    pipeline = Pipeline(max_workers=2, completed=completed, on_checkpoint=lambda name, result: saved.append(name))
+    pipeline.add_stage("producer", produce, checkpoint=True, outputs={"part": lambda result: result["part"]})
+    pipeline.add_stage("consumer", lambda part: part.upper(), inputs=("part",), checkpoint=True)
+    return pipeline
+
+
+@pytest.mark.parametrize("run", [
+    lambda pipeline: pipeline.run(),
+    lambda pipeline: asyncio.run(pipeline.run_async()),
+], ids=["threads", "async"])
+def test_stages_fed_by_early_outputs_are_checkpointed_after_their_producer(run):
+    def produce(emit):
+        emit("part", "early")
+        time.sleep(0.2)
+        return {"part": "early"}
+
+    saved = []
+    run(streaming_pipeline(produce, saved))
+
+    assert saved == ["producer", "consumer"]
+
+
+def test_stages_fed_by_early_outputs_of_a_failed_producer_are_not_checkpointed():
+    def produce(emit):
+        emit("part", "early")
+        time.sleep(0.2)
+        raise ValueError("stream broke")
+
+    saved = []
+    pipeline = streaming_pipeline(produce, saved)
+
+    with pytest.raises(PipelineError):
+        pipeline.run()
+    assert pipeline.results["consumer"] == "EARLY"
+    assert saved == []
+
+
+def test_checkpoints_fed_by_an_uncheckpointed_producer_are_not_reused():
+    saved = []
+    pipeline = streaming_pipeline(lambda emit: {"part": "new"}, saved, completed={"consumer": "OLD"})
+
+    assert pipeline.run()["consumer"] == "NEW"
+    assert saved == ["producer", "consumer"]
@@ -0,0 +1,165 @@
+import importlib.util
+import os
+import threading
+import time
+
+import pytest
+
+import aio
+import app
+import prewarm
+import video_client
+from asset_store import AssetStore
+from blueprint_cache import BlueprintCache
+
+spec = importlib.util.spec_from_file_location(
+    "provider_stub", os.path.join(os.path.dirname(__file__), "..", "..", "local", "provider_stub.py")
+)
+provider_stub = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(provider_stub)
+
+NOW = int(time.time())
+DAY = 86400
+
+
+def job(job_id, sku, context, acts, script, created_at=NOW - DAY):
+    return {
+        'jobId': job_id, 'createdAt': created_at,
+        'requestBody': {'sku': sku, 'user_context': context, 'language': 'English'},
+        'checkpoints': {'blueprint': {
+            'acts': [{'prompt': prompt} for prompt in acts], 'voiceover_script': script, 'voice_id': 'voice-1',
+        }},
+    }
+
+
+POPULAR_ACTS = ["a family watching a big TV", "a close-up of the TV remote", "friends cheering at a match"]
+RARE_ACTS = ["a fridge in a kitchen", "a chef opening the fridge", "fresh vegetables"]
+
+
+@pytest.fixture
+def worker(monkeypatch, make_table, cache_table, s3):
+    stub = provider_stub.ProviderStub(("127.0.0.1", 0))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    jobs = make_table('jobId', [
+        job('1', 'TV-55', 'Diwali offer', POPULAR_ACTS, "Celebrate with the new TV."),
+        job('2', 'TV-55', ' diwali  OFFER', POPULAR_ACTS, "Celebrate with the new TV."),
+        job('3', 'TV-55', 'Diwali offer', POPULAR_ACTS, "Celebrate with the new TV."),
+        job('4', 'FRIDGE-1', 'Summer sale', RARE_ACTS, "Stay cool."),
+        job('5', 'FRIDGE-1', 'Summer sale', RARE_ACTS, "Stay cool.", created_at=NOW - 30 * DAY),
+    ])
+    cache = cache_table
+    tables = {'jobs': jobs, 'clips': cache}
+
+    async def load_secrets_async(mode):
+        return {"openrouter": "or-key", "elevenlabs": "el-key", "hf": "r8_key", "shotstack": "ss-key"}
+
+    monkeypatch.setattr(app.dynamodb, "Table", lambda name: tables[name])
+    monkeypatch.setattr(app, "JOBS_TABLE_NAME", "jobs")
+    monkeypatch.setattr(app, "CLIP_CACHE_TABLE_NAME", "clips")
+    monkeypatch.setattr(app, "PRODUCT_DB_BUCKET", "bucket")
+    monkeypatch.setattr(app, "VIDEO_API_URL", stub.base_url)
+    monkeypatch.setattr(app, "ELEVENLABS_API_URL", f"{stub.base_url}/v1")
+    monkeypatch.setattr(app, "asset_store", AssetStore(s3))
+    monkeypatch.setattr(app, "blueprint_cache", None)
+    monkeypatch.setattr(app, "WORKER_MODE", "full")
+    monkeypatch.setattr(app, "load_secrets_async", load_secrets_async)
+    monkeypatch.setattr(prewarm, "PREWARM_CLIP_COST_USD", 0.50)
+    monkeypatch.setattr(prewarm, "PREWARM_VOICEOVER_COST_USD", 0.05)
+    app.video_clients.clear()
+    video_client._provider_models.clear()
+    yield stub, cache, s3
+    stub.shutdown()
+    app.video_clients.clear()
+    video_client._provider_models.clear()
+
+
+def test_popular_campaigns_are_warmed_within_the_budget(worker):
+    stub, cache, s3 = worker
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 1.2}, 900, now=NOW))
+
+    # Only the campaign requested three times is popular; its voiceover and two of its clips fit the budget
+    assert sorted(request["prompt"] for request in stub.clips) == sorted(POPULAR_ACTS[:2])
+    assert [request["text"] for request in stub.voiceovers] == ["Celebrate with the new TV."]
+    assert (report["clips"], report["voiceovers"], report["overBudget"], report["spentCents"]) == (2, 1, 1, 105)
+    assert len(s3.objects) == 3
+
+    # A peak-hour job now hits the warm entries without calling the providers
+    clip_cache = app.get_clip_cache(cache)
+    assert [clip_cache.peek(prompt, app.video_router.routes) for prompt in POPULAR_ACTS] == [True, True, False]
+    uri = aio.run_sync(app.generate_voiceover_async("Celebrate with the new TV.", "voice-1", "el-key", "bucket", cache))
+    assert uri.startswith("s3://bucket/audio/") and len(stub.voiceovers) == 1
+
+    # Pre-warming lookups are not counted as cache misses; its spend is
+    stats = next(item for key, item in cache.items.items() if key.startswith("stats#"))
+    assert "misses" not in stats and "voiceoverMisses" not in stats
+    assert (stats["prewarmSpentCents"], stats["voiceoverHits"]) == (105, 1)
+
+
+def test_the_daily_budget_is_shared_across_runs(worker):
+    stub, cache, _ = worker
+
+    aio.run_sync(prewarm.prewarm_async({"budgetUsd": 1.2}, 900, now=NOW))
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 1.2}, 900, now=NOW))
+
+    assert (report["clips"], report["warm"], report["spentCents"]) == (0, 3, 0)
+    assert len(stub.clips) == 2
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 2.0}, 900, now=NOW))
+    assert (report["clips"], report["warm"], report["spentCents"]) == (1, 3, 50)
+    assert sorted(request["prompt"] for request in stub.clips) == sorted(POPULAR_ACTS)
+
+
+def test_dry_runs_and_expired_deadlines_generate_nothing(worker):
+    stub, cache, _ = worker
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 5, "dryRun": True}, 900, now=NOW))
+    assert (report["spentCents"], stub.clips, stub.voiceovers) == (155, [], [])
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 5}, prewarm.PREWARM_SAFETY_SECONDS, now=NOW))
+    assert (report["pastDeadline"], report["spentCents"], stub.clips) == (4, 0, [])
+
+
+def test_audio_mode_only_warms_voiceovers(worker, monkeypatch):
+    stub, _, _ = worker
+    monkeypatch.setattr(app, "WORKER_MODE", "audio")
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 5}, 900, now=NOW))
+
+    assert (report["clips"], report["voiceovers"], report["spentCents"]) == (0, 1, 5)
+    assert stub.clips == []
+
+
+def test_a_campaign_whose_blueprint_fails_is_counted_and_skipped(worker, make_table, monkeypatch):
+    stub, _, _ = worker
+    app.dynamodb.Table("jobs").put_item(Item=job('6', 'FRIDGE-1', 'Summer sale', RARE_ACTS, "Stay cool."))
+    monkeypatch.setattr(app, "blueprint_cache", BlueprintCache(make_table('blueprintKey')))
+
+    async def load_product_async(bucket_name, sku):
+        if sku == 'TV-55':
+            raise KeyError(sku)
+        return {"productName": "Fridge"}
+
+    async def get_ad_blueprint_async(sku, product_data, user_context, api_key, language):
+        return {'acts': [{'prompt': prompt} for prompt in RARE_ACTS], 'voiceover_script': "Stay cool.",
+                'voice_id': 'voice-1'}
+
+    monkeypatch.setattr(app, "load_product_async", load_product_async)
+    monkeypatch.setattr(app, "get_ad_blueprint_async", get_ad_blueprint_async)
+
+    report = aio.run_sync(prewarm.prewarm_async({"budgetUsd": 5}, 900, now=NOW))
+
+    assert (report["failed"], report["campaigns"], report["blueprints"]) == (1, 1, 1)
+    assert sorted(request["prompt"] for request in stub.clips) == sorted(RARE_ACTS)
+    assert [request["text"] for request in stub.voiceovers] == ["Stay cool."]
+
+
+def test_hot_prompts_missing_for_the_current_routes_are_candidates():
+    entries = [
+        {"promptHash": "v2#old-model", "promptText": "a family watching a big TV", "s3_uri": "s3://b/a.mp4", "hitCount": 9},
+        {"promptHash": "v2#rare", "promptText": "a fridge", "s3_uri": "s3://b/b.mp4", "hitCount": 1},
+        {"promptHash": "tts#x", "scriptText": "Stay cool.", "s3_uri": "s3://b/c.mp3", "hitCount": 7},
+    ]
+
+    assert prewarm.hot_prompts(entries, 2) == [("a family watching a big TV", 9)]
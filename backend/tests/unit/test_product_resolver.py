@@ -0,0 +1,55 @@
+import time
+
+from product_resolver import ProductResolver, normalize_text
+
+CATALOG = [
+    ("PROD-WW12T504DAB", {"productName": "Bespoke AI™ EcoBubble™ Washer"}),
+    ("PROD-S24ULTRA", {"productName": "Galaxy S24 Ultra"}),
+    ("PROD-QN900D-TV", {"productName": "Samsung Neo QLED 8K TV"}),
+]
+
+
+def best_sku(resolver, query):
+    matches = resolver.resolve(query)
+    return matches[0]["sku"] if matches else None
+
+
+def test_normalize_text_splits_joined_up_names():
+    assert normalize_text("GalaxyS24Ultra") == ["galaxy", "s24", "ultra"]
+    assert normalize_text("Bespoke AI™ EcoBubble™") == ["bespoke", "ai", "eco", "bubble"]
+
+
+def test_resolves_spoken_typed_and_misspelled_names():
+    resolver = ProductResolver(CATALOG)
+
+    assert best_sku(resolver, "galaxy s24") == "PROD-S24ULTRA"
+    assert best_sku(resolver, "GalaxyS24Ultra") == "PROD-S24ULTRA"
+    assert best_sku(resolver, "NeoQLED8KTV") == "PROD-QN900D-TV"
+    assert best_sku(resolver, "bespoke washer") == "PROD-WW12T504DAB"
+    assert best_sku(resolver, "galxy ultra") == "PROD-S24ULTRA"
+    assert best_sku(resolver, "neo") == "PROD-QN900D-TV"
+    assert best_sku(resolver, "prod-s24ultra") == "PROD-S24ULTRA"
+
+
+def test_unrelated_queries_match_nothing():
+    resolver = ProductResolver(CATALOG)
+
+    assert resolver.resolve("refrigerator") == []
+    assert resolver.resolve("   ") == []
+
+
+def test_warm_lookups_stay_fast_on_a_large_catalog():
+    catalog = CATALOG + [
+        (f"PROD-GEN{i:05d}", {"productName": f"Generic Appliance Model {i} Series {i % 97}"})
+        for i in range(20000)
+    ]
+    resolver = ProductResolver(catalog)
+    resolver.resolve("galaxy s24 ultra")
+
+    start = time.perf_counter()
+    for _ in range(10):
+        sku = best_sku(resolver, "galaxy s24 ultra")
+    elapsed_ms = (time.perf_counter() - start) * 100
+
+    assert sku == "PROD-S24ULTRA"
+    assert elapsed_ms < 50
@@ -0,0 +1,66 @@
+import asyncio
+from decimal import Decimal
+
+import pytest
+
+from rate_limiter import (
+    CONTENTION_RETRY_SECONDS,
+    DynamoTokenBucketStore,
+    MemoryTokenBucketStore,
+    RateLimiter,
+    RateLimitTimeout,
+    parse_budgets,
+)
+
+
+def test_parse_budgets():
+    budgets = parse_budgets("openrouter=60:10, elevenlabs=30")
+
+    assert budgets == {"openrouter": (1.0, 10.0), "elevenlabs": (0.5, 5.0)}
+    with pytest.raises(ValueError):
+        parse_budgets("openrouter=fast")
+
+
+@pytest.mark.parametrize("backend", ["memory", "dynamodb"])
+def test_bucket_allows_a_burst_then_reports_the_refill_time(backend, make_table):
+    store = MemoryTokenBucketStore() if backend == "memory" else DynamoTokenBucketStore(make_table('bucketKey'))
+
+    assert [store.try_acquire("p", 1.0, 3, 1, 100.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.try_acquire("p", 1.0, 3, 1, 100.0) == pytest.approx(1.0)
+    assert store.try_acquire("p", 1.0, 3, 1, 101.0) == 0.0
+
+
+def test_dynamo_bucket_backs_off_when_another_worker_wins_the_race(make_table):
+    table = make_table('bucketKey')
+    store = DynamoTokenBucketStore(table)
+    store.try_acquire("p", 1.0, 3, 1, 100.0)
+
+    def another_worker_updates_the_bucket(table):
+        table.items["p"]["updatedAt"] += 1
+
+    table.interleave = another_worker_updates_the_bucket
+    assert store.try_acquire("p", 1.0, 3, 1, 100.5) == CONTENTION_RETRY_SECONDS
+    assert table.items["p"]["tokens"] == Decimal("2.0")
+
+
+def test_limiter_waits_for_capacity_instead_of_failing(clock):
+    limiter = RateLimiter(MemoryTokenBucketStore(), {"video": (0.5, 1)}, clock=clock, sleep=clock.sleep)
+
+    async def burst():
+        return [await limiter.acquire("video") for _ in range(3)]
+
+    waits = asyncio.run(burst())
+
+    assert waits[0] == 0.0
+    assert all(2.0 <= wait <= 2.5 for wait in waits[1:])
+    assert asyncio.run(limiter.acquire("unlimited")) == 0.0
+
+
+def test_limiter_gives_up_after_max_wait(clock):
+    limiter = RateLimiter(
+        MemoryTokenBucketStore(), {"video": (0.01, 1)}, max_wait=10, clock=clock, sleep=clock.sleep
+    )
+    asyncio.run(limiter.acquire("video"))
+
+    with pytest.raises(RateLimitTimeout):
+        asyncio.run(limiter.acquire("video"))
@@ -0,0 +1,74 @@
+import hashlib
+
+from asset_store import AssetStore
+from render_cache import RenderCache, replace_sources, timeline_fingerprint, timeline_sources
+
+CLIP = "s3://bucket/cached_clips/" + hashlib.sha256(b"clip").hexdigest() + ".mp4"
+AUDIO = "s3://bucket/audio/" + hashlib.sha256(b"voice").hexdigest() + ".mp3"
+SHOT = "s3://bucket/curated_clips/tv/front.mp4"
+MUSIC = "s3://bucket/music/background_music.mp3"
+
+
+def payload(clip=CLIP, music_volume=0.2, callback=None):
+    body = {
+        "timeline": {"tracks": [
+            {"clips": [{"asset": {"type": "video", "src": clip}, "start": 0, "length": 5},
+                       {"asset": {"type": "video", "src": SHOT, "volume": 0}, "start": 5, "length": 4}]},
+            {"clips": [{"asset": {"type": "audio", "src": AUDIO, "volume": 1}, "start": 0, "length": 7}]},
+            {"clips": [{"asset": {"type": "audio", "src": MUSIC, "volume": music_volume}, "start": 0, "length": 7}]},
+        ]},
+        "output": {"format": "mp4", "resolution": "hd"},
+    }
+    if callback:
+        body["callback"] = callback
+    return body
+
+
+def content_ids(body, etags, make_s3):
+    s3 = make_s3()
+    for key, etag in etags.items():
+        s3.add(key, etag=etag)
+    store = AssetStore(s3)
+    return {uri: store.content_id(uri) for uri in timeline_sources(body)}
+
+
+def test_content_ids_come_from_the_key_hash_or_the_etag(s3):
+    s3.add("curated_clips/tv/front.mp4", etag="abc123")
+    store = AssetStore(s3)
+
+    assert store.content_id(CLIP) == f"sha256:{hashlib.sha256(b'clip').hexdigest()}"
+    assert store.content_id(SHOT) == "etag:abc123"
+    assert s3.requests == [("HeadObject", "curated_clips/tv/front.mp4")]
+
+
+def test_fingerprints_ignore_urls_and_callbacks_but_not_content_or_layout(make_s3):
+    etags = {"curated_clips/tv/front.mp4": "shot-v1", "music/background_music.mp3": "music-v1"}
+    body = payload()
+    fingerprint = timeline_fingerprint(body, content_ids(body, etags, make_s3))
+
+    presigned = replace_sources(body, lambda uri: uri.replace("s3://bucket/", "https://bucket.s3/") + "?X-Amz-Signature=1")
+    assert timeline_sources(presigned)[0].startswith("https://")
+    assert timeline_sources(body)[0] == CLIP
+
+    with_callback = payload(callback="https://api/render-callback?jobId=2")
+    assert timeline_fingerprint(with_callback, content_ids(with_callback, etags, make_s3)) == fingerprint
+
+    other_clip = payload(clip="s3://bucket/cached_clips/" + hashlib.sha256(b"other").hexdigest() + ".mp4")
+    assert timeline_fingerprint(other_clip, content_ids(other_clip, etags, make_s3)) != fingerprint
+    quieter = payload(music_volume=0.1)
+    assert timeline_fingerprint(quieter, content_ids(quieter, etags, make_s3)) != fingerprint
+    new_shot = {**etags, "curated_clips/tv/front.mp4": "shot-v2"}
+    assert timeline_fingerprint(body, content_ids(body, new_shot, make_s3)) != fingerprint
+
+
+def test_stored_renders_are_served_and_counted(cache_table):
+    table = cache_table
+    cache = RenderCache(table, ttl_seconds=100, clock=lambda: 1000)
+
+    assert cache.get("f" * 64) is None
+    cache.put("f" * 64, "s3://bucket/renders/" + "f" * 64 + ".mp4", 12_000_000, "render-1")
+
+    assert cache.get("f" * 64) == "s3://bucket/renders/" + "f" * 64 + ".mp4"
+    assert table.items["render#" + "f" * 64]['expiresAt'] == 1100
+    stats = next(item for key, item in table.items.items() if key.startswith("stats#"))
+    assert (stats['renderHits'], stats['renderMisses']) == (1, 1)
@@ -0,0 +1,203 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+def load_module(relative_path, name):
+    # Every function has its own 'app.py', so load them by path under unique names
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BACKEND_DIR, relative_path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+callback_app = load_module("render_callback_function/app.py", "render_callback_app")
+shotstack_stub = load_module("local/shotstack_stub.py", "shotstack_stub")
+
+
+class FakeJobsTable:
+    def __init__(self, item):
+        self.item = item
+        self.updates = []
+
+    def get_item(self, Key):
+        return {"Item": self.item} if Key["jobId"] == self.item["jobId"] else {}
+
+    def update_item(self, **kwargs):
+        self.updates.append(kwargs)
+        self.item["status"] = kwargs["ExpressionAttributeValues"][":status"]
+
+
+@pytest.fixture()
+def jobs_table(monkeypatch):
+    table = FakeJobsTable(
+        {"jobId": "job-1", "status": "RENDERING", "checkpoints": {"render_submit": "render-1"}}
+    )
+    monkeypatch.setattr(callback_app.dynamodb, "Table", lambda name: table)
+    return table
+
+
+def callback_event(job_id, body):
+    return {"queryStringParameters": {"jobId": job_id}, "body": json.dumps(body)}
+
+
+def test_done_notification_completes_the_job(jobs_table):
+    ret = callback_app.lambda_handler(
+        callback_event("job-1", {"id": "render-1", "status": "done", "url": "https://cdn/final.mp4"}), ""
+    )
+
+    assert ret["statusCode"] == 200
+    assert jobs_table.item["status"] == "COMPLETE"
+    assert jobs_table.updates[0]["ExpressionAttributeValues"][":url"] == "https://cdn/final.mp4"
+
+
+def test_failed_notification_fails_the_job_and_drops_the_render_checkpoint(jobs_table):
+    callback_app.lambda_handler(
+        callback_event("job-1", {"id": "render-1", "status": "failed", "error": "bad asset"}), ""
+    )
+
+    assert jobs_table.item["status"] == "FAILED"
+    assert "REMOVE checkpoints.render_submit" in jobs_table.updates[0]["UpdateExpression"]
+
+
+def test_notifications_for_other_renders_are_rejected(jobs_table):
+    ret = callback_app.lambda_handler(
+        callback_event("job-1", {"id": "someone-elses-render", "status": "done"}), ""
+    )
+
+    assert ret["statusCode"] == 404
+    assert jobs_table.updates == []
+
+
+def test_stub_render_service_posts_the_callback(jobs_table):
+    received = []
+
+    class CallbackReceiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+            job_id = self.path.split("jobId=")[1]
+            received.append(callback_app.lambda_handler(callback_event(job_id, json.loads(body)), ""))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    receiver = HTTPServer(("127.0.0.1", 0), CallbackReceiver)
+    stub = shotstack_stub.ShotstackStub(("127.0.0.1", 0), render_seconds=0.1)
+    for server in (receiver, stub):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        request = shotstack_stub.urllib.request.Request(
+            f"{stub.base_url}/render",
+            data=json.dumps({"timeline": {}, "callback": f"http://127.0.0.1:{receiver.server_port}/?jobId=job-1"}).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with shotstack_stub.urllib.request.urlopen(request) as response:
+            render_id = json.loads(response.read())["response"]["id"]
+        jobs_table.item["checkpoints"]["render_submit"] = render_id
+
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        receiver.shutdown()
+        stub.shutdown()
+
+    assert received and received[0]["statusCode"] == 200
+    assert jobs_table.item["status"] == "COMPLETE"
+
+
+class WriteOnlyS3:
+    """
+    The render callback function's view of the bucket: S3WritePolicy allows
+    uploads but no reads, so e.g. HeadObject is denied.
+    """
+
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def upload_fileobj(self, *args, **kwargs):
+        return self.s3.upload_fileobj(*args, **kwargs)
+
+
+def test_renders_finished_through_the_webhook_are_reused_for_identical_timelines(make_table, cache_table, s3,
+                                                                                 monkeypatch):
+    import app as worker_app
+    from asset_store import AssetStore
+
+    jobs = make_table("jobId", [{"jobId": "job-1", "status": "RENDERING", "checkpoints": {}}])
+    tables = {"jobs": jobs, "clips": cache_table}
+    for module in (worker_app, callback_app):
+        monkeypatch.setattr(module.dynamodb, "Table", lambda name: tables[name])
+        for name, value in {"RENDER_CACHE": "on", "CLIP_CACHE_TABLE_NAME": "clips", "PRODUCT_DB_BUCKET": "bucket"}.items():
+            monkeypatch.setattr(module, name, value)
+    monkeypatch.setattr(callback_app, "JOBS_TABLE_NAME", "jobs")
+    monkeypatch.setattr(callback_app, "s3", WriteOnlyS3(s3))
+    monkeypatch.setattr(worker_app, "asset_store", AssetStore(s3))
+
+    assets = {
+        "product_shots": ["s3://bucket/curated_clips/tv/front.mp4", "s3://bucket/curated_clips/tv/side.mp4"],
+        "logo": "s3://bucket/curated_clips/logo.mp4",
+        "music": "s3://bucket/music/background_music.mp3",
+    }
+    for uri in [*assets["product_shots"], assets["logo"], assets["music"]]:
+        s3.add(uri.removeprefix("s3://bucket/"), uri.encode())
+    clip_uris = [f"s3://bucket/cached_clips/{str(i) * 64}.mp4" for i in range(3)]
+    voiceover_uri = f"s3://bucket/audio/{'a' * 64}.mp3"
+
+    received = []
+
+    class CallbackReceiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+            job_id = self.path.split("jobId=")[1]
+            received.append(callback_app.lambda_handler(callback_event(job_id, json.loads(body)), ""))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    receiver = HTTPServer(("127.0.0.1", 0), CallbackReceiver)
+    stub = shotstack_stub.ShotstackStub(("127.0.0.1", 0), render_seconds=0.2)
+    for server in (receiver, stub):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(worker_app, "SHOTSTACK_API_URL", stub.base_url)
+
+    try:
+        fingerprint = worker_app.fingerprint_render(clip_uris, voiceover_uri, assets)
+        render_id = worker_app.submit_timeline(
+            fingerprint, clip_uris, voiceover_uri, assets, "ss-key",
+            callback_url=f"http://127.0.0.1:{receiver.server_port}/?jobId=job-1",
+        )
+        jobs.items["job-1"]["checkpoints"] = {"render_fingerprint": fingerprint, "render_submit": render_id}
+
+        deadline = time.time() + 5
+        while not received and time.time() < deadline:
+            time.sleep(0.05)
+
+        stored = worker_app.submit_timeline(fingerprint, clip_uris, voiceover_uri, assets, "ss-key")
+    finally:
+        receiver.shutdown()
+        stub.shutdown()
+
+    video = f"stub video {render_id}".encode()
+    assert received and received[0]["statusCode"] == 200
+    assert jobs.items["job-1"]["status"] == "COMPLETE"
+    assert s3.objects[f"renders/{fingerprint}.mp4"] == video
+    entry = cache_table.items[f"render#{fingerprint}"]
+    assert (entry["s3_uri"], entry["sizeBytes"], entry["renderId"]) == (
+        f"s3://bucket/renders/{fingerprint}.mp4", len(video), render_id
+    )
+    assert stored == f"s3://bucket/renders/{fingerprint}.mp4"
+    assert len(stub.renders) == 1
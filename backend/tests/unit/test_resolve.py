@@ -0,0 +1,97 @@
+import importlib.util
+import json
+import os
+import threading
+import time
+
+import pytest
+
+spec = importlib.util.spec_from_file_location(
+    "resolve_app", os.path.join(os.path.dirname(__file__), "..", "..", "resolve_function", "app.py")
+)
+resolve_app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(resolve_app)
+
+
+class GatedCatalog:
+    """
+    A catalog whose scans block until `release` is set, like a slow scan of
+    a large table.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.scans = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def items(self):
+        self.scans += 1
+        assert self.release.wait(timeout=5)
+        return list(self.products)
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = GatedCatalog([("PROD-S24ULTRA", {"productName": "Galaxy S24 Ultra"})])
+    monkeypatch.setattr(resolve_app, "product_catalog", lambda: catalog)
+    monkeypatch.setattr(resolve_app, "resolver", None)
+    monkeypatch.setattr(resolve_app, "resolver_built_at", 0.0)
+    monkeypatch.setattr(resolve_app, "refreshing", False)
+    monkeypatch.setattr(resolve_app, "RESOLVER_INDEX_TTL_SECONDS", 300)
+    yield catalog
+    catalog.release.set()
+
+
+def resolve(query):
+    ret = resolve_app.lambda_handler({"queryStringParameters": {"q": query}}, "")
+    assert ret["statusCode"] == 200
+    return [match["sku"] for match in json.loads(ret["body"])["matches"]]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_a_cold_container_builds_the_index_once(catalog):
+    assert resolve("galaxy s24") == ["PROD-S24ULTRA"]
+    assert resolve("s24 ultra") == ["PROD-S24ULTRA"]
+    assert catalog.scans == 1
+
+
+def test_an_expired_index_is_served_while_it_is_rebuilt(catalog):
+    resolve("galaxy s24")
+    catalog.products.append(("PROD-QN900D-TV", {"productName": "Samsung Neo QLED 8K TV"}))
+    catalog.release.clear()
+    resolve_app.resolver_built_at -= resolve_app.RESOLVER_INDEX_TTL_SECONDS
+
+    start = time.perf_counter()
+    assert resolve("neo qled") == []
+    assert resolve("neo qled") == []
+    assert time.perf_counter() - start < 1
+    wait_for(lambda: catalog.scans == 2)
+
+    catalog.release.set()
+    wait_for(lambda: not resolve_app.refreshing)
+    assert resolve("neo qled") == ["PROD-QN900D-TV"]
+    assert catalog.scans == 2
+
+
+def test_a_failed_rebuild_keeps_the_current_index(catalog, monkeypatch):
+    resolve("galaxy s24")
+    resolve_app.resolver_built_at -= resolve_app.RESOLVER_INDEX_TTL_SECONDS
+
+    def broken_catalog():
+        raise RuntimeError("catalog unavailable")
+
+    monkeypatch.setattr(resolve_app, "product_catalog", broken_catalog)
+    assert resolve("galaxy s24") == ["PROD-S24ULTRA"]
+    wait_for(lambda: not resolve_app.refreshing)
+
+    monkeypatch.setattr(resolve_app, "product_catalog", lambda: catalog)
+    assert resolve("galaxy s24") == ["PROD-S24ULTRA"]
+    wait_for(lambda: not resolve_app.refreshing)
+    assert catalog.scans == 2
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from secret_cache import SecretCache
+
+
+class FakeSSM:
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+        self.fetched = threading.Event()
+        # Cleared to hold background refreshes back, like a slow Parameter Store
+        self.release = threading.Event()
+        self.release.set()
+
+    def get_parameters(self, Names, WithDecryption):
+        self.calls.append(list(Names))
+        self.fetched.set()
+        if threading.current_thread().name == "secret-refresh":
+            assert self.release.wait(5)
+        return {
+            "Parameters": [{"Name": n, "Value": self.values[n]} for n in Names if n in self.values],
+            "InvalidParameters": [n for n in Names if n not in self.values],
+        }
+
+
+def make_cache(ssm, clock):
+    return SecretCache(ssm, ["/ad-forge/a", "/ad-forge/b", None], ttl_seconds=300, clock=clock)
+
+
+def test_first_call_loads_every_configured_secret_in_one_batch(clock):
+    ssm = FakeSSM({"/ad-forge/a": "key-a", "/ad-forge/b": "key-b"})
+    cache = make_cache(ssm, clock)
+
+    assert cache.get_many(["/ad-forge/a"]) == {"/ad-forge/a": "key-a"}
+    assert cache.get("/ad-forge/b") == "key-b"
+    assert ssm.calls == [["/ad-forge/a", "/ad-forge/b"]]
+
+
+def test_stale_values_are_served_while_refreshing_in_the_background(clock):
+    ssm = FakeSSM({"/ad-forge/a": "key-a", "/ad-forge/b": "key-b"})
+    cache = make_cache(ssm, clock)
+    cache.get("/ad-forge/a")
+    ssm.fetched.clear()
+    ssm.values["/ad-forge/a"] = "rotated"
+
+    clock.now += 400
+    assert cache.get("/ad-forge/a") == "key-a"
+    assert ssm.fetched.wait(5)
+
+    for _ in range(100):
+        if cache.values["/ad-forge/a"] == "rotated":
+            break
+        threading.Event().wait(0.01)
+    assert cache.values["/ad-forge/a"] == "rotated"
+
+
+def test_values_past_max_staleness_are_refreshed_before_returning(clock):
+    ssm = FakeSSM({"/ad-forge/a": "key-a", "/ad-forge/b": "key-b"})
+    cache = make_cache(ssm, clock)
+    cache.get("/ad-forge/a")
+    ssm.values["/ad-forge/a"] = "rotated"
+
+    clock.now += 700
+    assert cache.get("/ad-forge/a") == "rotated"
+    assert len(ssm.calls) == 2
+
+
+def test_only_the_parameters_asked_for_must_exist(clock):
+    ssm = FakeSSM({"/ad-forge/a": "key-a"})
+    cache = make_cache(ssm, clock)
+
+    assert cache.get("/ad-forge/a") == "key-a"
+    with pytest.raises(KeyError, match="/ad-forge/b"):
+        cache.get_many(["/ad-forge/a", "/ad-forge/b"])
+    assert ssm.calls == [["/ad-forge/a", "/ad-forge/b"], ["/ad-forge/a", "/ad-forge/b"]]
+
+
+def test_a_foreground_refresh_does_not_end_a_background_one(clock):
+    ssm = FakeSSM({"/ad-forge/a": "key-a", "/ad-forge/b": "key-b", "/ad-forge/c": "key-c"})
+    cache = make_cache(ssm, clock)
+    cache.get("/ad-forge/a")
+    ssm.fetched.clear()
+    ssm.release.clear()
+
+    clock.now += 400
+    cache.get("/ad-forge/a")
+    assert ssm.fetched.wait(5)
+    assert cache.get("/ad-forge/c") == "key-c"
+
+    assert cache.refreshing
+    clock.now += 400
+    cache.get("/ad-forge/a")
+    assert len(ssm.calls) == 3
+
+    ssm.release.set()
+    for _ in range(100):
+        if not cache.refreshing:
+            break
+        threading.Event().wait(0.01)
+    assert not cache.refreshing
@@ -0,0 +1,115 @@
+import pytest
+from aiohttp import web
+
+import aio
+import video_client
+from video_client import TextToVideoClient
+
+VIDEO = b"\x00\x00\x00\x18ftypmp42" + b"x" * 200_000
+
+
+@pytest.fixture
+def provider_server():
+    """
+    A local stand-in for the Hub model API, Replicate and the Fal queue.
+    """
+    requests = []
+    fal_polls = {"count": 0}
+
+    async def model_info(request):
+        requests.append(("hub", request.match_info["model"], dict(request.query)))
+        return web.json_response({"inferenceProviderMapping": {
+            "replicate": {"providerId": "wan-video/wan-2.2-t2v", "status": "live"},
+            "fal-ai": {"providerId": "fal-ai/wan/v2.2/text-to-video", "status": "live"},
+        }})
+
+    async def replicate_predict(request):
+        requests.append(("replicate", request.headers.get("Prefer"), await request.json()))
+        return web.json_response({"output": [f"{base}/files/clip.mp4"]}, status=201)
+
+    async def fal_submit(request):
+        requests.append(("fal", request.headers.get("Authorization"), await request.json()))
+        return web.json_response({
+            "request_id": "abc",
+            "status": "IN_QUEUE",
+            "response_url": f"{base}/fal-ai/wan/requests/abc",
+        })
+
+    async def fal_status(request):
+        fal_polls["count"] += 1
+        return web.json_response({"status": "COMPLETED" if fal_polls["count"] >= 2 else "IN_PROGRESS"})
+
+    async def fal_result(request):
+        return web.json_response({"video": {"url": f"{base}/files/clip.mp4"}})
+
+    async def clip(request):
+        return web.Response(body=VIDEO, content_type="video/mp4")
+
+    app = web.Application()
+    app.router.add_get("/api/models/{model:.+}", model_info)
+    app.router.add_post("/v1/models/{owner}/{name}/predictions", replicate_predict)
+    app.router.add_post("/fal-ai/wan/v2.2/text-to-video", fal_submit)
+    app.router.add_get("/fal-ai/wan/requests/abc/status", fal_status)
+    app.router.add_get("/fal-ai/wan/requests/abc", fal_result)
+    app.router.add_get("/files/clip.mp4", clip)
+
+    async def start():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, site._server.sockets[0].getsockname()[1]
+
+    runner, port = aio.run_sync(start())
+    base = f"http://127.0.0.1:{port}"
+    video_client._provider_models.clear()
+    yield base, requests, fal_polls
+    aio.run_sync(runner.cleanup())
+    video_client._provider_models.clear()
+
+
+def test_replicate_maps_the_model_and_downloads_the_clip(provider_server):
+    base, requests, _ = provider_server
+    client = TextToVideoClient("replicate", "r8_key", base_url=base, hub_url=base)
+
+    video = aio.run_sync(client.text_to_video("a phone on a desk", model="Wan-AI/Wan2.2-T2V-A14B"))
+
+    assert video == VIDEO
+    assert requests[0] == ("hub", "Wan-AI/Wan2.2-T2V-A14B", {"expand[]": "inferenceProviderMapping"})
+    assert requests[1] == ("replicate", "wait", {"input": {"prompt": "a phone on a desk"}})
+
+
+def test_fal_polls_the_queue_and_streams_into_a_sink(provider_server):
+    base, requests, fal_polls = provider_server
+    client = TextToVideoClient("fal-ai", "fal_key", base_url=base, hub_url=base, poll_interval=0)
+    chunks = []
+
+    class Sink:
+        def write(self, chunk):
+            chunks.append(chunk)
+
+    aio.run_sync(client.text_to_video_into(Sink(), "a phone on a desk", model="Wan-AI/Wan2.2-T2V-A14B"))
+
+    assert b"".join(chunks) == VIDEO
+    assert len(chunks) > 1
+    assert requests[1] == ("fal", "Key fal_key", {"prompt": "a phone on a desk"})
+    assert fal_polls["count"] == 2
+
+
+def test_model_mapping_is_cached_and_unknown_providers_rejected(provider_server):
+    base, requests, _ = provider_server
+    client = TextToVideoClient("replicate", "r8_key", base_url=base, hub_url=base)
+
+    aio.run_sync(client.provider_model_id("Wan-AI/Wan2.2-T2V-A14B"))
+    aio.run_sync(client.provider_model_id("Wan-AI/Wan2.2-T2V-A14B"))
+
+    assert [r for r in requests if r[0] == "hub"] == requests[:1]
+    with pytest.raises(ValueError):
+        TextToVideoClient("novita", "key")
+
+
+def test_hf_tokens_go_through_the_router():
+    client = TextToVideoClient("fal-ai", "hf_token")
+
+    assert client.base_url == "https://router.huggingface.co/fal-ai"
+    assert client._headers() == {"Authorization": "Bearer hf_token"}
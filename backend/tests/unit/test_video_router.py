@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+
+from video_router import CircuitBreaker, HedgeReport, VideoRouter, parse_routes
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_router(clock, **kwargs):
+    return VideoRouter(parse_routes("primary:model-a,backup:model-b"), clock=clock, **kwargs)
+
+
+def request_with(clock, latencies, failing=()):
+    async def request(route):
+        if route.provider in failing:
+            raise RuntimeError(f"{route.provider} is down")
+        clock.now += latencies[route.provider]
+        return f"clip from {route.provider}"
+    return request
+
+
+def test_parse_routes_keeps_order_and_rejects_bad_entries():
+    routes = parse_routes("replicate:Wan-AI/Wan2.2-T2V-A14B, fal-ai:Wan-AI/Wan2.2-T2V-A14B")
+
+    assert [route.provider for route in routes] == ["replicate", "fal-ai"]
+    assert routes[0].model == "Wan-AI/Wan2.2-T2V-A14B"
+    with pytest.raises(ValueError):
+        parse_routes("replicate")
+
+
+def test_router_prefers_the_faster_route_once_both_are_sampled():
+    clock = FakeClock()
+    router = make_router(clock)
+    request = request_with(clock, {"primary": 30.0, "backup": 10.0})
+
+    first = [asyncio.run(router.call(request))[1].provider for _ in range(2)]
+    later = asyncio.run(router.call(request))[1].provider
+
+    assert first == ["primary", "backup"]
+    assert later == "backup"
+    assert router.snapshot()["backup:model-b"]["p50"] == 10.0
+
+
+def test_router_falls_back_and_opens_the_breaker_of_a_failing_route():
+    clock = FakeClock()
+    router = make_router(clock, failure_threshold=2, reset_seconds=60)
+    request = request_with(clock, {"primary": 5.0, "backup": 20.0}, failing={"primary"})
+
+    for _ in range(2):
+        result, route = asyncio.run(router.call(request))
+        assert route.provider == "backup"
+
+    assert router.breakers["primary:model-a"].state == CircuitBreaker.OPEN
+    assert router.ranked()[0].provider == "backup"
+    assert all(route.provider == "backup" for route in router.ranked())
+
+
+def test_half_open_breaker_closes_after_a_successful_trial():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=60, clock=clock)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    clock.now = 61
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial request at a time
+    breaker.record_success()
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_router_still_tries_when_every_breaker_is_open():
+    clock = FakeClock()
+    router = make_router(clock, failure_threshold=1)
+    with pytest.raises(RuntimeError):
+        asyncio.run(router.call(request_with(clock, {}, failing={"primary", "backup"})))
+
+    result, route = asyncio.run(router.call(request_with(clock, {"primary": 1.0, "backup": 1.0})))
+
+    assert result == "clip from primary"
+
+
+def warmed_router(latency=1.0, samples=5):
+    router = VideoRouter(parse_routes("primary:model-a,backup:model-b"))
+    for route in router.routes:
+        for _ in range(samples):
+            router.stats[route.name].record(latency * (2 if route.provider == "backup" else 1), ok=True)
+    return router
+
+
+def test_hedge_wins_when_the_primary_request_stalls():
+    router = warmed_router(latency=0.01)
+    report = HedgeReport()
+    cancelled = []
+
+    async def request(route):
+        if route.provider == "primary":
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(route.provider)
+                raise
+        return f"clip from {route.provider}"
+
+    result, route = asyncio.run(router.call_hedged(request, percentile=95, report=report))
+
+    assert (result, route.provider) == ("clip from backup", "backup")
+    assert report.hedges == 1 and report.wins == 1
+    assert cancelled == ["primary"]
+    # The cancelled request is not held against the primary route
+    assert router.stats["primary:model-a"].failures == 0
+
+
+def test_no_hedge_without_latency_history_or_when_the_primary_is_fast():
+    report = HedgeReport()
+
+    async def request(route):
+        return route.provider
+
+    cold = VideoRouter(parse_routes("primary:model-a,backup:model-b"))
+    assert asyncio.run(cold.call_hedged(request, percentile=95, report=report))[0] == "primary"
+    assert asyncio.run(warmed_router(latency=1.0).call_hedged(request, 95, report=report))[0] == "primary"
+    assert report.hedges == 0
+
+
+def test_no_hedge_when_no_breaker_allows_one():
+    router = warmed_router(latency=0.01)
+    for breaker in router.breakers.values():
+        for _ in range(3):
+            breaker.record_failure()
+    report = HedgeReport()
+    calls = []
+
+    async def request(route):
+        calls.append(route.provider)
+        await asyncio.sleep(0.1)
+        return f"clip from {route.provider}"
+
+    result, route = asyncio.run(router.call_hedged(request, percentile=95, report=report))
+
+    assert (result, calls) == ("clip from primary", ["primary"])
+    assert report.hedges == 0
+
+
+def test_a_hedge_finishing_with_the_primary_is_released():
+    router = warmed_router(latency=0.01)
+    report = HedgeReport()
+
+    class Clip:
+        def __init__(self, provider):
+            self.provider, self.closed = provider, False
+
+        def close(self):
+            self.closed = True
+
+    clips = []
+
+    async def race():
+        finished = asyncio.Event()
+        asyncio.get_running_loop().call_later(0.1, finished.set)
+
+        async def request(route):
+            # Both requests finish in the same iteration of the event loop
+            await finished.wait()
+            clips.append(Clip(route.provider))
+            return clips[-1]
+
+        return await router.call_hedged(request, percentile=95, report=report)
+
+    clip, route = asyncio.run(race())
+
+    assert (clip.provider, route.provider) == ("primary", "primary")
+    assert sorted((c.provider, c.closed) for c in clips) == [("backup", True), ("primary", False)]
+    assert (report.hedges, report.wins, report.saved_seconds) == (1, 0, 0)
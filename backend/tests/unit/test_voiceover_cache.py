@@ -0,0 +1,34 @@
+from voiceover_cache import VoiceoverCache, voiceover_cache_key
+
+SETTINGS = {"stability": 0.5, "similarity_boost": 0.5}
+
+
+def test_keys_cover_the_script_voice_model_and_settings():
+    key = voiceover_cache_key("Meet the new TV.", "voice-1", "eleven_multilingual_v2", SETTINGS)
+
+    assert key.startswith("tts#")
+    assert voiceover_cache_key(" Meet the new TV.\n", "voice-1", "eleven_multilingual_v2", dict(reversed(SETTINGS.items()))) == key
+    assert voiceover_cache_key("Meet the new TV!", "voice-1", "eleven_multilingual_v2", SETTINGS) != key
+    assert voiceover_cache_key("Meet the new TV.", "voice-2", "eleven_multilingual_v2", SETTINGS) != key
+    assert voiceover_cache_key("Meet the new TV.", "voice-1", "eleven_turbo_v2_5", SETTINGS) != key
+    assert voiceover_cache_key("Meet the new TV.", "voice-1", "eleven_multilingual_v2", {**SETTINGS, "stability": 0.7}) != key
+
+
+def test_a_stored_voiceover_is_served_until_it_expires(cache_table, clock):
+    table = cache_table
+    clock.now = 1000
+    cache = VoiceoverCache(table, ttl_seconds=100, clock=clock)
+    key = voiceover_cache_key("Meet the new TV.", "voice-1", "eleven_multilingual_v2", SETTINGS)
+
+    assert cache.get(key) is None
+    cache.put(key, "s3://bucket/audio/a.mp3", 48_000, "Meet the new TV.", "voice-1", "eleven_multilingual_v2")
+
+    clock.now = 1050
+    assert cache.get(key) == "s3://bucket/audio/a.mp3"
+    assert (table.items[key]['hitCount'], table.items[key]['lastAccessedAt']) == (1, 1050)
+
+    clock.now = 1200
+    assert cache.get(key) is None
+
+    stats = next(item for name, item in table.items.items() if name.startswith("stats#"))
+    assert (stats['voiceoverHits'], stats['voiceoverMisses']) == (1, 2)
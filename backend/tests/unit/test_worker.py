@@ -0,0 +1,286 @@
+import hashlib
+import importlib.util
+import os
+import threading
+
+import aiohttp
+import pytest
+from botocore.exceptions import ClientError
+
+import aio
+import app
+from asset_store import AssetStore
+from blueprint_cache import BlueprintCache
+
+spec = importlib.util.spec_from_file_location(
+    "provider_stub", os.path.join(os.path.dirname(__file__), "..", "..", "local", "provider_stub.py")
+)
+provider_stub = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(provider_stub)
+
+ASSETS = {
+    "product_shots": ["s3://bucket/curated_clips/tv/front.mp4", "s3://bucket/curated_clips/tv/side.mp4"],
+    "logo": "s3://bucket/curated_clips/logo.mp4",
+    "music": "s3://bucket/music/background_music.mp3",
+}
+REQUEST = {"sku": "PROD-TV", "user_context": "Diwali offer", "language": "English"}
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """
+    Replaces the provider calls behind the pipeline stages and records them.
+    """
+    calls = {"clips": [], "timelines": []}
+
+    def create_clip(act, secrets, bucket_name, hedge_report=None):
+        calls["clips"].append(app.act_prompt(act))
+        return f"s3://bucket/cached_clips/{app.act_prompt(act).replace(' ', '-')}.mp4"
+
+    def submit_timeline(fingerprint, clip_uris, voiceover_uri, assets, api_key, callback_url=None):
+        calls["timelines"].append(list(clip_uris))
+        return "render-1"
+
+    monkeypatch.setattr(app, "load_secrets", lambda mode: {"openrouter": "or", "elevenlabs": "el", "hf": "hf", "shotstack": "ss"})
+    monkeypatch.setattr(app, "load_product", lambda bucket_name, sku: {"productName": "TV"})
+    monkeypatch.setattr(app, "generate_voiceover", lambda *args: "s3://bucket/audio/voice.mp3")
+    monkeypatch.setattr(app, "create_clip", create_clip)
+    monkeypatch.setattr(app, "curated_assets", lambda product_data, bucket_name: ASSETS)
+    monkeypatch.setattr(app, "fingerprint_render", lambda clip_uris, voiceover_uri, assets: "f" * 64)
+    monkeypatch.setattr(app, "submit_timeline", submit_timeline)
+    return calls
+
+
+def use_blueprint(monkeypatch, blueprint):
+    monkeypatch.setattr(app, "get_ad_blueprint", lambda *args, **kwargs: blueprint)
+
+
+def test_audio_mode_does_not_need_acts(stages, monkeypatch):
+    use_blueprint(monkeypatch, {"voiceover_script": "Celebrate with the new TV.", "voice_id": "voice-1"})
+
+    results = app.build_pipeline(REQUEST, "audio", "bucket").run()
+
+    assert results["voiceover"] == "s3://bucket/audio/voice.mp3"
+    assert not any(name.startswith("act_") for name in results)
+
+
+def test_acts_missing_from_the_blueprint_are_left_out_of_the_timeline(stages, monkeypatch):
+    use_blueprint(monkeypatch, {"acts": [{"prompt": "a family watching TV"}, {"prompt": "a TV remote"}],
+                                "voiceover_script": "Celebrate with the new TV.", "voice_id": "voice-1"})
+
+    results = app.build_pipeline(REQUEST, "full", "bucket", callback_url="https://api/render-callback").run()
+
+    assert sorted(stages["clips"]) == ["a TV remote", "a family watching TV"]
+    assert results["clip_2"] is None
+    assert stages["timelines"] == [[results["clip_0"], results["clip_1"], None]]
+
+
+def test_the_timeline_closes_the_gap_of_a_missing_clip():
+    full = app.build_timeline(["s3://a.mp4", "s3://b.mp4", "s3://c.mp4"], ASSETS)
+    short = app.build_timeline(["s3://a.mp4", "s3://b.mp4", None], ASSETS)
+
+    assert [(clip["start"], clip["length"]) for clip in full] == [(0, 5), (5, 4), (9, 5), (14, 5), (19, 5), (24, 2)]
+    assert [clip["asset"]["src"] for clip in short] == [
+        "s3://a.mp4", ASSETS["product_shots"][0], "s3://b.mp4", ASSETS["product_shots"][1], ASSETS["logo"],
+    ]
+    assert [(clip["start"], clip["length"]) for clip in short] == [(0, 5), (5, 4), (9, 5), (14, 5), (19, 2)]
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    stub = provider_stub.ProviderStub(("127.0.0.1", 0))
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    monkeypatch.setattr(app, "OPENROUTER_API_URL", f"{stub.base_url}/v1")
+    monkeypatch.setattr(app, "ELEVENLABS_API_URL", f"{stub.base_url}/v1")
+    monkeypatch.setattr(app, "blueprint_cache", None)
+    yield stub
+    stub.shutdown()
+
+
+def stream_blueprint(acts):
+    return aio.run_sync(app.get_ad_blueprint_async(
+        "PROD-TV", {"productName": "TV"}, "Diwali offer", "or-key", "English",
+        on_act=lambda i, act: acts.append((i, act)),
+    ))
+
+
+def test_blueprint_acts_are_handed_over_while_the_stream_is_read(provider):
+    acts = []
+
+    blueprint = stream_blueprint(acts)
+
+    assert blueprint == provider_stub.BLUEPRINT
+    assert acts == list(enumerate(provider_stub.BLUEPRINT["acts"]))
+    assert provider.completions[0]["stream"] is True
+
+
+def test_an_error_in_the_blueprint_stream_fails_the_blueprint(provider):
+    provider.stream_error = "Provider overloaded"
+
+    with pytest.raises(Exception, match="LLM stream failed: Provider overloaded"):
+        stream_blueprint([])
+
+
+def test_fresh_blueprints_bypass_and_replace_the_cached_one(provider, make_table, monkeypatch):
+    monkeypatch.setattr(app, "blueprint_cache", BlueprintCache(make_table('blueprintKey')))
+    first = stream_blueprint([])
+    provider.blueprint = {**provider_stub.BLUEPRINT, "voiceover_script": "Watch the final live."}
+
+    cached = stream_blueprint([])
+    acts = []
+    fresh = aio.run_sync(app.get_ad_blueprint_async(
+        "PROD-TV", {"productName": "TV"}, "Diwali offer", "or-key", "English", fresh=True,
+        on_act=lambda i, act: acts.append((i, act)),
+    ))
+
+    assert cached == first == provider_stub.BLUEPRINT
+    assert fresh == provider.blueprint
+    assert acts == list(enumerate(provider.blueprint["acts"]))
+    assert len(provider.completions) == 2
+    assert stream_blueprint([]) == provider.blueprint
+
+
+def test_a_blueprint_that_cannot_be_cached_is_still_returned(provider, make_table, monkeypatch):
+    cache = BlueprintCache(make_table('blueprintKey'))
+
+    def throttled(*args, **kwargs):
+        raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException', 'Message': ''}}, 'PutItem')
+
+    monkeypatch.setattr(cache, "put", throttled)
+    monkeypatch.setattr(app, "blueprint_cache", cache)
+
+    assert stream_blueprint([]) == provider_stub.BLUEPRINT
+
+
+def test_the_pipeline_asks_for_a_fresh_blueprint_when_the_job_does(stages, monkeypatch):
+    requested = []
+
+    def get_ad_blueprint(*args, fresh=False, on_act=None):
+        requested.append(fresh)
+        return {"voiceover_script": "Celebrate with the new TV.", "voice_id": "voice-1"}
+
+    monkeypatch.setattr(app, "get_ad_blueprint", get_ad_blueprint)
+    app.build_pipeline({**REQUEST, "fresh": True}, "audio", "bucket").run()
+    app.build_pipeline(REQUEST, "audio", "bucket").run()
+
+    assert requested == [True, False]
+
+
+@pytest.mark.parametrize("mode, served", [("shadow", "s3://bucket/cached_clips/new.mp4"),
+                                          ("reuse", "s3://bucket/cached_clips/similar.mp4")])
+def test_similar_clips_are_only_served_in_reuse_mode(cache_table, monkeypatch, mode, served):
+    cache_table.items["similar"] = {"promptHash": "similar", "s3_uri": "s3://bucket/cached_clips/similar.mp4"}
+    generated = []
+
+    async def generate_and_cache_clip(prompt, *args):
+        generated.append(prompt)
+        return "s3://bucket/cached_clips/new.mp4"
+
+    monkeypatch.setattr(app, "CLIP_SIMILARITY_THRESHOLD", 0.85)
+    monkeypatch.setattr(app, "CLIP_SIMILARITY_MODE", mode)
+    monkeypatch.setattr(app, "CLIP_LEASE_SECONDS", 0)
+    monkeypatch.setattr(app, "find_similar_clip", lambda prompt, bucket_name, variants=None: cache_table.items["similar"])
+    monkeypatch.setattr(app, "_generate_and_cache_clip", generate_and_cache_clip)
+
+    uri = aio.run_sync(app.generate_video_clip_async("a family watching a TV", "hf", "bucket", cache_table))
+
+    assert uri == served
+    assert generated == (["a family watching a TV"] if mode == "shadow" else [])
+
+
+@pytest.fixture
+def store(s3, monkeypatch):
+    """
+    Stores assets in the fake bucket, in multipart parts of 2 KB.
+    """
+    monkeypatch.setattr(app, "asset_store", AssetStore(s3, part_size=2000))
+    return s3
+
+
+def speak(cache_table=None):
+    return aio.run_sync(app.generate_voiceover_async(
+        "Celebrate with the new TV.", "voice-1", "el-key", "bucket", cache_table
+    ))
+
+
+def test_streamed_speech_is_uploaded_in_parts_and_stored_under_its_hash(provider, store, cache_table):
+    provider.speech_repeat, provider.chunk_size = 100, 1000
+    audio = provider_stub.placeholder("voiceover", "voice-1\nCelebrate with the new TV.") * 100
+
+    uri = speak(cache_table)
+
+    key = f"audio/{hashlib.sha256(audio).hexdigest()}.mp3"
+    assert uri == f"s3://bucket/{key}"
+    assert store.objects == {key: audio}
+    operations = [operation for operation, _ in store.requests]
+    assert "UploadPart" in operations and not store.uploads
+    assert operations[-2:] == ["CopyObject", "DeleteObject"]
+    entry = cache_table.items[app.voiceover_cache_key(
+        "Celebrate with the new TV.", "voice-1", app.ELEVENLABS_MODEL_ID, app.ELEVENLABS_VOICE_SETTINGS
+    )]
+    assert (entry["s3_uri"], entry["sizeBytes"]) == (uri, len(audio))
+
+
+def test_a_speech_stream_that_breaks_off_stores_nothing(provider, store, cache_table):
+    provider.speech_repeat, provider.chunk_size = 100, 1000
+    provider.speech_break_after = 5000
+
+    with pytest.raises(aiohttp.ClientPayloadError):
+        speak(cache_table)
+
+    operations = [operation for operation, _ in store.requests]
+    assert "UploadPart" in operations and operations[-1] == "AbortMultipartUpload"
+    assert store.objects == {} and not store.uploads
+    assert not any("s3_uri" in item for item in cache_table.items.values())
+
+
+@pytest.fixture
+def jobs(stages, make_table, monkeypatch):
+    table = make_table('jobId')
+    monkeypatch.setattr(app.dynamodb, "Table", lambda name: table)
+    monkeypatch.setattr(app, "JOBS_TABLE_NAME", "jobs")
+    monkeypatch.setattr(app, "CLIP_CACHE_TABLE_NAME", None)
+    monkeypatch.setattr(app, "WORKER_MODE", "full")
+    monkeypatch.setattr(app, "WORKER_IO_MODE", "threads")
+    monkeypatch.setattr(app, "RENDER_COMPLETION", "poll")
+    monkeypatch.setattr(app, "finish_render", lambda render_ref, api_key, fingerprint, bucket_name: "https://renders/final.mp4")
+    return table
+
+
+def test_a_retried_job_resumes_from_its_checkpoints(jobs, stages, monkeypatch):
+    blueprint = {"acts": [{"prompt": "a family watching TV"}, {"prompt": "a TV remote"}, {"prompt": "a match on TV"}],
+                 "voiceover_script": "Celebrate with the new TV.", "voice_id": "voice-1"}
+    jobs.items["job-1"] = {"jobId": "job-1", "status": "PENDING", "requestBody": REQUEST, "checkpoints": {
+        "blueprint": blueprint, "clip_0": "s3://bucket/cached_clips/saved.mp4",
+    }}
+    monkeypatch.setattr(app, "get_ad_blueprint", lambda *args, **kwargs: pytest.fail("blueprint generated again"))
+
+    app.lambda_handler({"jobId": "job-1"}, None)
+
+    job = jobs.items["job-1"]
+    assert job["status"] == "COMPLETE" and job["finalVideoUrl"] == "https://renders/final.mp4"
+    assert sorted(stages["clips"]) == ["a TV remote", "a match on TV"]
+    assert stages["timelines"][0][0] == "s3://bucket/cached_clips/saved.mp4"
+
+
+def test_clips_of_a_failed_blueprint_stream_are_not_resumed(jobs, stages, monkeypatch):
+    jobs.items["job-1"] = {"jobId": "job-1", "status": "PENDING", "requestBody": REQUEST}
+
+    def broken_stream(*args, on_act=None, **kwargs):
+        for i, prompt in enumerate(["a family watching TV", "a TV remote", "a match on TV"]):
+            on_act(i, {"prompt": prompt})
+        raise Exception("LLM stream failed: Provider overloaded")
+
+    monkeypatch.setattr(app, "get_ad_blueprint", broken_stream)
+    app.lambda_handler({"jobId": "job-1"}, None)
+
+    assert jobs.items["job-1"]["status"] == "FAILED"
+    assert jobs.items["job-1"]["checkpoints"] == {}
+
+    stages["clips"].clear()
+    use_blueprint(monkeypatch, {"acts": [{"prompt": "a fridge"}, {"prompt": "a chef"}, {"prompt": "vegetables"}],
+                                "voiceover_script": "Stay cool.", "voice_id": "voice-1"})
+    app.lambda_handler({"jobId": "job-1"}, None)
+
+    assert jobs.items["job-1"]["status"] == "COMPLETE"
+    assert sorted(stages["clips"]) == ["a chef", "a fridge", "vegetables"]
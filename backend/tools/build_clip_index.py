@@ -0,0 +1,113 @@
+"""
+Builds the clip similarity index from the ClipCacheTable and uploads it
+next to the cached clips, where the worker picks it up (`clip_index.py`).
+
+Usage (from the backend directory):
+
+    python tools/build_clip_index.py --table <ClipCacheTable name> --bucket ad-forge-database-amg-2025
+    python tools/build_clip_index.py --table ... --bucket ... --dry-run --threshold 0.8
+
+Run it periodically (e.g. nightly); clips cached in between are added to
+each worker's in-memory copy. With --threshold, the tool also prints how
+many cached prompts have a near-duplicate at that threshold, to help tune
+CLIP_SIMILARITY_THRESHOLD before changing it.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "worker_function"))
+
+import numpy as np  # noqa: E402
+
+from clip_index import VERSION_METADATA, ClipIndex  # noqa: E402
+
+
+def scan_cache(table):
+    """
+    Returns every entry of the clip cache table that has its prompt text.
+    """
+    entries = []
+    kwargs = {"ProjectionExpression": "promptHash, promptText, s3_uri, variant"}
+    while True:
+        response = table.scan(**kwargs)
+        for item in response.get("Items", []):
+            if not item.get("promptText") or not item.get("s3_uri"):
+                continue
+            entry = {key: item[key] for key in ("promptHash", "promptText", "s3_uri", "variant") if key in item}
+            entries.append(entry)
+        if "LastEvaluatedKey" not in response:
+            return entries
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def build_index(entries):
+    """
+    Embeds the prompts of the given cache entries into a new index.
+    """
+    index = ClipIndex()
+    for entry in sorted(entries, key=lambda entry: entry["promptHash"]):
+        index.add(entry)
+    return index
+
+
+def near_duplicates(index, threshold):
+    """
+    Returns the (prompt, most similar other prompt, score) of every prompt
+    in the index that another one matches at `threshold`.
+    """
+    if len(index) < 2:
+        return []
+    vectors = np.stack(index.added_vectors)
+    scores = vectors @ vectors.T
+    np.fill_diagonal(scores, -1.0)
+    entries = index.added_entries
+    pairs = []
+    for i, best in enumerate(scores.argmax(axis=1)):
+        if scores[i, best] >= threshold:
+            pairs.append((entries[i]["promptText"], entries[best]["promptText"], float(scores[i, best])))
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the clip similarity index.")
+    parser.add_argument("--table", required=True, help="Name of the ClipCacheTable.")
+    parser.add_argument("--bucket", required=True, help="Bucket holding the clip cache.")
+    parser.add_argument("--key", default="clip_index/prompts", help="S3 key of the index, without extension.")
+    parser.add_argument("--threshold", type=float, help="Report near-duplicates at this similarity.")
+    parser.add_argument("--dry-run", action="store_true", help="Build the index but do not upload it.")
+    args = parser.parse_args(argv)
+
+    import boto3
+
+    entries = scan_cache(boto3.resource("dynamodb").Table(args.table))
+    index = build_index(entries)
+    print(f"Indexed {len(index)} cached prompts ({index.dimensions} dimensions).")
+
+    if args.threshold is not None:
+        pairs = near_duplicates(index, args.threshold)
+        print(f"{len(pairs)} of {len(entries)} prompts have a near-duplicate at {args.threshold}:")
+        for prompt, other, score in sorted(pairs, key=lambda pair: -pair[2]):
+            print(f"  {score:.3f}  {prompt[:50]!r} ~ {other[:50]!r}")
+
+    if args.dry_run:
+        return 0
+
+    s3 = boto3.client("s3")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prompts")
+        index.save(path)
+        # Both files name this build, so workers never pair files of two builds.
+        # The matrix is uploaded last: workers reload on its ETag
+        metadata = {VERSION_METADATA: uuid.uuid4().hex}
+        s3.upload_file(f"{path}.json", args.bucket, f"{args.key}.json",
+                       ExtraArgs={"ContentType": "application/json", "Metadata": metadata})
+        s3.upload_file(f"{path}.npy", args.bucket, f"{args.key}.npy", ExtraArgs={"Metadata": metadata})
+    print(f"Uploaded the index to s3://{args.bucket}/{args.key}.npy")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Reports on and cleans up the clip cache (ClipCacheTable and the clip and
+voiceover objects in S3).
+
+Usage (from the backend directory):
+
+    python tools/clip_cache_admin.py stats --table <ClipCacheTable> --bucket ad-forge-database-amg-2025 \\
+        --jobs-table <JobsTable> --budget 50GB
+    python tools/clip_cache_admin.py evict --table <ClipCacheTable> --budget 50GB --policy lru --dry-run
+    python tools/clip_cache_admin.py gc --table <ClipCacheTable> --jobs-table <JobsTable> \\
+        --bucket ad-forge-database-amg-2025 --dry-run
+
+`stats` prints the hit ratio of the last days, the hottest prompts and how
+many bytes eviction and garbage collection would reclaim. `evict` removes
+the least recently (lru) or least frequently (lfu) used entries, item and
+object together, until the cache fits the budget; the WorkerFunction also
+runs it nightly (see `cache_eviction`). `gc` deletes objects under the asset
+prefixes that no cache entry, no recent job and no unfinished job
+references, and that are older than the job retention; run it after
+eviction (e.g. weekly). `--dry-run` only prints what would be removed.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "worker_function"))
+
+from cache_eviction import (  # noqa: E402
+    delete_objects,
+    evict,
+    fill_sizes,
+    parse_size,
+    plan_eviction,
+    scan,
+    scan_entries,
+    split_s3_uri,
+)
+
+# Prefixes of the objects the worker writes. 'generated_clips/' holds the
+# per-job clips written before clips were cached by content.
+ASSET_PREFIXES = ("cached_clips/", "generated_clips/", "audio/", "renders/")
+# Job statuses after which a job no longer writes or reads its assets
+TERMINAL_STATUSES = ("COMPLETE", "FAILED")
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def object_keys_in(value, bucket):
+    """
+    Collects the keys of `bucket` referenced anywhere in a job item, as
+    's3://' references (checkpoints) or as presigned URLs.
+    """
+    if isinstance(value, dict):
+        return set().union(*(object_keys_in(v, bucket) for v in value.values())) if value else set()
+    if isinstance(value, (list, tuple)):
+        return set().union(*(object_keys_in(v, bucket) for v in value)) if value else set()
+    if not isinstance(value, str):
+        return set()
+    if value.startswith(f"s3://{bucket}/"):
+        return {split_s3_uri(value)[1]}
+    if value.startswith("https://"):
+        url = urlparse(value)
+        if url.netloc.startswith(f"{bucket}.s3"):
+            return {url.path.lstrip("/")}
+    return set()
+
+
+def referenced_keys(entries, jobs, bucket, job_retention_seconds, now):
+    """
+    Returns the object keys still in use: those of the cache entries, those
+    referenced by jobs created within the retention period and those in the
+    checkpoints of jobs that have not finished, however old. A running job
+    may have found an old object already stored and skipped its upload, so
+    the object's age alone does not show it is unused.
+    """
+    keys = {split_s3_uri(entry["s3_uri"])[1] for entry in entries if entry["s3_uri"].startswith(f"s3://{bucket}/")}
+    for job in jobs:
+        recent = now - int(job.get("createdAt") or 0) <= job_retention_seconds
+        if recent or job.get("status") not in TERMINAL_STATUSES:
+            keys |= object_keys_in(job, bucket)
+    return keys
+
+
+def find_orphans(s3, bucket, referenced, grace_seconds, now, prefixes=ASSET_PREFIXES):
+    """
+    Lists the objects under the asset prefixes that nothing references and
+    that are older than the grace period, the minimum age of a collected
+    object.
+
+    Returns:
+        list: (key, size) pairs.
+    """
+    orphans = []
+    paginator = s3.get_paginator("list_objects_v2")
+    for prefix in prefixes:
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                age = now - obj["LastModified"].timestamp()
+                if obj["Key"] not in referenced and age >= grace_seconds:
+                    orphans.append((obj["Key"], obj["Size"]))
+    return orphans
+
+
+def hit_ratio(table, days, now):
+    """
+    Sums the daily lookup statistics of the last `days` days.
+
+    Returns:
+        dict: The counts of each outcome, the clips' 'hitRatio', the
+              voiceovers' 'voiceoverHitRatio' and the final videos'
+              'renderHitRatio'.
+    """
+    totals = {"hits": 0, "similarHits": 0, "coalescedHits": 0, "misses": 0,
+              "voiceoverHits": 0, "voiceoverMisses": 0, "renderHits": 0, "renderMisses": 0}
+    today = datetime.fromtimestamp(now, timezone.utc).date()
+    for day in range(days):
+        date = (today - timedelta(days=day)).isoformat()
+        item = table.get_item(Key={"promptHash": f"stats#{date}"}).get("Item") or {}
+        for outcome in totals:
+            totals[outcome] += int(item.get(outcome, 0))
+    lookups = totals["hits"] + totals["similarHits"] + totals["coalescedHits"] + totals["misses"]
+    totals["hitRatio"] = (lookups - totals["misses"]) / lookups if lookups else 0.0
+    for kind in ("voiceover", "render"):
+        lookups = totals[f"{kind}Hits"] + totals[f"{kind}Misses"]
+        totals[f"{kind}HitRatio"] = totals[f"{kind}Hits"] / lookups if lookups else 0.0
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clip cache statistics, eviction and garbage collection.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("stats", "evict", "gc"):
+        command = commands.add_parser(name)
+        command.add_argument("--table", required=True, help="Name of the ClipCacheTable.")
+        command.add_argument("--dry-run", action="store_true", help="Only print what would be removed.")
+        if name in ("stats", "evict"):
+            command.add_argument("--budget", type=parse_size, required=name == "evict",
+                                 help="Total bytes the cached clips may use, e.g. 50GB.")
+            command.add_argument("--policy", choices=("lru", "lfu"), default="lru")
+        if name in ("stats", "gc"):
+            command.add_argument("--bucket", required=name == "gc", help="Bucket holding the assets.")
+            command.add_argument("--jobs-table", required=name == "gc", help="Name of the JobsTable.")
+            command.add_argument("--job-retention-days", type=float, default=30,
+                                 help="Assets of finished jobs older than this may be collected.")
+            command.add_argument("--grace-hours", type=float,
+                                 help="Objects younger than this are never collected (default: the job retention).")
+        if name == "stats":
+            command.add_argument("--days", type=int, default=7, help="Days of hit statistics to sum.")
+            command.add_argument("--top", type=int, default=10, help="Number of hottest prompts to list.")
+    args = parser.parse_args(argv)
+    if args.command != "evict" and args.grace_hours is None:
+        args.grace_hours = args.job_retention_days * 24
+
+    import boto3
+
+    table = boto3.resource("dynamodb").Table(args.table)
+    s3 = boto3.client("s3")
+    now = time.time()
+    entries = scan_entries(table)
+    fill_sizes(entries, s3, None if args.dry_run or args.command == "stats" else table)
+    cached_bytes = sum({entry["s3_uri"]: int(entry["sizeBytes"]) for entry in entries}.values())
+
+    if args.command == "stats":
+        ratio = hit_ratio(table, args.days, now)
+        print(f"Clip cache: {len(entries)} entries, {format_size(cached_bytes)}.")
+        print(f"Last {args.days} days: hit ratio {ratio['hitRatio']:.1%} "
+              f"({ratio['hits']} hits, {ratio['similarHits']} similar, "
+              f"{ratio['coalescedHits']} coalesced, {ratio['misses']} misses); "
+              f"voiceovers {ratio['voiceoverHitRatio']:.1%} "
+              f"({ratio['voiceoverHits']} hits, {ratio['voiceoverMisses']} misses); "
+              f"renders {ratio['renderHitRatio']:.1%} "
+              f"({ratio['renderHits']} hits, {ratio['renderMisses']} misses)")
+        print("Hottest prompts:")
+        for entry in sorted(entries, key=lambda entry: -int(entry.get("hitCount") or 0))[:args.top]:
+            print(f"  {int(entry.get('hitCount') or 0):6d}  {(entry.get('promptText') or entry.get('scriptText', ''))[:70]!r}")
+        if args.budget is not None:
+            _, objects, freed = plan_eviction(entries, args.budget, args.policy)
+            print(f"Over the {format_size(args.budget)} budget: {format_size(freed)} in {len(objects)} objects ({args.policy}).")
+        if args.bucket and args.jobs_table:
+            jobs = scan(boto3.resource("dynamodb").Table(args.jobs_table))
+            referenced = referenced_keys(entries, jobs, args.bucket, args.job_retention_days * 86400, now)
+            orphans = find_orphans(s3, args.bucket, referenced, args.grace_hours * 3600, now)
+            print(f"Orphaned assets: {format_size(sum(size for _, size in orphans))} in {len(orphans)} objects.")
+        return 0
+
+    if args.command == "evict":
+        evicted, objects, freed = plan_eviction(entries, args.budget, args.policy)
+        print(f"Cache uses {format_size(cached_bytes)} of {format_size(args.budget)}; "
+              f"evicting {len(evicted)} entries ({args.policy}), {format_size(freed)} in {len(objects)} objects.")
+        for entry in evicted:
+            print(f"  {entry['promptHash']}  {(entry.get('promptText') or entry.get('scriptText', ''))[:60]!r}")
+        if not args.dry_run:
+            deleted = evict(table, s3, evicted, objects)
+            print(f"Deleted {deleted} objects.")
+        return 0
+
+    jobs = scan(boto3.resource("dynamodb").Table(args.jobs_table))
+    referenced = referenced_keys(entries, jobs, args.bucket, args.job_retention_days * 86400, now)
+    orphans = find_orphans(s3, args.bucket, referenced, args.grace_hours * 3600, now)
+    print(f"Found {len(orphans)} orphaned objects, {format_size(sum(size for _, size in orphans))}.")
+    for key, size in orphans:
+        print(f"  {format_size(size):>10}  {key}")
+    if not args.dry_run:
+        delete_objects(s3, [f"s3://{args.bucket}/{key}" for key, _ in orphans])
+        print(f"Deleted {len(orphans)} objects.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Validates a product catalog in the `product_db.json` format and loads it
+into the ProductCatalogTable, one item per SKU.
+
+Usage (from the backend directory):
+
+    python tools/import_catalog.py product_db.json --table <ProductCatalogTable name>
+    python tools/import_catalog.py s3://ad-forge-database-amg-2025/product_db.json --table ... --dry-run
+
+Every entry is validated before anything is written; if any entry is
+invalid, the errors are printed and nothing is imported. Existing SKUs are
+overwritten, SKUs missing from the file are left in the table.
+"""
+import argparse
+import json
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "catalog_layer"))
+
+from catalog_store import normalize_product, validate_product  # noqa: E402
+
+
+def read_catalog(source, s3_client=None):
+    """
+    Reads a catalog from a local file or an 's3://bucket/key' URI.
+
+    Returns:
+        dict: The catalog, SKU mapped to its entry. Numbers are Decimals, as
+              DynamoDB requires.
+    """
+    if source.startswith("s3://"):
+        bucket, _, key = source[len("s3://"):].partition("/")
+        data = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read().decode("utf-8")
+    else:
+        with open(source, encoding="utf-8") as f:
+            data = f.read()
+    catalog = json.loads(data, parse_float=Decimal)
+    if not isinstance(catalog, dict):
+        raise ValueError("The catalog must be a JSON object of SKU -> product entries.")
+    return catalog
+
+
+def validate_catalog(catalog):
+    """
+    Returns every problem found in the catalog, empty if it can be imported.
+    """
+    errors = []
+    for sku, product in catalog.items():
+        errors.extend(validate_product(sku, product))
+    return errors
+
+
+def import_catalog(catalog, table):
+    """
+    Writes every entry of a validated catalog to the table in batches.
+
+    Returns:
+        int: The number of SKUs written.
+    """
+    with table.batch_writer(overwrite_by_pkeys=["sku"]) as batch:
+        for sku, product in catalog.items():
+            batch.put_item(Item={"sku": sku, **normalize_product(product)})
+    return len(catalog)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate and import the product catalog.")
+    parser.add_argument("source", help="Path or s3:// URI of the catalog JSON.")
+    parser.add_argument("--table", help="Name of the ProductCatalogTable.")
+    parser.add_argument("--dry-run", action="store_true", help="Only validate the catalog.")
+    args = parser.parse_args(argv)
+
+    import boto3
+
+    s3_client = boto3.client("s3") if args.source.startswith("s3://") else None
+    catalog = read_catalog(args.source, s3_client)
+    errors = validate_catalog(catalog)
+    if errors:
+        print(f"Catalog has {len(errors)} problem(s); nothing was imported:")
+        for error in errors:
+            print(f"  - {error}")
+        return 1
+
+    print(f"Catalog is valid: {len(catalog)} SKUs.")
+    if args.dry_run:
+        return 0
+    if not args.table:
+        parser.error("--table is required unless --dry-run is given.")
+
+    count = import_catalog(catalog, boto3.resource("dynamodb").Table(args.table))
+    print(f"Imported {count} SKUs into {args.table}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Profiles the import (init phase) cost of each Lambda function.
+
+Every function's `app` module is imported in a fresh interpreter with
+`python -X importtime`, the same way Lambda imports it on a cold start
+(function code and layers on the path), and the slowest imports are listed.
+
+Usage (from the backend directory):
+
+    python tools/profile_cold_start.py
+    python tools/profile_cold_start.py forge_function --top 20
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+LAYER_DIRS = [os.path.join(BACKEND_DIR, "catalog_layer")]
+
+FUNCTIONS = [
+    "forge_function",
+    "status_function",
+    "resolve_function",
+    "render_callback_function",
+    "worker_function",
+]
+
+# Import-time budgets (ms): about 1.5x what each function measures on a
+# developer machine (forge ~350 ms, status ~310, resolve and render callback
+# ~400, worker ~630, mostly boto3 and aiohttp). Wall-clock times vary with
+# the machine and its load, so tests/unit/test_cold_start.py only checks
+# them with COLD_START_BUDGETS set (1, or a factor to scale them by); its
+# FORBIDDEN_IMPORTS check always runs. Re-measure with this script when a
+# dependency changes.
+IMPORT_BUDGETS_MS = {
+    "forge_function": 550,
+    "status_function": 500,
+    "resolve_function": 600,
+    "render_callback_function": 600,
+    "worker_function": 950,
+}
+
+# Packages a function must not import at init time
+FORBIDDEN_IMPORTS = {
+    "forge_function": ["aiohttp", "huggingface_hub"],
+    "status_function": ["aiohttp", "huggingface_hub"],
+    "resolve_function": ["aiohttp", "huggingface_hub"],
+    "render_callback_function": ["aiohttp", "huggingface_hub"],
+    # Clips are requested through video_client, not huggingface_hub, and
+    # numpy is only imported with the clip index, on first use
+    "worker_function": ["huggingface_hub", "numpy"],
+}
+
+
+def measure_import(function):
+    """
+    Imports a function's `app` module in a fresh interpreter.
+
+    Returns:
+        tuple: The total import time in ms and a dict of every imported
+               module mapped to its cumulative import time in ms.
+    """
+    function_dir = os.path.join(BACKEND_DIR, function)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([function_dir, *LAYER_DIRS])
+    env.setdefault("AWS_DEFAULT_REGION", "ap-south-1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=function_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules[name] = int(cumulative) / 1000
+    return modules.get("app", 0.0), modules
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the cold-start imports of the Lambda functions.")
+    parser.add_argument("functions", nargs="*", default=FUNCTIONS)
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list.")
+    args = parser.parse_args(argv)
+
+    for function in args.functions:
+        total, modules = measure_import(function)
+        print(f"{function}: {total:.0f} ms (budget {IMPORT_BUDGETS_MS.get(function, '-')} ms)")
+        top_level = {name: ms for name, ms in modules.items() if "." not in name and name != "app"}
+        for name, ms in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {ms:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+# Number of threads used to drive blocking boto3 calls from the event loop
+AWS_IO_WORKERS = int(os.environ.get("AWS_IO_WORKERS", "8"))
+# Keep-alive connections per provider; sized for the stages running at the same time
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", os.environ.get("PIPELINE_MAX_WORKERS", "4")))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5"))
+# Longest silence allowed between two reads of a response, in seconds
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", "60"))
+HTTP_KEEPALIVE_SECONDS = 60
+
+# Read timeouts that differ from HTTP_READ_TIMEOUT, by provider
+PROVIDER_READ_TIMEOUTS = {
+    "shotstack": 30,
+}
+
+_loop = None
+_loop_lock = threading.Lock()
+_sessions = {}
+_aws_executor = ThreadPoolExecutor(max_workers=AWS_IO_WORKERS, thread_name_prefix="aws-io")
+
+
+def get_loop():
+    """
+    Returns the worker's I/O event loop, starting it on first use.
+
+    The loop runs forever on a daemon thread, so it (and every HTTP session
+    bound to it) survives across warm invocations of the Lambda container.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="io-loop", daemon=True).start()
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine on the I/O event loop and blocks until it finishes.
+
+    This is what lets the synchronous `generate_*` functions stay thin
+    wrappers around their asynchronous counterparts.
+
+    Args:
+        coro (coroutine): The coroutine to run.
+
+    Returns:
+        The result of the coroutine.
+    """
+    loop = get_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        coro.close()
+        raise RuntimeError("run_sync() cannot be called from the I/O event loop itself.")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def get_session(provider="default"):
+    """
+    Returns the pooled aiohttp session of a provider. Must be called on the
+    I/O event loop.
+
+    Each provider gets its own keep-alive connection pool, so warm
+    invocations (and every Shotstack status poll) reuse an open TLS
+    connection instead of handshaking again, and one slow provider cannot
+    use up another one's connections. Every request is bounded by a connect
+    timeout and a read timeout.
+
+    Args:
+        provider (str): The provider name, e.g. 'openrouter' or 'shotstack'.
+
+    Returns:
+        aiohttp.ClientSession: The provider's session.
+    """
+    session = _sessions.get(provider)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+                ttl_dns_cache=300,
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                connect=HTTP_CONNECT_TIMEOUT,
+                sock_read=PROVIDER_READ_TIMEOUTS.get(provider, HTTP_READ_TIMEOUT),
+            ),
+        )
+        _sessions[provider] = session
+    return session
+
+
+async def aws_call(func, *args, **kwargs):
+    """
+    Awaits a blocking boto3 call (S3, DynamoDB, SSM).
+
+    boto3 has no native asyncio support, so the call is handed to a small,
+    bounded pool shared by the whole container instead of a thread per call.
+
+    Args:
+        func (callable): A boto3 client/resource method, e.g. `s3.put_object`.
+
+    Returns:
+        The boto3 response.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_aws_executor, functools.partial(func, *args, **kwargs))
+
+
+async def raise_for_status(response, provider, expected=(200,)):
+    """
+    Logs the provider's error body and raises if the response is not one of
+    the expected status codes.
+    """
+    if response.status not in expected:
+        print(f"Error from {provider} API: {await response.text()}")
+    response.raise_for_status()
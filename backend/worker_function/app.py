@@ -1,23 +1,143 @@
 import json
 import os
+import asyncio
 import boto3
-import requests
+from botocore.exceptions import ClientError
 import time
 import uuid
-from huggingface_hub import InferenceClient
-from threading import Thread
-import hashlib
+from urllib.parse import urlencode
 from decimal import Decimal
+from aio import aws_call, get_session, raise_for_status, run_sync
+from asset_store import AssetStore, SpooledAsset
+from blueprint_cache import BlueprintCache, blueprint_cache_key
+from catalog_store import DynamoCatalog, ProductCatalog
+from clip_cache import ClipCache, claim_or_wait, holding_lease
+from json_stream import JsonArrayStreamParser
+from pipeline import Pipeline
+from render_cache import RenderCache, render_object_key, timeline_fingerprint, timeline_sources
+from rate_limiter import DynamoTokenBucketStore, MemoryTokenBucketStore, RateLimiter, parse_budgets
+from secret_cache import SecretCache
+from video_client import HF_HUB_URL, TextToVideoClient
+from voiceover_cache import VoiceoverCache, voiceover_cache_key
+from video_router import HedgeReport, VideoRouter, emit_metrics, parse_routes
 
 # Initialize AWS clients
 s3 = boto3.client("s3")
 ssm = boto3.client("ssm")
 dynamodb = boto3.resource("dynamodb")
+asset_store = AssetStore(s3)
+
+# Worker settings from environment variables set in template.yaml
+JOBS_TABLE_NAME = os.environ.get("JOBS_TABLE_NAME")
+CLIP_CACHE_TABLE_NAME = os.environ.get("CLIP_CACHE_TABLE_NAME")
+CATALOG_TABLE_NAME = os.environ.get("CATALOG_TABLE_NAME")
+RATE_LIMIT_TABLE_NAME = os.environ.get("RATE_LIMIT_TABLE_NAME")
+# Blueprints are memoised only when a table is configured
+BLUEPRINT_CACHE_TABLE_NAME = os.environ.get("BLUEPRINT_CACHE_TABLE_NAME")
+BLUEPRINT_CACHE_TTL_SECONDS = float(os.environ.get("BLUEPRINT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+PRODUCT_DB_BUCKET = os.environ.get("PRODUCT_DB_BUCKET")
+# 'audio' runs blueprint + voiceover only, 'full' renders the complete ad
+WORKER_MODE = os.environ.get("WORKER_MODE", "audio")
+# Maximum number of pipeline stages running at the same time
+PIPELINE_MAX_WORKERS = int(os.environ.get("PIPELINE_MAX_WORKERS", "4"))
+# 'threads' runs stages on a thread pool, 'async' runs them as coroutines
+WORKER_IO_MODE = os.environ.get("WORKER_IO_MODE", "threads")
+# 'webhook' lets Shotstack call back when the render is done, 'poll' waits in the worker
+RENDER_COMPLETION = os.environ.get("RENDER_COMPLETION", "poll")
+# Overrides the callback URL passed in by the ForgeFunction (e.g. for local testing)
+RENDER_CALLBACK_URL = os.environ.get("RENDER_CALLBACK_URL")
+SHOTSTACK_API_URL = os.environ.get("SHOTSTACK_API_URL", "https://api.shotstack.io/v1")
+ELEVENLABS_API_URL = os.environ.get("ELEVENLABS_API_URL", "https://api.elevenlabs.io/v1")
+OPENROUTER_API_URL = os.environ.get("OPENROUTER_API_URL", "https://openrouter.ai/api/v1")
+# Overrides every text-to-video provider and Hub URL (e.g. `local/provider_stub.py`)
+VIDEO_API_URL = os.environ.get("VIDEO_API_URL")
+# 'on' reuses the final video of an identical earlier timeline (stored in the clip cache table)
+RENDER_CACHE = os.environ.get("RENDER_CACHE", "off")
+# How long the URL of a final video served from the render cache is valid
+FINAL_VIDEO_URL_SECONDS = int(os.environ.get("FINAL_VIDEO_URL_SECONDS", str(24 * 3600)))
+# Text-to-video 'provider:model' routes, in order of preference
+VIDEO_ROUTES = os.environ.get("VIDEO_ROUTES", "replicate:Wan-AI/Wan2.2-T2V-A14B")
+VIDEO_BREAKER_FAILURES = int(os.environ.get("VIDEO_BREAKER_FAILURES", "3"))
+VIDEO_BREAKER_RESET_SECONDS = float(os.environ.get("VIDEO_BREAKER_RESET_SECONDS", "60"))
+# Hedge a clip request once it runs past this percentile of its route's latency (0 disables)
+CLIP_HEDGE_PERCENTILE = float(os.environ.get("CLIP_HEDGE_PERCENTILE", "0"))
+CLIP_HEDGE_MIN_SAMPLES = int(os.environ.get("CLIP_HEDGE_MIN_SAMPLES", "5"))
+# Request budgets per provider, 'name=per_minute:burst' (video routes use their provider name)
+PROVIDER_RATE_LIMITS = os.environ.get("PROVIDER_RATE_LIMITS", "")
+RATE_LIMIT_MAX_WAIT_SECONDS = float(os.environ.get("RATE_LIMIT_MAX_WAIT_SECONDS", "120"))
+VIDEO_REQUEST_TIMEOUT = float(os.environ.get("VIDEO_REQUEST_TIMEOUT", "120"))
+# Extra parameters for every text-to-video request (e.g. '{"seed": 42, "resolution": "480p"}'), part of the clip cache key
+CLIP_GENERATION_PARAMETERS = json.loads(os.environ.get("CLIP_GENERATION_PARAMETERS") or "{}")
+# The route that generated clip cache entries written before keys were versioned ('' ignores them)
+CLIP_LEGACY_ROUTE = os.environ.get("CLIP_LEGACY_ROUTE", "replicate:Wan-AI/Wan2.2-T2V-A14B")
+# Cached clips unused for this long expire (0 keeps them until evicted)
+CLIP_CACHE_TTL_SECONDS = float(os.environ.get("CLIP_CACHE_TTL_SECONDS", "0"))
+# How long a job may hold the generation of a clip before others take it over (0 disables single-flight)
+CLIP_LEASE_SECONDS = float(os.environ.get("CLIP_LEASE_SECONDS", "300"))
+CLIP_LEASE_POLL_SECONDS = float(os.environ.get("CLIP_LEASE_POLL_SECONDS", "2"))
+# Cached clips whose prompt is at least this similar are looked up on an exact miss (0 disables)
+CLIP_SIMILARITY_THRESHOLD = float(os.environ.get("CLIP_SIMILARITY_THRESHOLD", "0"))
+# 'shadow' only measures what the threshold would reuse, 'reuse' serves the similar clips
+CLIP_SIMILARITY_MODE = os.environ.get("CLIP_SIMILARITY_MODE", "shadow")
+CLIP_INDEX_KEY = os.environ.get("CLIP_INDEX_KEY", "clip_index/prompts")
+CLIP_INDEX_REFRESH_SECONDS = float(os.environ.get("CLIP_INDEX_REFRESH_SECONDS", "300"))
+CATALOG_REFRESH_SECONDS = float(os.environ.get("CATALOG_REFRESH_SECONDS", "60"))
+SECRETS_TTL_SECONDS = float(os.environ.get("SECRETS_TTL_SECONDS", "300"))
+NUM_ACTS = 3
+
+ELEVENLABS_MODEL_ID = "eleven_multilingual_v2"
+ELEVENLABS_VOICE_SETTINGS = {"stability": 0.5, "similarity_boost": 0.5}
+
+BLUEPRINT_MODEL = "google/gemini-flash-1.5"
+# Part of the blueprint cache key: bump it whenever the blueprint prompt or
+# BLUEPRINT_MODEL changes, so blueprints from the old prompt are not reused
+BLUEPRINT_PROMPT_VERSION = "1"
+
+# Parameter Store names of the provider API keys, by provider
+SECRET_PARAMS = {
+    "openrouter": os.environ.get("OPENROUTER_API_KEY_PARAM"),
+    "elevenlabs": os.environ.get("ELEVENLABS_API_KEY_PARAM"),
+    "hf": os.environ.get("HF_TOKEN_PARAM"),
+    "shotstack": os.environ.get("SHOTSTACK_API_KEY_PARAM"),
+}
+
+# Every configured secret is loaded in one batch and cached for the container's lifetime
+secret_cache = SecretCache(ssm, SECRET_PARAMS.values(), ttl_seconds=SECRETS_TTL_SECONDS)
+
+# Shared by every worker through DynamoDB; in memory when no table is configured (local runs)
+rate_limiter = RateLimiter(
+    DynamoTokenBucketStore(dynamodb.Table(RATE_LIMIT_TABLE_NAME))
+    if RATE_LIMIT_TABLE_NAME else MemoryTokenBucketStore(),
+    parse_budgets(PROVIDER_RATE_LIMITS),
+    max_wait=RATE_LIMIT_MAX_WAIT_SECONDS,
+)
+
+blueprint_cache = (
+    BlueprintCache(dynamodb.Table(BLUEPRINT_CACHE_TABLE_NAME), ttl_seconds=BLUEPRINT_CACHE_TTL_SECONDS)
+    if BLUEPRINT_CACHE_TABLE_NAME else None
+)
+
+# Product catalogs by bucket (or the catalog table), kept for the container's lifetime
+product_catalogs = {}
+
+# Clip similarity indexes by bucket, kept for the container's lifetime
+clip_indexes = {}
+
+# Text-to-video clients by (provider, token), reused across warm invocations
+video_clients = {}
+
+# Kept at module level so route health carries over between warm invocations
+video_router = VideoRouter(
+    parse_routes(VIDEO_ROUTES),
+    failure_threshold=VIDEO_BREAKER_FAILURES,
+    reset_seconds=VIDEO_BREAKER_RESET_SECONDS,
+)
 
 
 def get_secret(param_name):
     """
     Retrieves a secret API key securely from AWS Systems Manager Parameter Store.
+    Served from the container's `secret_cache` once loaded.
 
     Args:
         param_name (str): The name of the parameter to retrieve.
@@ -26,21 +146,25 @@ def get_secret(param_name):
         str: The decrypted secret value.
     """
     try:
-        response = ssm.get_parameter(Name=param_name, WithDecryption=True)
-        return response["Parameter"]["Value"]
+        return secret_cache.get(param_name)
     except Exception as e:
         print(f"Error retrieving secret {param_name}: {e}")
         raise
 
 
-def generate_ad_blueprint(product_data, user_context, api_key, language_preference):
+async def generate_ad_blueprint_async(product_data, user_context, api_key, language_preference, on_act=None):
     """
     Acts as an AI Creative Director, using an LLM to generate a complete ad blueprint.
 
+    The completion is streamed; every entry of 'acts' is handed to `on_act` as
+    soon as it is complete in the stream, while the rest of the blueprint
+    (e.g. the voiceover script) is still being generated.
+
     Args:
         product_data (dict): Information about the Samsung product.
         user_context (str): The creative brief provided by the retailer.
         api_key (str): openrouter api key
+        on_act (callable): Optional callback, called as on_act(index, act).
 
     Returns:
         dict: A JSON object containing the 'acts' (visual prompts) and the 'voiceover_script'.
@@ -103,41 +227,142 @@ def generate_ad_blueprint(product_data, user_context, api_key, language_preferen
     }
 
     payload = {
-        "model": "google/gemini-flash-1.5",
+        "model": BLUEPRINT_MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "response_format": {"type": "json_object"},  # Ask for JSON output
+        "stream": True,
     }
 
-    response = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions", headers=headers, json=payload
+    acts_parser = JsonArrayStreamParser("acts")
+    acts_seen = 0
+    content = []
+    await rate_limiter.acquire("openrouter")
+    async with get_session("openrouter").post(
+        f"{OPENROUTER_API_URL}/chat/completions", headers=headers, json=payload
+    ) as response:
+        await raise_for_status(response, "LLM")
+        # Server-sent events: 'data: {...}' lines, ': comment' keep-alives, 'data: [DONE]'
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                print(f"Error from LLM API: {data}")
+                raise Exception(f"LLM stream failed: {chunk['error'].get('message', chunk['error'])}")
+            delta = chunk["choices"][0].get("delta", {}).get("content") or ""
+            content.append(delta)
+            for act in acts_parser.feed(delta):
+                if on_act:
+                    on_act(acts_seen, act)
+                acts_seen += 1
+
+    # Parse the complete JSON string from the stream
+    return json.loads("".join(content))
+
+
+def generate_ad_blueprint(product_data, user_context, api_key, language_preference, on_act=None):
+    """
+    Synchronous wrapper around `generate_ad_blueprint_async`.
+    """
+    return run_sync(
+        generate_ad_blueprint_async(product_data, user_context, api_key, language_preference, on_act)
     )
 
-    if response.status_code != 200:
-        print(f"Error from LLM API: {response.text}")
-    response.raise_for_status()
 
-    # Parse the JSON string from the response
-    blueprint_str = response.json()["choices"][0]["message"]["content"]
-    return json.loads(blueprint_str)
+async def get_ad_blueprint_async(sku, product_data, user_context, api_key, language_preference, fresh=False, on_act=None):
+    """
+    Returns the ad blueprint for a brief, from the blueprint cache when the
+    same SKU, normalised brief, language and prompt version were generated
+    before; otherwise it is generated by `generate_ad_blueprint_async` and
+    cached (a failed write is only logged). A cached blueprint skips the LLM
+    call entirely, and since its acts are the same, so are the clip prompts
+    (and clip cache hits).
 
+    Args:
+        sku (str): The product SKU.
+        fresh (bool): Ignore a cached blueprint and generate a new one (which
+                      replaces the cached entry).
+        on_act (callable): Called as on_act(index, act), for cached blueprints too.
 
-def generate_voiceover(script, voice_id, api_key, bucket_name):
+    Returns:
+        dict: The blueprint.
+    """
+    if not blueprint_cache:
+        return await generate_ad_blueprint_async(product_data, user_context, api_key, language_preference, on_act)
+
+    key = blueprint_cache_key(sku, user_context, language_preference, BLUEPRINT_PROMPT_VERSION)
+    if not fresh:
+        ad_blueprint = await aws_call(blueprint_cache.get, key)
+        if ad_blueprint is not None:
+            print(f"BLUEPRINT CACHE HIT for SKU {sku} ({language_preference}).")
+            for i, act in enumerate(ad_blueprint.get("acts", [])):
+                if on_act:
+                    on_act(i, act)
+            return ad_blueprint
+
+    print(f"BLUEPRINT CACHE {'BYPASS' if fresh else 'MISS'} for SKU {sku} ({language_preference}).")
+    ad_blueprint = await generate_ad_blueprint_async(product_data, user_context, api_key, language_preference, on_act)
+    try:
+        await aws_call(
+            blueprint_cache.put, key, ad_blueprint,
+            sku=sku, language=language_preference, promptVersion=BLUEPRINT_PROMPT_VERSION,
+        )
+    except Exception as e:
+        # The blueprint is already paid for; the job goes on without caching it
+        print(f"Could not cache the blueprint for SKU {sku}: {e}")
+    return ad_blueprint
+
+
+def get_ad_blueprint(sku, product_data, user_context, api_key, language_preference, fresh=False, on_act=None):
+    """
+    Synchronous wrapper around `get_ad_blueprint_async`.
+    """
+    return run_sync(get_ad_blueprint_async(
+        sku, product_data, user_context, api_key, language_preference, fresh, on_act
+    ))
+
+
+async def generate_voiceover_async(script, voice_id, api_key, bucket_name, cache_table=None, count_lookups=True):
     """
     Generates a voiceover using the ElevenLabs API and uploads it to S3.
 
+    The audio is requested from the streaming endpoint and uploaded to S3
+    as the chunks arrive, in multipart parts once it outgrows one part (see
+    `StreamedUpload`), so memory use does not grow with the length of the
+    script and the upload ends with the synthesis. With a `cache_table`, a
+    voiceover already synthesised from the same script, voice, model and
+    voice settings is reused without calling ElevenLabs (see
+    `voiceover_cache`).
+
     Args:
         script (str): The text script for the voiceover.
         voice_id (str): selected voice_id from elevenlabs
         api_key (str): The ElevenLabs API key.
         bucket_name (str): The S3 bucket to upload the generated audio to.
+        cache_table (Table): The clip cache table, which also indexes voiceovers.
+        count_lookups (bool): Whether the cache lookup counts towards its statistics.
 
     Returns:
-        str: A presigned URL to the generated audio file in S3.
+        str: The 's3://' reference of the generated audio file.
     """
+    voiceover_cache = None
+    if cache_table is not None:
+        voiceover_cache = VoiceoverCache(
+            cache_table, ttl_seconds=CLIP_CACHE_TTL_SECONDS, count_lookups=count_lookups
+        )
+        cache_key = voiceover_cache_key(script, voice_id, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS)
+        cached_uri = await aws_call(voiceover_cache.get, cache_key)
+        if cached_uri:
+            print(f"VOICEOVER CACHE HIT for Voice ID: {voice_id}.")
+            return cached_uri
 
     print(f"Generating voiceover with selected Voice ID: {voice_id}...")
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"  # Use the selected voice_id
+    url = f"{ELEVENLABS_API_URL}/text-to-speech/{voice_id}/stream"  # Use the selected voice_id
     headers = {
         "Accept": "audio/mpeg",
         "Content-Type": "application/json",
@@ -145,102 +370,233 @@ def generate_voiceover(script, voice_id, api_key, bucket_name):
     }
     payload = {
         "text": script,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {"stability": 0.5, "similarity_boost": 0.5},
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS,
     }
 
-    response = requests.post(url, json=payload, headers=headers)
-    response.raise_for_status()
+    await rate_limiter.acquire("elevenlabs")
+    async with asset_store.open_upload(bucket_name, "audio", "mp3", "audio/mpeg") as audio:
+        async with get_session("elevenlabs").post(url, json=payload, headers=headers) as response:
+            await raise_for_status(response, "ElevenLabs")
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                await audio.write_async(chunk)
+        print(f"Received {audio.size} bytes of voiceover audio.")
+        s3_uri = await audio.complete_async()
+        if voiceover_cache:
+            await aws_call(
+                voiceover_cache.put, cache_key, s3_uri, audio.size, script, voice_id, ELEVENLABS_MODEL_ID
+            )
+        return s3_uri
+
+
+def generate_voiceover(script, voice_id, api_key, bucket_name, cache_table=None, count_lookups=True):
+    """
+    Synchronous wrapper around `generate_voiceover_async`.
+    """
+    return run_sync(generate_voiceover_async(script, voice_id, api_key, bucket_name, cache_table, count_lookups))
+
+
+def get_video_client(provider, hf_token):
+    """
+    Returns the text-to-video client of a provider, reusing it (and its
+    connection pool) across the clips of a job and across warm invocations.
+    """
+    key = (provider, hf_token)
+    if key not in video_clients:
+        video_clients[key] = TextToVideoClient(
+            provider, hf_token, timeout=VIDEO_REQUEST_TIMEOUT, base_url=VIDEO_API_URL,
+            hub_url=VIDEO_API_URL or HF_HUB_URL,
+        )
+    return video_clients[key]
+
 
-    audio_key = f"audio/{uuid.uuid4()}.mp3"
-    s3.put_object(
-        Bucket=bucket_name,
-        Key=audio_key,
-        Body=response.content,
-        ContentType="audio/mpeg",
+def get_clip_index(bucket_name):
+    """
+    Returns the clip similarity index of a bucket, reused across warm invocations.
+    """
+    # Imported on first use, so containers that never look up similar clips
+    # do not pay for numpy on their cold start
+    from clip_index import ClipIndexStore
+
+    if bucket_name not in clip_indexes:
+        clip_indexes[bucket_name] = ClipIndexStore(
+            s3, bucket_name, CLIP_INDEX_KEY, refresh_seconds=CLIP_INDEX_REFRESH_SECONDS
+        )
+    return clip_indexes[bucket_name]
+
+
+def find_similar_clip(prompt, bucket_name, variants=None):
+    """
+    Looks for a cached clip with a near-identical prompt (generated as one
+    of `variants`) and records the outcome and the best similarity score as
+    metrics, so the threshold can be tuned against the reuse rate (in
+    'shadow' mode before any similar clip is served). Index errors count as
+    a miss.
+
+    Returns:
+        dict: The matching cache entry, or None.
+    """
+    try:
+        match, score = get_clip_index(bucket_name).search(prompt, CLIP_SIMILARITY_THRESHOLD, variants)
+    except Exception as e:
+        print(f"Clip index lookup failed, treating it as a miss: {e}")
+        return None
+    emit_metrics(
+        {"Mode": CLIP_SIMILARITY_MODE, "Result": "hit" if match else "miss"},
+        {"ClipSimilarity": (score, "None")},
+        namespace="AdForge/ClipCache",
     )
+    if match:
+        print(f"SIMILAR CLIP HIT ({CLIP_SIMILARITY_MODE}, {score:.3f}) for prompt: {prompt[:30]}... "
+              f"-> {match['promptText'][:30]}...")
+    else:
+        print(f"SIMILAR CLIP MISS (best {score:.3f}) for prompt: {prompt[:30]}...")
+    return match
 
-    # Generate a presigned URL for public access (valid for 10 minutes)
-    audio_url = s3.generate_presigned_url(
-        "get_object", Params={"Bucket": bucket_name, "Key": audio_key}, ExpiresIn=600
+
+def get_clip_cache(cache_table, count_lookups=True):
+    """
+    Returns the clip cache with the worker's generation parameters, legacy
+    route and TTL.
+    """
+    return ClipCache(
+        cache_table, CLIP_GENERATION_PARAMETERS, CLIP_LEGACY_ROUTE, ttl_seconds=CLIP_CACHE_TTL_SECONDS,
+        count_lookups=count_lookups,
     )
-    return audio_url
 
 
-def generate_video_clip(prompt, hf_client_video, results_list, index, bucket_name, cache_table):
+async def generate_video_clip_async(prompt, hf_token, bucket_name, cache_table, router=None, hedge_report=None,
+                                    count_lookups=True):
     """
-    Generates a single video clip using the Hugging Face client for Fal.ai.
+    Generates a single video clip on the healthiest configured text-to-video
+    provider (see `video_router.VideoRouter`). Cached clips are reused only
+    if they were generated by one of the router's routes with the same
+    generation parameters (see `clip_cache`). On an exact cache miss a
+    cached clip with a near-identical prompt is reused when
+    `CLIP_SIMILARITY_THRESHOLD` is set and `CLIP_SIMILARITY_MODE` is
+    'reuse' (see `clip_index`). Concurrent misses
+    on the same prompt generate it once: the first job claims a lease and
+    the others wait for its clip (see `clip_cache.claim_or_wait`).
 
     Args:
         prompt (str): The text prompt for the video generation.
-        hf_client (InferenceClient): The initialized Hugging Face client.
-        results_list (list): A list to store the output video bytes.
-        index (int): The index in the list to store the result.
+        hf_token (str): The Hugging Face token used for every provider.
+        bucket_name (str): The S3 bucket holding the clip cache.
+        cache_table (Table): The DynamoDB table indexing cached clips.
+        router (VideoRouter): The router to use, defaults to the worker's shared one.
+        hedge_report (HedgeReport): Collects the job's hedging statistics.
+        count_lookups (bool): Whether the lookup counts towards the cache statistics.
+
+    Returns:
+        str: The 's3://' reference of the generated (or cached) MP4 video.
     """
-    print(f"Starting video generation for prompt {index+1}...")
+    print(f"Starting video generation for prompt: {prompt[:30]}...")
     try:
-        prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
-        cache_response = cache_table.get_item(Key={'promptHash': prompt_hash})
-        if 'Item' in cache_response:
+        router = router or video_router
+        clip_cache = get_clip_cache(cache_table, count_lookups)
+        cached = await aws_call(clip_cache.get, prompt, router.routes)
+        if cached:
             print(f"CACHE HIT for prompt: {prompt[:30]}...")
-            s3_uri = cache_response['Item']['s3_uri']
-            
-            # Download the video bytes from the cached S3 location
-            bucket = s3_uri.split('/')[2]
-            key = '/'.join(s3_uri.split('/')[3:])
-            video_object = s3.get_object(Bucket=bucket, Key=key)
-            results_list[index] = video_object['Body'].read()
-            return
-        
-        print(f"CACHE MISS for prompt: {prompt[:30]}... Generating new clip.")
-        video_bytes = hf_client_video.text_to_video(
-            prompt,
-            model="Wan-AI/Wan2.2-T2V-A14B",
-        )
+            await aws_call(clip_cache.record, "hits")
+            # Hand out the cached clip by reference; it is never downloaded
+            return cached['s3_uri']
 
-        clip_key = f"cached_clips/{prompt_hash}.mp4"
-        s3.put_object(Bucket=bucket_name, Key=clip_key, Body=video_bytes, ContentType='video/mp4')
-        new_s3_uri = f"s3://{bucket_name}/{clip_key}"
+        if CLIP_SIMILARITY_THRESHOLD > 0:
+            match = await aws_call(
+                find_similar_clip, prompt, bucket_name, clip_cache.accepted_variants(router.routes)
+            )
+            # In shadow mode the match is only measured. The index may still
+            # list clips that were evicted since it was built
+            if match and CLIP_SIMILARITY_MODE == "reuse" and await aws_call(clip_cache.touch, match['promptHash']):
+                await aws_call(clip_cache.record, "similarHits")
+                return match['s3_uri']
 
-        cache_table.put_item(Item={
-            'promptHash': prompt_hash,
-            'promptText': prompt,
-            's3_uri': new_s3_uri,
-            'createdAt': int(time.time())
-        })
-        print(f"Saved new clip to cache for prompt: {prompt[:30]}...")
-        print(f"Finished video generation for prompt {index+1}.")
-        results_list[index] = video_bytes
+        print(f"CACHE MISS for prompt: {prompt[:30]}... Generating new clip.")
+        if CLIP_LEASE_SECONDS > 0:
+            lease_owner = uuid.uuid4().hex
+            cached = await claim_or_wait(
+                clip_cache, prompt, router.routes, lease_owner, CLIP_LEASE_SECONDS, CLIP_LEASE_POLL_SECONDS
+            )
+            if cached:
+                await aws_call(clip_cache.record, "coalescedHits")
+                return cached['s3_uri']
+            async with holding_lease(clip_cache, prompt, router.routes, lease_owner, CLIP_LEASE_SECONDS):
+                new_s3_uri = await _generate_and_cache_clip(
+                    prompt, hf_token, bucket_name, clip_cache, router, hedge_report
+                )
+        else:
+            new_s3_uri = await _generate_and_cache_clip(prompt, hf_token, bucket_name, clip_cache, router, hedge_report)
+        await aws_call(clip_cache.record, "misses")
+        return new_s3_uri
 
     except Exception as e:
-        # --- THIS IS THE NEW DEBUGGING LOGIC ---
-        print(f"--- DETAILED ERROR CAUGHT for clip {index+1} ---")
+        print(f"--- DETAILED ERROR CAUGHT for clip ---")
         print(f"PROMPT: {prompt}")
         print(f"EXCEPTION TYPE: {type(e).__name__}")
         print(f"FULL ERROR: {e}")
         print(f"-------------------------------------------")
-        results_list[index] = None
-        print(f"Error generating clip {index+1}: {e}")
-        results_list[index] = None
+        raise
 
 
-def generate_final_video(clips, voiceover_url, music_url, api_key):
+async def _generate_and_cache_clip(prompt, hf_token, bucket_name, clip_cache, router, hedge_report):
     """
-    Assembles all generated and curated assets into a final video using the Shotstack API.
-
-    Args:
-        clips (list): A list of presigned URLs to the AI-generated video clips.
-        voiceover_url (str): A presigned URL to the AI-generated voiceover.
-        music_url (str): A presigned URL to the background music track.
-        api_key (str): The Shotstack API key.
+    Generates a clip on the router's routes, uploads it and stores it in the cache.
 
     Returns:
-        str: The URL of the final, rendered video ad.
+        str: The 's3://' reference of the new clip.
     """
-    print("Assembling final, multi-track video with Shotstack...")
-    url = "https://api.shotstack.io/v1/render"
-    headers = {"x-api-key": api_key, "Content-Type": "application/json"}
+    async def request(route):
+        await rate_limiter.acquire(route.provider)
+        client = get_video_client(route.provider, hf_token)
+        # The clip is streamed to a spooled file as it downloads; a
+        # cancelled hedge or a failed download discards its copy
+        clip = SpooledAsset()
+        try:
+            return await client.text_to_video_into(
+                clip, prompt, model=route.model, **CLIP_GENERATION_PARAMETERS
+            )
+        except BaseException:
+            clip.close()
+            raise
+
+    clip, route = await router.call_hedged(
+        request, CLIP_HEDGE_PERCENTILE, CLIP_HEDGE_MIN_SAMPLES, hedge_report
+    )
+    print(f"Clip generated by {route.name} for prompt: {prompt[:30]}...")
+
+    with clip:
+        new_s3_uri = await asset_store.put_spooled_async(
+            clip, bucket_name, "cached_clips", "mp4", "video/mp4"
+        )
+
+    entry = await aws_call(clip_cache.put, prompt, route, new_s3_uri, clip.size)
+    if CLIP_SIMILARITY_THRESHOLD > 0:
+        try:
+            await aws_call(get_clip_index(bucket_name).add, entry)
+        except Exception as e:
+            print(f"Could not add the clip to the clip index: {e}")
+    print(f"Saved new clip to cache for prompt: {prompt[:30]}...")
+    return new_s3_uri
+
+
+def generate_video_clip(prompt, hf_token, bucket_name, cache_table, router=None, hedge_report=None,
+                        count_lookups=True):
+    """
+    Synchronous wrapper around `generate_video_clip_async`.
+    """
+    return run_sync(generate_video_clip_async(
+        prompt, hf_token, bucket_name, cache_table, router, hedge_report, count_lookups
+    ))
+
+
+def render_payload(clips, voiceover_url, music_url, callback_url=None):
+    """
+    Builds the Shotstack render request: the video track, the voiceover and
+    the background music.
 
+    Returns:
+        dict: The JSON payload of the render request.
+    """
     total_video_length = sum(c.get("length", 0) for c in clips)
     video_track = {"clips": clips}
     voiceover_track = {
@@ -266,284 +622,697 @@ def generate_final_video(clips, voiceover_url, music_url, api_key):
         "timeline": {"tracks": [video_track, voiceover_track, music_track]},
         "output": {"format": "mp4", "resolution": "hd"},
     }
+    if callback_url:
+        payload["callback"] = callback_url
+    return payload
+
+
+async def submit_render_async(clips, voiceover_url, music_url, api_key, callback_url=None):
+    """
+    Submits all generated and curated assets to the Shotstack API for rendering.
+
+    Args:
+        clips (list): The video track clips (presigned URLs with start/length).
+        voiceover_url (str): A presigned URL to the AI-generated voiceover.
+        music_url (str): A presigned URL to the background music track.
+        api_key (str): The Shotstack API key.
+        callback_url (str): Optional URL Shotstack notifies when the render
+                            is done or has failed.
+
+    Returns:
+        str: The id of the Shotstack render.
+    """
+    print("Assembling final, multi-track video with Shotstack...")
+    url = f"{SHOTSTACK_API_URL}/render"
+    headers = {"x-api-key": api_key, "Content-Type": "application/json"}
+    payload = render_payload(clips, voiceover_url, music_url, callback_url)
+
+    await rate_limiter.acquire("shotstack")
+    async with get_session("shotstack").post(url, headers=headers, json=payload) as response:
+        await raise_for_status(response, "Shotstack", expected=(201,))
+        render_id = (await response.json())["response"]["id"]
+    print(f"Submitted Shotstack render {render_id}.")
+    return render_id
+
+
+def submit_render(clips, voiceover_url, music_url, api_key, callback_url=None):
+    """
+    Synchronous wrapper around `submit_render_async`.
+    """
+    return run_sync(submit_render_async(clips, voiceover_url, music_url, api_key, callback_url))
+
 
-    response = requests.post(url, headers=headers, json=payload)
-    if response.status_code != 201:
-        print(f"Error from Shotstack API: {response.text}")
-    response.raise_for_status()
-    render_id = response.json()["response"]["id"]
+async def wait_for_render_async(render_id, api_key):
+    """
+    Polls a Shotstack render until it is done. This also re-attaches to a
+    render that was submitted by an earlier attempt of the same job.
+
+    Args:
+        render_id (str): The id of the Shotstack render.
+        api_key (str): The Shotstack API key.
 
-    render_url = f"https://api.shotstack.io/v1/render/{render_id}"
+    Returns:
+        str: The URL of the final, rendered video ad.
+    """
+    session = get_session("shotstack")
+    headers = {"x-api-key": api_key, "Content-Type": "application/json"}
+    render_url = f"{SHOTSTACK_API_URL}/render/{render_id}"
     for _ in range(36):  # Poll for up to 3 minutes
-        time.sleep(5)
-        status_response = requests.get(render_url, headers=headers)
-        status = status_response.json()["response"]["status"]
+        await asyncio.sleep(5)
+        await rate_limiter.acquire("shotstack")
+        async with session.get(render_url, headers=headers) as status_response:
+            status_json = await status_response.json()
+        status = status_json["response"]["status"]
         if status == "done":
-            return status_response.json()["response"]["url"]
+            return status_json["response"]["url"]
         if status == "failed":
-            print(f"Shotstack rendering failed: {status_response.text}")
+            print(f"Shotstack rendering failed: {json.dumps(status_json)}")
             raise Exception("Video rendering failed.")
     raise Exception("Video rendering timed out.")
 
 
-"""def lambda_handler(event, context):
-    
-    The main handler for the long-running worker function.
+def wait_for_render(render_id, api_key):
+    """
+    Synchronous wrapper around `wait_for_render_async`.
+    """
+    return run_sync(wait_for_render_async(render_id, api_key))
 
-    This function is triggered asynchronously by the ForgeFunction. It fetches job
-    details from DynamoDB, runs the full generative AI pipeline, and updates
-    DynamoDB with the final result or an error message.
-    
 
-    job_id = ""
+async def generate_final_video_async(clips, voiceover_url, music_url, api_key):
+    """
+    Assembles all generated and curated assets into a final video using the Shotstack API.
+
+    Returns:
+        str: The URL of the final, rendered video ad.
+    """
+    render_id = await submit_render_async(clips, voiceover_url, music_url, api_key)
+    return await wait_for_render_async(render_id, api_key)
+
+
+def generate_final_video(clips, voiceover_url, music_url, api_key):
+    """
+    Synchronous wrapper around `generate_final_video_async`.
+    """
+    return run_sync(generate_final_video_async(clips, voiceover_url, music_url, api_key))
+
+
+def get_render_cache():
+    """
+    Returns the render cache, or None when RENDER_CACHE is off.
+    """
+    if RENDER_CACHE != "on" or not CLIP_CACHE_TABLE_NAME:
+        return None
+    return RenderCache(dynamodb.Table(CLIP_CACHE_TABLE_NAME), ttl_seconds=CLIP_CACHE_TTL_SECONDS)
+
+
+def timeline_payload(clip_uris, voiceover_uri, assets, callback_url=None):
+    """
+    Builds the render payload of a job from its 's3://' asset references.
+    """
+    return render_payload(build_timeline(clip_uris, assets), voiceover_uri, assets["music"], callback_url)
+
+
+async def fingerprint_render_async(clip_uris, voiceover_uri, assets):
+    """
+    Computes the fingerprint of the render a job would submit, from the
+    content ids of its assets rather than their (expiring) presigned URLs.
+    See `render_cache.timeline_fingerprint`.
+
+    Returns:
+        str: The fingerprint of the timeline.
+    """
+    payload = timeline_payload(clip_uris, voiceover_uri, assets)
+    sources = sorted(set(timeline_sources(payload)))
+    content_ids = await asyncio.gather(*(asset_store.content_id_async(uri) for uri in sources))
+    return timeline_fingerprint(payload, dict(zip(sources, content_ids)))
+
+
+def fingerprint_render(clip_uris, voiceover_uri, assets):
+    """
+    Synchronous wrapper around `fingerprint_render_async`.
+    """
+    return run_sync(fingerprint_render_async(clip_uris, voiceover_uri, assets))
+
+
+async def submit_timeline_async(fingerprint, clip_uris, voiceover_uri, assets, api_key, callback_url=None):
+    """
+    Submits the render of a job's timeline, unless the render cache holds
+    the final video of an identical timeline.
+
+    Returns:
+        str: The id of the Shotstack render, or the 's3://' reference of
+             the stored final video.
+    """
+    render_cache = get_render_cache()
+    if render_cache:
+        stored_uri = await aws_call(render_cache.get, fingerprint)
+        if stored_uri:
+            print(f"RENDER CACHE HIT for timeline {fingerprint[:12]}; skipping the render.")
+            return stored_uri
+    presigned_assets = {
+        "product_shots": [asset_store.presign(uri) for uri in assets["product_shots"]],
+        "logo": asset_store.presign(assets["logo"]),
+        "music": asset_store.presign(assets["music"]),
+    }
+    return await submit_render_async(
+        build_timeline([asset_store.presign(uri) if uri else None for uri in clip_uris], presigned_assets),
+        asset_store.presign(voiceover_uri),
+        presigned_assets["music"],
+        api_key,
+        callback_url,
+    )
+
+
+def submit_timeline(fingerprint, clip_uris, voiceover_uri, assets, api_key, callback_url=None):
+    """
+    Synchronous wrapper around `submit_timeline_async`.
+    """
+    return run_sync(submit_timeline_async(fingerprint, clip_uris, voiceover_uri, assets, api_key, callback_url))
+
+
+def is_stored_render(render_ref):
+    """
+    Tells a stored final video ('s3://' reference) from a Shotstack render id.
+    """
+    return render_ref.startswith("s3://")
+
+
+async def store_render_async(video_url, fingerprint, render_id, bucket_name):
+    """
+    Copies a finished render to 'renders/<fingerprint>.mp4' in the bucket
+    and records it in the render cache, streaming through a spooled file.
+    """
+    render_cache = get_render_cache()
+    if not render_cache:
+        return
+    key = render_object_key(fingerprint)
+    async with get_session("shotstack").get(video_url) as response:
+        await raise_for_status(response, "Shotstack")
+        with SpooledAsset() as video:
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                video.write(chunk)
+            video.file.seek(0)
+            await aws_call(s3.upload_fileobj, video.file, bucket_name, key, ExtraArgs={"ContentType": "video/mp4"})
+            size = video.size
+    await aws_call(render_cache.put, fingerprint, f"s3://{bucket_name}/{key}", size, render_id)
+    print(f"Stored the final video of timeline {fingerprint[:12]} ({size} bytes).")
+
+
+async def finish_render_async(render_ref, api_key, fingerprint, bucket_name):
+    """
+    Waits for a submitted render and stores its final video in the render
+    cache (a failure to store it is only logged). A stored final video is
+    returned straight away.
+
+    Returns:
+        str: The URL of the final, rendered video ad.
+    """
+    if is_stored_render(render_ref):
+        return asset_store.presign(render_ref, FINAL_VIDEO_URL_SECONDS)
+    video_url = await wait_for_render_async(render_ref, api_key)
     try:
-        # 1. Get Job ID from the trigger event
-        job_id = event["jobId"]
-        print(f"Worker started for Job ID: {job_id}")
-
-        # 2. Setup: Get table name and API keys
-        jobs_table_name = os.environ.get("JOBS_TABLE_NAME")
-        cache_table_name = os.environ.get('CLIP_CACHE_TABLE_NAME')
-        table = dynamodb.Table(jobs_table_name)
-        cache_table = dynamodb.Table(cache_table_name)
-        hf_token = get_secret(os.environ.get("HF_TOKEN_PARAM"))
-        elevenlabs_key = get_secret(os.environ.get("ELEVENLABS_API_KEY_PARAM"))
-        shotstack_key = get_secret(os.environ.get("SHOTSTACK_API_KEY_PARAM"))
-        openrouter_key = get_secret(
-            os.environ.get("OPENROUTER_API_KEY_PARAM")
-        )  # Assuming you use this for the blueprint
-
-        # 3. Fetch Job Details from DynamoDB
-        response = table.get_item(Key={"jobId": job_id})
-        item = response.get("Item")
-        if not item:
-            raise Exception(f"Job {job_id} not found in DynamoDB.")
+        await store_render_async(video_url, fingerprint, render_ref, bucket_name)
+    except Exception as e:
+        print(f"Could not store the final video of render {render_ref}: {e}")
+    return video_url
 
-        request_body = item.get("requestBody", {})
-        sku = request_body.get("sku")
-        user_context = request_body.get("user_context")
-        language_preference = request_body.get('language', 'English')
-        bucket_name = "ad-forge-database-amg-2025"
-
-        # -- 2. GET DATA & BLUEPRINT --
-        db_object = s3.get_object(Bucket=bucket_name, Key="product_db.json")
-        product_database = json.loads(db_object["Body"].read().decode("utf-8"))
-        product_data = product_database.get(sku)
-
-        if not product_data:
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"message": f"Product SKU '{sku}' not found."}),
-            }
 
-        print("Generating ad blueprint...")
-        hf_client = InferenceClient(token=openrouter_key)
-        ad_blueprint = generate_ad_blueprint(product_data, user_context, openrouter_key, language_preference)
-        hf_client_video = InferenceClient(provider="replicate", token=hf_token, timeout=120)
-
-        # -- 3. GENERATE ALL ASSETS IN PARALLEL --
-        print("Generating voiceover and video clips in parallel...")
-        threads = []
-        video_clip_bytes = [None] * 3
-
-        for i, act in enumerate(ad_blueprint["acts"]):
-            if isinstance(act, dict):
-                prompt = act.get('prompt', '')
-            else:
-                prompt = str(act)
-
-            thread = Thread(
-                target=generate_video_clip,
-                args=(prompt, hf_client_video, video_clip_bytes, i, bucket_name, cache_table),
-            )
-            threads.append(thread)
-            thread.start()
+def finish_render(render_ref, api_key, fingerprint, bucket_name):
+    """
+    Synchronous wrapper around `finish_render_async`.
+    """
+    return run_sync(finish_render_async(render_ref, api_key, fingerprint, bucket_name))
 
-        voiceover_url = generate_voiceover(
-            ad_blueprint["voiceover_script"],
-            ad_blueprint["voice_id"],
-            elevenlabs_key,
-            bucket_name,
-        )
 
-        for thread in threads:
-            thread.join()
-
-        if None in video_clip_bytes:
-            raise Exception("One or more video clips failed to generate.")
-
-        # --- 4. UPLOAD GENERATED CLIPS & GET URLS ---
-        print("Uploading generated clips to S3...")
-        video_clip_urls = []
-        for video_bytes in video_clip_bytes:
-            clip_key = f"generated_clips/{uuid.uuid4()}.mp4"
-            s3.put_object(
-                Bucket=bucket_name,
-                Key=clip_key,
-                Body=video_bytes,
-                ContentType="video/mp4",
+async def load_secrets_async(mode):
+    """
+    Fetches the API keys the given worker mode needs from Parameter Store.
+    A warm container answers from `secret_cache` without a network call.
+
+    Returns:
+        dict: The API keys, keyed by provider name.
+    """
+    providers = ["openrouter", "elevenlabs"]
+    if mode == "full":
+        providers += ["hf", "shotstack"]
+    values = await aws_call(secret_cache.get_many, [SECRET_PARAMS[p] for p in providers])
+    return {provider: values[SECRET_PARAMS[provider]] for provider in providers}
+
+
+def load_secrets(mode):
+    """
+    Synchronous wrapper around `load_secrets_async`.
+    """
+    return run_sync(load_secrets_async(mode))
+
+
+async def load_product_async(bucket_name, sku):
+    """
+    Returns the catalog entry for one SKU: a single lookup in the catalog
+    table when CATALOG_TABLE_NAME is set, otherwise from the container's warm
+    copy of `product_db.json` in the bucket (see `catalog_store`).
+    """
+    catalog_key = CATALOG_TABLE_NAME or bucket_name
+    if catalog_key not in product_catalogs:
+        if CATALOG_TABLE_NAME:
+            product_catalogs[catalog_key] = DynamoCatalog(
+                dynamodb.meta.client, CATALOG_TABLE_NAME, cache_seconds=CATALOG_REFRESH_SECONDS
             )
-            clip_url = s3.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": bucket_name, "Key": clip_key},
-                ExpiresIn=600,
+        else:
+            product_catalogs[catalog_key] = ProductCatalog(
+                s3, bucket_name, refresh_seconds=CATALOG_REFRESH_SECONDS
             )
-            video_clip_urls.append(clip_url)
-
-        # -- 5. ASSEMBLE THE FINAL VIDEO --
-        print("Assembling final video with Shotstack...")
-        product_shot_urls=[]
-        for s3_uri in product_data['product_shot_url']:
-            bucket = s3_uri.split('/')[2]
-            key = '/'.join(s3_uri.split('/')[3:])
-            product_shot_urls.append(s3.generate_presigned_url('get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=600))
-
-        samsung_logo_key = (
-            "curated_clips/samsung_name.mp4"  # Assuming it's in this folder
-        )
-        samsung_logo_url = s3.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket_name, "Key": samsung_logo_key},
-            ExpiresIn=600,
-        )
+    product_data = await aws_call(product_catalogs[catalog_key].get, sku)
+    if not product_data:
+        raise Exception(f"Product SKU '{sku}' not found.")
+    return product_data
+
+
+def load_product(bucket_name, sku):
+    """
+    Synchronous wrapper around `load_product_async`.
+    """
+    return run_sync(load_product_async(bucket_name, sku))
+
+
+def blueprint_act(ad_blueprint, i):
+    """
+    Returns act `i` of a blueprint, or None if the blueprint has fewer acts.
+    """
+    acts = ad_blueprint.get("acts") or []
+    return acts[i] if i < len(acts) else None
+
+
+def act_prompt(act):
+    """
+    Returns the text-to-video prompt for one act of the blueprint.
+    """
+    if isinstance(act, dict):
+        return act.get('prompt', '')
+    return str(act)
+
+
+async def create_clip_async(act, secrets, bucket_name, hedge_report=None):
+    """
+    Generates (or finds in the cache) the clip for one act.
+
+    Returns:
+        str: The 's3://' reference of the clip.
+    """
+    cache_table = dynamodb.Table(CLIP_CACHE_TABLE_NAME)
+    return await generate_video_clip_async(
+        act_prompt(act), secrets["hf"], bucket_name, cache_table, hedge_report=hedge_report
+    )
+
+
+def create_clip(act, secrets, bucket_name, hedge_report=None):
+    """
+    Synchronous wrapper around `create_clip_async`.
+    """
+    return run_sync(create_clip_async(act, secrets, bucket_name, hedge_report))
+
+
+def curated_assets(product_data, bucket_name):
+    """
+    Returns the curated product shots, the Samsung logo outro and the music.
+    They are presigned only when the render is submitted.
+
+    Returns:
+        dict: 's3://' references under 'product_shots', 'logo' and 'music'.
+    """
+    product_shots = list(product_data['product_shot_url'])
+    # Products with a single curated shot reuse it for both slots
+    if len(product_shots) == 1:
+        product_shots.append(product_shots[0])
+
+    return {
+        "product_shots": product_shots,
+        "logo": f"s3://{bucket_name}/curated_clips/samsung_name.mp4",
+        "music": f"s3://{bucket_name}/music/background_music.mp3",
+    }
+
 
-        music_key = "music/background_music.mp3"
-        music_url = s3.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": bucket_name, "Key": music_key},
-            ExpiresIn=600,
+def build_timeline(clip_urls, assets):
+    """
+    Creates the video track for Shotstack: three generated acts interleaved
+    with two curated product shots, followed by the 2 second logo outro.
+    Acts without a clip (None, when the blueprint had fewer acts) are left
+    out and the rest of the track moves up.
+    """
+    segments = [
+        ({"type": "video", "src": clip_urls[0]}, 5),
+        ({"type": "video", "src": assets["product_shots"][0], "volume": 0}, 4),
+        ({"type": "video", "src": clip_urls[1]}, 5),
+        ({"type": "video", "src": assets["product_shots"][1], "volume": 0}, 5),
+        ({"type": "video", "src": clip_urls[2]}, 5),
+        ({"type": "video", "src": assets["logo"]}, 2),
+    ]
+    track, start = [], 0
+    for asset, length in segments:
+        if asset["src"] is None:
+            continue
+        track.append({"asset": asset, "start": start, "length": length})
+        start += length
+    return track
+
+
+# Asynchronous counterpart of every synchronous stage function
+ASYNC_VARIANTS = {
+    load_secrets: load_secrets_async,
+    load_product: load_product_async,
+    generate_ad_blueprint: generate_ad_blueprint_async,
+    get_ad_blueprint: get_ad_blueprint_async,
+    generate_voiceover: generate_voiceover_async,
+    create_clip: create_clip_async,
+    submit_render: submit_render_async,
+    wait_for_render: wait_for_render_async,
+    fingerprint_render: fingerprint_render_async,
+    submit_timeline: submit_timeline_async,
+    finish_render: finish_render_async,
+}
+
+
+def build_pipeline(request_body, mode, bucket_name, io_mode="threads", completed=None, on_checkpoint=None, callback_url=None, hedge_report=None):
+    """
+    Declares the stages of the ad generation pipeline and their inputs.
+
+    In 'audio' mode only the blueprint and the voiceover are produced. In
+    'full' mode the clips, the voiceover and the curated asset URLs are
+    produced in parallel, submitted to Shotstack and the render is awaited.
+    A timeline identical to an earlier job's is not rendered again when
+    RENDER_CACHE is on; its stored final video is used instead.
+    In 'full' mode each act of the blueprint is emitted as 'act_<i>' while
+    the blueprint is still streaming, so its clip starts before the
+    voiceover script is done; an act the blueprint does not have is None,
+    and its clip is skipped.
+    When a `callback_url` is given the render is only submitted; Shotstack
+    notifies the callback endpoint when it is done. Hedged clip requests
+    are counted in `hedge_report`.
+
+    With io_mode 'async' the stages are coroutines meant for
+    `Pipeline.run_async`; otherwise they are the synchronous wrappers.
+
+    The blueprint, the clip and voiceover references and the Shotstack render id
+    are checkpointed through `on_checkpoint`; stages found in `completed` are
+    not run again.
+
+    Returns:
+        Pipeline: The pipeline, ready to run.
+    """
+    sku = request_body.get('sku')
+    user_context = request_body.get('user_context')
+    language_preference = request_body.get('language', 'English')
+    fresh = bool(request_body.get('fresh', False))
+
+    def pick(func):
+        return ASYNC_VARIANTS[func] if io_mode == "async" else func
+
+    pipeline = Pipeline(
+        max_workers=PIPELINE_MAX_WORKERS, completed=completed, on_checkpoint=on_checkpoint
+    )
+    pipeline.add_stage("secrets", lambda: pick(load_secrets)(mode))
+    pipeline.add_stage("catalog", lambda: pick(load_product)(bucket_name, sku))
+    # Only clips need the acts, so only full mode streams them out
+    act_outputs = {
+        f"act_{i}": (lambda ad_blueprint, i=i: blueprint_act(ad_blueprint, i)) for i in range(NUM_ACTS)
+    } if mode == "full" else None
+    pipeline.add_stage(
+        "blueprint",
+        lambda secrets, product_data, emit=None: pick(get_ad_blueprint)(
+            sku,
+            product_data,
+            user_context,
+            secrets["openrouter"],
+            language_preference,
+            fresh=fresh,
+            on_act=(lambda i, act: emit(f"act_{i}", act) if i < NUM_ACTS else None) if emit else None,
+        ),
+        inputs=("secrets", "catalog"),
+        checkpoint=True,
+        outputs=act_outputs,
+    )
+    pipeline.add_stage(
+        "voiceover",
+        lambda secrets, ad_blueprint: pick(generate_voiceover)(
+            ad_blueprint['voiceover_script'],
+            ad_blueprint['voice_id'],
+            secrets["elevenlabs"],
+            bucket_name,
+            dynamodb.Table(CLIP_CACHE_TABLE_NAME) if CLIP_CACHE_TABLE_NAME else None,
+        ),
+        inputs=("secrets", "blueprint"),
+        checkpoint=True,
+    )
+    if mode != "full":
+        return pipeline
+
+    clip_stages = [f"clip_{i}" for i in range(NUM_ACTS)]
+    for i, name in enumerate(clip_stages):
+        pipeline.add_stage(
+            name,
+            # A blueprint with fewer acts leaves this clip out of the timeline
+            lambda secrets, act: None if act is None else pick(create_clip)(act, secrets, bucket_name, hedge_report),
+            inputs=("secrets", f"act_{i}"),
+            checkpoint=True,
         )
+    pipeline.add_stage(
+        "assets",
+        lambda product_data: curated_assets(product_data, bucket_name),
+        inputs=("catalog",),
+    )
+    pipeline.add_stage(
+        "render_fingerprint",
+        lambda voiceover_uri, assets, *clip_uris: pick(fingerprint_render)(list(clip_uris), voiceover_uri, assets),
+        inputs=("voiceover", "assets", *clip_stages),
+        checkpoint=True,
+    )
+    pipeline.add_stage(
+        "render_submit",
+        lambda secrets, fingerprint, voiceover_uri, assets, *clip_uris: pick(submit_timeline)(
+            fingerprint,
+            list(clip_uris),
+            voiceover_uri,
+            assets,
+            secrets["shotstack"],
+            callback_url,
+        ),
+        inputs=("secrets", "render_fingerprint", "voiceover", "assets", *clip_stages),
+        checkpoint=True,
+    )
+    if callback_url:
+        return pipeline
+
+    pipeline.add_stage(
+        "render",
+        lambda secrets, render_ref, fingerprint: pick(finish_render)(
+            render_ref, secrets["shotstack"], fingerprint, bucket_name
+        ),
+        inputs=("secrets", "render_submit", "render_fingerprint"),
+    )
+    return pipeline
 
-        # Create the timeline for Shotstack
-        timeline_clips = [
-            {
-                "asset": {"type": "video", "src": video_clip_urls[0]},
-                "start": 0,
-                "length": 5,
-            },
-            {
-                "asset": {"type": "video", "src": product_shot_urls[0], "volume": 0},
-                "start": 5,
-                "length": 4,
-            },
-            {
-                "asset": {"type": "video", "src": video_clip_urls[1]},
-                "start": 9,
-                "length": 5,
-            },
-            {
-                "asset": {"type": "video", "src": product_shot_urls[1], "volume": 0},
-                "start": 14,
-                "length": 5,
-            },
-            {
-                "asset": {"type": "video", "src": video_clip_urls[2]},
-                "start": 19,
-                "length": 5,
-            },
-            {
-                "asset": {"type": "video", "src": samsung_logo_url},
-                "start": 24,
-                "length": 2,
-            },
-        ]
 
-        final_video_url = generate_final_video(
-            timeline_clips, voiceover_url, music_url, shotstack_key
+def stage_timings_item(pipeline):
+    """
+    Converts the recorded stage timings into a DynamoDB-friendly map.
+    """
+    return {
+        name: {field: Decimal(str(round(value, 3))) for field, value in timing.items()}
+        for name, timing in pipeline.timings.items()
+    }
+
+
+def checkpoint_saver(table, job_id):
+    """
+    Returns the `on_checkpoint` callback that stores a finished stage's
+    output reference under `checkpoints.<stage>` on the job item.
+    """
+
+    def save_checkpoint(stage_name, result):
+        # DynamoDB rejects Python floats, so round-trip them as Decimals
+        value = json.loads(json.dumps(result), parse_float=Decimal)
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression="SET checkpoints.#stage = :value, updatedAt = :time",
+            ExpressionAttributeNames={'#stage': stage_name},
+            ExpressionAttributeValues={':value': value, ':time': int(time.time())},
         )
+        print(f"Checkpointed stage '{stage_name}' for job {job_id}.")
 
-        # 5. Update Job Status in DynamoDB with the final result
-        print(f"Pipeline complete. Updating job {job_id} to COMPLETE.")
+    return save_checkpoint
+
+
+def render_callback_url(event, job_id):
+    """
+    Returns the URL Shotstack should notify for this job, or None when the
+    worker should poll for the render itself.
+    """
+    base_url = RENDER_CALLBACK_URL or event.get('callbackUrl')
+    if RENDER_COMPLETION != "webhook" or not base_url:
+        return None
+    return f"{base_url}?{urlencode({'jobId': job_id})}"
+
+
+def mark_rendering(table, job_id, pipeline):
+    """
+    Marks the job as RENDERING once the render has been submitted. The update
+    is skipped if the render callback already finalised the job.
+    """
+    print(f"Render submitted. Updating job {job_id} to RENDERING.")
+    try:
         table.update_item(
-            Key={"jobId": job_id},
-            UpdateExpression="SET #s = :status, finalVideoUrl = :url, updatedAt = :time",
-            ExpressionAttributeNames={"#s": "status"},
+            Key={'jobId': job_id},
+            UpdateExpression="SET #s = :status, stageTimings = :timings, updatedAt = :time",
+            # A failure callback removes the render checkpoint, a success sets COMPLETE
+            ConditionExpression="attribute_exists(checkpoints.render_submit) AND #s <> :complete",
+            ExpressionAttributeNames={'#s': 'status'},
             ExpressionAttributeValues={
-                ":status": "COMPLETE",
-                ":url": final_video_url,
-                ":time": int(time.time()),
-            },
+                ':status': 'RENDERING',
+                ':complete': 'COMPLETE',
+                ':timings': stage_timings_item(pipeline),
+                ':time': int(time.time())
+            }
         )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        print(f"Job {job_id} was already finalised by the render callback.")
+
 
-    except Exception as e:
-        print(f"Worker failed for Job ID {job_id}. Error: {e}")
-        # Update job status to FAILED in DynamoDB
-        jobs_table_name = os.environ.get("JOBS_TABLE_NAME")
-        table = dynamodb.Table(jobs_table_name)
-        table.update_item(
-            Key={"jobId": event.get("jobId", "unknown")},
-            UpdateExpression="SET #s = :status, errorMessage = :error",
-            ExpressionAttributeNames={"#s": "status"},
-            ExpressionAttributeValues={":status": "FAILED", ":error": str(e)},
-        )"""
-    
 def lambda_handler(event, context):
     """
-    TEMPORARY WORKER for testing blueprint and dynamic audio.
-    It generates the blueprint and the voiceover, then stops.
+    The main handler for the long-running worker function.
+
+    This function is triggered asynchronously by the ForgeFunction. It fetches job
+    details from DynamoDB, runs the generative AI pipeline as a dependency graph
+    of stages, and updates DynamoDB with the result (or an error message) and the
+    start/end timestamps of every stage.
+
+    Every completed stage is checkpointed on the job item, so a re-invocation
+    with the same jobId resumes from the first incomplete stage (including
+    re-attaching to a Shotstack render that is already in progress).
+
+    With RENDER_COMPLETION 'webhook' the worker exits as soon as the render is
+    submitted and leaves the job as RENDERING; the RenderCallbackFunction
+    finalises it when Shotstack calls back.
+
+    The scheduled off-peak events run a cache pre-warming pass
+    ({"prewarm": {...}}, see `prewarm`) or evict the clip cache down to its
+    budget ({"evict": {...}}, see `cache_eviction`) instead.
     """
+    if "prewarm" in event:
+        # Imported here: it imports this module, and jobs never need it
+        import prewarm
+        return prewarm.lambda_handler(event["prewarm"], context)
+    if "evict" in event:
+        import cache_eviction
+        return cache_eviction.lambda_handler(event["evict"], context)
+
     job_id = ""
+    table = dynamodb.Table(JOBS_TABLE_NAME)
+    pipeline = None
     try:
         # 1. Get Job ID from the trigger event
         job_id = event['jobId']
-        print(f"WORKER (Audio Test Mode) started for Job ID: {job_id}")
+        print(f"WORKER ({WORKER_MODE} mode, {WORKER_IO_MODE} I/O) started for Job ID: {job_id}")
 
-        # 2. Setup: Get table name and API keys
-        jobs_table_name = os.environ.get('JOBS_TABLE_NAME')
-        table = dynamodb.Table(jobs_table_name)
-
-        openrouter_key = get_secret(os.environ.get('OPENROUTER_API_KEY_PARAM'))
-        elevenlabs_key = get_secret(os.environ.get('ELEVENLABS_API_KEY_PARAM'))
-        
-        # 3. Fetch Job Details from DynamoDB
+        # 2. Fetch Job Details (and checkpoints of earlier attempts) from DynamoDB
         response = table.get_item(Key={'jobId': job_id})
         item = response.get('Item')
         if not item:
             raise Exception(f"Job {job_id} not found in DynamoDB.")
+        if item.get('status') == 'COMPLETE':
+            print(f"Job {job_id} is already COMPLETE. Nothing to do.")
+            return
 
-        request_body = item.get('requestBody', {})
-        sku = request_body.get('sku')
-        user_context = request_body.get('user_context')
-        language_preference = request_body.get('language', 'English')
-        # Get product data from S3
-        bucket_name = os.environ.get('PRODUCT_DB_BUCKET')
-        db_object = s3.get_object(Bucket=bucket_name, Key='product_db.json')
-        product_database = json.loads(db_object['Body'].read().decode('utf-8'))
-        product_data = product_database.get(sku)
-
-        # 4. Generate the Blueprint (with the dynamic voice_id)
-        ad_blueprint = generate_ad_blueprint(product_data, user_context, openrouter_key, language_preference)
-        
-        # 5. Generate the Voiceover using the AI-selected voice
-        voiceover_url = generate_voiceover(
-            ad_blueprint['voiceover_script'],
-            ad_blueprint['voice_id'],
-            elevenlabs_key,
-            bucket_name
-        )
+        checkpoints = item.get('checkpoints')
+        if checkpoints:
+            print(f"Resuming job {job_id}; completed stages: {', '.join(sorted(checkpoints))}")
+        else:
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression="SET checkpoints = if_not_exists(checkpoints, :empty)",
+                ExpressionAttributeValues={':empty': {}},
+            )
 
-        # 6. Update Job Status in DynamoDB with the audio file URL and blueprint
-        print(f"Audio test complete. Updating job {job_id} to COMPLETE.")
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression="SET #s = :status, generatedAudioUrl = :url, blueprint = :bp, updatedAt = :time",
-            ExpressionAttributeNames={'#s': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'COMPLETE',
-                ':url': voiceover_url,
-                ':bp': ad_blueprint,
-                ':time': int(time.time())
-            }
+        # 3. Run every stage as soon as its inputs are ready
+        callback_url = render_callback_url(event, job_id)
+        hedge_report = HedgeReport()
+        save_checkpoint = checkpoint_saver(table, job_id)
+        if WORKER_IO_MODE == "async":
+            on_checkpoint = lambda name, result: aws_call(save_checkpoint, name, result)
+        else:
+            on_checkpoint = save_checkpoint
+        pipeline = build_pipeline(
+            item.get('requestBody', {}),
+            WORKER_MODE,
+            PRODUCT_DB_BUCKET,
+            WORKER_IO_MODE,
+            completed=checkpoints,
+            on_checkpoint=on_checkpoint,
+            callback_url=callback_url,
+            hedge_report=hedge_report,
         )
-        
+        if WORKER_IO_MODE == "async":
+            results = run_sync(pipeline.run_async())
+        else:
+            results = pipeline.run()
+        print(f"Critical path for job {job_id}: {' -> '.join(pipeline.critical_path())}")
+        if WORKER_MODE == "full":
+            print(f"Video route health: {json.dumps(video_router.snapshot())}")
+            print(f"Clip hedging for job {job_id}: {hedge_report.as_dict()}")
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression="SET clipHedging = :hedging",
+                ExpressionAttributeValues={
+                    ':hedging': json.loads(json.dumps(hedge_report.as_dict()), parse_float=Decimal)
+                }
+            )
+
+        # 4. Update Job Status in DynamoDB with the result
+        if WORKER_MODE == "full" and callback_url:
+            if not is_stored_render(results['render_submit']):
+                mark_rendering(table, job_id, pipeline)
+                return
+            results['render'] = asset_store.presign(results['render_submit'], FINAL_VIDEO_URL_SECONDS)
+
+        print(f"Pipeline complete. Updating job {job_id} to COMPLETE.")
+        if WORKER_MODE == "full":
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression="SET #s = :status, finalVideoUrl = :url, stageTimings = :timings, updatedAt = :time",
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={
+                    ':status': 'COMPLETE',
+                    ':url': results['render'],
+                    ':timings': stage_timings_item(pipeline),
+                    ':time': int(time.time())
+                }
+            )
+        else:
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression="SET #s = :status, generatedAudioUrl = :url, blueprint = :bp, stageTimings = :timings, updatedAt = :time",
+                ExpressionAttributeNames={'#s': 'status'},
+                ExpressionAttributeValues={
+                    ':status': 'COMPLETE',
+                    ':url': asset_store.presign(results['voiceover']),
+                    ':bp': results['blueprint'],
+                    ':timings': stage_timings_item(pipeline),
+                    ':time': int(time.time())
+                }
+            )
+
     except Exception as e:
-        print(f"Worker (Audio Test Mode) failed for Job ID {job_id}. Error: {e}")
+        print(f"Worker failed for Job ID {job_id}. Error: {e}")
         # Update job status to FAILED in DynamoDB
-        jobs_table_name = os.environ.get('JOBS_TABLE_NAME')
-        table = dynamodb.Table(jobs_table_name)
         table.update_item(
             Key={'jobId': event.get('jobId', 'unknown')},
-            UpdateExpression="SET #s = :status, errorMessage = :error",
+            UpdateExpression="SET #s = :status, errorMessage = :error, stageTimings = :timings",
             ExpressionAttributeNames={'#s': 'status'},
-            ExpressionAttributeValues={':status': 'FAILED', ':error': str(e)}
+            ExpressionAttributeValues={
+                ':status': 'FAILED',
+                ':error': str(e),
+                ':timings': stage_timings_item(pipeline) if pipeline else {}
+            }
         )
@@ -0,0 +1,295 @@
+import hashlib
+import re
+import tempfile
+import uuid
+
+from botocore.exceptions import ClientError
+
+from aio import aws_call
+
+# The smallest part of an S3 multipart upload (except its last part)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+def split_s3_uri(s3_uri):
+    """
+    Splits an 's3://bucket/key' URI into its bucket and key.
+    """
+    bucket = s3_uri.split('/')[2]
+    key = '/'.join(s3_uri.split('/')[3:])
+    return bucket, key
+
+
+class SpooledAsset:
+    """
+    Collects a streamed asset chunk by chunk without holding all of it in
+    memory: the content is hashed as it arrives and spills from memory to a
+    temporary file once it grows past `max_memory` bytes.
+    """
+
+    def __init__(self, max_memory=1024 * 1024):
+        self.file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def content_hash(self):
+        return self.hasher.hexdigest()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class StreamedUpload:
+    """
+    Uploads a streamed asset to S3 while it arrives, to be stored under its
+    content hash like `AssetStore.put`.
+
+    The content is hashed chunk by chunk and buffered until `part_size`
+    bytes have arrived; every full buffer is then sent as the next part of a
+    multipart upload to a staging key, so at most one part is held in memory
+    and the upload is nearly done when the stream ends. `complete` copies
+    the staging object to its content-addressed key within S3 and deletes
+    it. An asset shorter than one part never leaves the buffer until then
+    and is written with a single PUT.
+    """
+
+    def __init__(self, store, bucket, prefix, extension, content_type, part_size=MIN_PART_SIZE):
+        self.store = store
+        self.bucket = bucket
+        self.prefix = prefix
+        self.extension = extension
+        self.content_type = content_type
+        self.part_size = part_size
+        self.staging_key = f"{prefix}/staging/{uuid.uuid4().hex}.{extension}"
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    @property
+    def content_hash(self):
+        return self.hasher.hexdigest()
+
+    def write(self, chunk):
+        """
+        Adds a chunk, and uploads the buffer as the next part once it is full.
+        """
+        self.buffer += chunk
+        self.hasher.update(chunk)
+        self.size += len(chunk)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    async def write_async(self, chunk):
+        """
+        Asynchronous version of `write`; only a chunk that fills the buffer
+        leaves the event loop.
+        """
+        if len(self.buffer) + len(chunk) >= self.part_size:
+            await aws_call(self.write, chunk)
+        else:
+            self.write(chunk)
+
+    def _upload_part(self):
+        s3 = self.store.s3
+        if self.upload_id is None:
+            self.upload_id = s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.staging_key, ContentType=self.content_type
+            )["UploadId"]
+        number = len(self.parts) + 1
+        response = s3.upload_part(
+            Bucket=self.bucket, Key=self.staging_key, UploadId=self.upload_id, PartNumber=number,
+            Body=bytes(self.buffer),
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+        self.buffer = bytearray()
+
+    def complete(self):
+        """
+        Finishes the upload and stores the asset under its content hash,
+        unless it is already there.
+
+        Returns:
+            str: The 's3://bucket/key' reference of the asset.
+        """
+        s3 = self.store.s3
+        key = f"{self.prefix}/{self.content_hash}.{self.extension}"
+        if self.upload_id is None:
+            if self.store.exists(self.bucket, key):
+                print(f"Asset {key} already stored, skipping upload.")
+            else:
+                s3.put_object(Bucket=self.bucket, Key=key, Body=bytes(self.buffer), ContentType=self.content_type)
+            return f"s3://{self.bucket}/{key}"
+
+        if self.buffer:
+            self._upload_part()
+        s3.complete_multipart_upload(
+            Bucket=self.bucket, Key=self.staging_key, UploadId=self.upload_id, MultipartUpload={"Parts": self.parts}
+        )
+        self.upload_id = None
+        try:
+            if self.store.exists(self.bucket, key):
+                print(f"Asset {key} already stored, dropping the upload.")
+            else:
+                s3.copy_object(
+                    Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": self.staging_key}
+                )
+        finally:
+            s3.delete_object(Bucket=self.bucket, Key=self.staging_key)
+        return f"s3://{self.bucket}/{key}"
+
+    async def complete_async(self):
+        """
+        Asynchronous version of `complete`.
+        """
+        return await aws_call(self.complete)
+
+    def abort(self):
+        """
+        Discards the parts uploaded so far, if the upload was not completed.
+        """
+        if self.upload_id is not None:
+            self.store.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.staging_key, UploadId=self.upload_id)
+            self.upload_id = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.abort()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await aws_call(self.abort)
+
+
+class AssetStore:
+    """
+    Content-addressed store for the assets the worker produces (clips and
+    voiceovers).
+
+    Every asset is written once to '<prefix>/<sha256 of its bytes>.<ext>' and
+    is handed around as an 's3://bucket/key' reference afterwards. Stages
+    never pass the bytes themselves; the render stage presigns the
+    references directly, and identical content is never uploaded twice.
+    """
+
+    def __init__(self, s3_client, part_size=MIN_PART_SIZE):
+        self.s3 = s3_client
+        self.part_size = part_size
+
+    @staticmethod
+    def content_hash(data):
+        return hashlib.sha256(data).hexdigest()
+
+    def exists(self, bucket, key):
+        """
+        Returns True if the object is already in S3.
+        """
+        try:
+            self.s3.head_object(Bucket=bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def content_id(self, s3_uri):
+        """
+        Returns an id of the content of an asset that does not depend on where
+        it is stored: the hash in the key of a content-addressed asset, and
+        the ETag of any other object (e.g. a curated product shot).
+        """
+        bucket, key = split_s3_uri(s3_uri)
+        match = re.fullmatch(r"[0-9a-f]{64}", key.rsplit("/", 1)[-1].split(".", 1)[0])
+        if match:
+            return f"sha256:{match.group(0)}"
+        etag = self.s3.head_object(Bucket=bucket, Key=key)["ETag"].strip('"')
+        return f"etag:{etag}"
+
+    async def content_id_async(self, s3_uri):
+        """
+        Asynchronous version of `content_id`.
+        """
+        return await aws_call(self.content_id, s3_uri)
+
+    def put(self, data, bucket, prefix, extension, content_type):
+        """
+        Stores an asset under its content hash, unless it is already there.
+
+        Args:
+            data (bytes): The content of the asset.
+            bucket (str): The S3 bucket to store it in.
+            prefix (str): The key prefix, e.g. 'cached_clips' or 'audio'.
+            extension (str): The file extension, e.g. 'mp4'.
+            content_type (str): The MIME type of the asset.
+
+        Returns:
+            str: The 's3://bucket/key' reference of the asset.
+        """
+        key = f"{prefix}/{self.content_hash(data)}.{extension}"
+        if self.exists(bucket, key):
+            print(f"Asset {key} already stored, skipping upload.")
+        else:
+            self.s3.put_object(Bucket=bucket, Key=key, Body=data, ContentType=content_type)
+        return f"s3://{bucket}/{key}"
+
+    async def put_async(self, data, bucket, prefix, extension, content_type):
+        """
+        Asynchronous version of `put`.
+        """
+        return await aws_call(self.put, data, bucket, prefix, extension, content_type)
+
+    def put_spooled(self, asset, bucket, prefix, extension, content_type):
+        """
+        Stores a `SpooledAsset` under its content hash, unless it is already
+        there. The upload streams from the spool (boto3 switches to a
+        multipart upload for large files), so memory use stays constant.
+
+        Returns:
+            str: The 's3://bucket/key' reference of the asset.
+        """
+        key = f"{prefix}/{asset.content_hash}.{extension}"
+        if self.exists(bucket, key):
+            print(f"Asset {key} already stored, skipping upload.")
+        else:
+            asset.file.seek(0)
+            self.s3.upload_fileobj(asset.file, bucket, key, ExtraArgs={"ContentType": content_type})
+        return f"s3://{bucket}/{key}"
+
+    async def put_spooled_async(self, asset, bucket, prefix, extension, content_type):
+        """
+        Asynchronous version of `put_spooled`.
+        """
+        return await aws_call(self.put_spooled, asset, bucket, prefix, extension, content_type)
+
+    def open_upload(self, bucket, prefix, extension, content_type):
+        """
+        Starts uploading a streamed asset (see `StreamedUpload`). Use it as a
+        context manager, so an upload that is not completed is aborted.
+        """
+        return StreamedUpload(self, bucket, prefix, extension, content_type, self.part_size)
+
+    def presign(self, s3_uri, expires_in=600):
+        """
+        Generates a presigned GET URL for an asset reference (valid for 10 minutes by default).
+        """
+        bucket, key = split_s3_uri(s3_uri)
+        return self.s3.generate_presigned_url(
+            "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=expires_in
+        )
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import re
+import time
+import unicodedata
+
+
+def normalize_context(user_context):
+    """
+    Normalises a creative brief so trivially different submissions of the
+    same brief ('Diwali offer ', 'diwali  OFFER') share a cache entry.
+    Unicode is NFKC-normalised, case is folded and whitespace collapsed.
+    """
+    text = unicodedata.normalize("NFKC", str(user_context or ""))
+    return re.sub(r"\s+", " ", text.casefold()).strip()
+
+
+def blueprint_cache_key(sku, user_context, language, prompt_version):
+    """
+    Returns the cache key of a blueprint request.
+
+    Args:
+        sku (str): The product SKU.
+        user_context (str): The creative brief, normalised before hashing.
+        language (str): The language preference, as passed to the prompt.
+        prompt_version (str): The version of the blueprint prompt template.
+
+    Returns:
+        str: A hex SHA-256 digest.
+    """
+    key = {
+        "sku": sku,
+        "context": normalize_context(user_context),
+        "language": (language or "").strip(),
+        "promptVersion": prompt_version,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class BlueprintCache:
+    """
+    Memoises generated ad blueprints in DynamoDB.
+
+    Entries expire after `ttl_seconds`. The table's TTL attribute
+    ('expiresAt') removes them eventually; until it does, expired entries are
+    ignored on read.
+
+    Args:
+        table: A boto3 DynamoDB Table resource keyed on 'blueprintKey'.
+        ttl_seconds (float): How long a blueprint is reused.
+    """
+
+    def __init__(self, table, ttl_seconds=7 * 24 * 3600, clock=time.time):
+        self.table = table
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+    def get(self, key):
+        """
+        Returns the cached blueprint, or None if there is no live entry.
+        """
+        item = self.table.get_item(Key={"blueprintKey": key}).get("Item")
+        if not item or int(item.get("expiresAt", 0)) <= self.clock():
+            return None
+        return json.loads(item["blueprint"])
+
+    def put(self, key, blueprint, **attributes):
+        """
+        Stores a blueprint; `attributes` (e.g. the SKU and language) are
+        kept on the item for inspection.
+        """
+        now = int(self.clock())
+        self.table.put_item(Item={
+            "blueprintKey": key,
+            "blueprint": json.dumps(blueprint, ensure_ascii=False),
+            "createdAt": now,
+            "expiresAt": now + int(self.ttl_seconds),
+            **attributes,
+        })
@@ -0,0 +1,190 @@
+import os
+import re
+
+from botocore.exceptions import ClientError
+
+# Total bytes the cached clips, voiceovers and renders may use, e.g. '50GB'; "0" disables the scheduled eviction
+CLIP_CACHE_BUDGET = os.environ.get("CLIP_CACHE_BUDGET", "0")
+# 'lru' (least recently used first) or 'lfu' (least often hit first)
+CLIP_CACHE_EVICTION_POLICY = os.environ.get("CLIP_CACHE_EVICTION_POLICY", "lru")
+
+SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
+def parse_size(value):
+    """
+    Parses a byte count such as '500000000', '750MB' or '50GB'.
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B)?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size '{value}'.")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2) or ""])
+
+
+def split_s3_uri(s3_uri):
+    bucket, _, key = s3_uri[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def scan(table, **kwargs):
+    """
+    Yields every item of a table.
+    """
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def scan_entries(table):
+    """
+    Returns the clip and voiceover entries of the cache table (not its
+    lease and statistics items).
+    """
+    return [
+        item for item in scan(table)
+        if item.get("s3_uri") and not item["promptHash"].startswith(("lease#", "stats#"))
+    ]
+
+
+def fill_sizes(entries, s3, table=None):
+    """
+    Looks up the object size of entries stored before sizes were recorded,
+    and saves it on the item when a table is given.
+    """
+    for entry in entries:
+        if entry.get("sizeBytes") is not None:
+            continue
+        bucket, key = split_s3_uri(entry["s3_uri"])
+        try:
+            entry["sizeBytes"] = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchKey", "NotFound"):
+                raise
+            entry["sizeBytes"] = 0
+        if table is not None:
+            table.update_item(
+                Key={"promptHash": entry["promptHash"]},
+                UpdateExpression="SET sizeBytes = :size",
+                ExpressionAttributeValues={":size": entry["sizeBytes"]},
+            )
+
+
+def eviction_order(entries, policy):
+    """
+    Sorts entries in the order they are evicted: least recently used first
+    ('lru'), or least often hit first, then least recently used ('lfu').
+    """
+    def last_access(entry):
+        return int(entry.get("lastAccessedAt") or entry.get("createdAt") or 0)
+
+    if policy == "lfu":
+        return sorted(entries, key=lambda entry: (int(entry.get("hitCount") or 0), last_access(entry)))
+    return sorted(entries, key=last_access)
+
+
+def plan_eviction(entries, budget_bytes, policy="lru"):
+    """
+    Chooses the entries to evict so the cache fits in `budget_bytes`.
+
+    Objects are content-addressed and may be shared by several entries (e.g.
+    a migrated entry and its legacy original); an object's bytes only count
+    as freed once every entry referencing it is evicted.
+
+    Returns:
+        tuple: The entries to evict, the 's3://' URIs of the objects that are
+               no longer referenced afterwards, and the bytes freed.
+    """
+    sizes = {entry["s3_uri"]: int(entry.get("sizeBytes") or 0) for entry in entries}
+    references = {}
+    for entry in entries:
+        references[entry["s3_uri"]] = references.get(entry["s3_uri"], 0) + 1
+    total = sum(sizes.values())
+
+    evicted, objects, freed = [], [], 0
+    for entry in eviction_order(entries, policy):
+        if total - freed <= budget_bytes:
+            break
+        evicted.append(entry)
+        references[entry["s3_uri"]] -= 1
+        if not references[entry["s3_uri"]]:
+            objects.append(entry["s3_uri"])
+            freed += sizes[entry["s3_uri"]]
+    return evicted, objects, freed
+
+
+def delete_objects(s3, s3_uris):
+    """
+    Deletes objects in batches of 1000, the most one call accepts.
+    """
+    by_bucket = {}
+    for s3_uri in s3_uris:
+        bucket, key = split_s3_uri(s3_uri)
+        by_bucket.setdefault(bucket, []).append(key)
+    for bucket, keys in by_bucket.items():
+        for i in range(0, len(keys), 1000):
+            s3.delete_objects(
+                Bucket=bucket, Delete={"Objects": [{"Key": key} for key in keys[i:i + 1000]], "Quiet": True}
+            )
+
+
+def evict(table, s3, evicted, objects):
+    """
+    Removes the planned entries and their objects. An entry hit since the
+    plan was made (its last access changed) is kept, and so is its object.
+
+    Returns:
+        int: The number of objects deleted.
+    """
+    kept = set()
+    for entry in evicted:
+        condition = {"ConditionExpression": "attribute_not_exists(lastAccessedAt)"}
+        if entry.get("lastAccessedAt") is not None:
+            condition = {
+                "ConditionExpression": "lastAccessedAt = :seen",
+                "ExpressionAttributeValues": {":seen": entry["lastAccessedAt"]},
+            }
+        try:
+            table.delete_item(Key={"promptHash": entry["promptHash"]}, **condition)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            kept.add(entry["s3_uri"])
+    deletable = [s3_uri for s3_uri in objects if s3_uri not in kept]
+    delete_objects(s3, deletable)
+    return len(deletable)
+
+
+def lambda_handler(options, context):
+    """
+    Runs the scheduled eviction: removes the least recently (or least often)
+    used cache entries, item and object together, until the cache fits
+    `CLIP_CACHE_BUDGET`.
+
+    Args:
+        options (dict): Optional 'budget', 'policy' and 'dryRun' overrides.
+
+    Returns:
+        dict: The number of entries evicted, objects deleted and bytes freed.
+    """
+    # Imported here so the admin tool can use this module without the worker's settings
+    import app
+
+    options = options or {}
+    budget = parse_size(options.get("budget", CLIP_CACHE_BUDGET))
+    if not budget:
+        print("Clip cache eviction is disabled: no budget.")
+        return {}
+    policy = options.get("policy", CLIP_CACHE_EVICTION_POLICY)
+    dry_run = bool(options.get("dryRun", False))
+    table = app.dynamodb.Table(app.CLIP_CACHE_TABLE_NAME)
+
+    entries = scan_entries(table)
+    fill_sizes(entries, app.s3, None if dry_run else table)
+    evicted, objects, freed = plan_eviction(entries, budget, policy)
+    deleted = 0 if dry_run else evict(table, app.s3, evicted, objects)
+    report = {"entries": len(evicted), "objects": deleted, "freedBytes": freed}
+    print(f"Clip cache eviction ({policy}, budget {budget} bytes{', dry run' if dry_run else ''}): {report}")
+    return report
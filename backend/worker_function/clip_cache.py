@@ -0,0 +1,312 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import re
+import time
+import unicodedata
+
+from botocore.exceptions import ClientError
+
+from aio import aws_call
+from cache_entries import CacheEntries
+
+# Prefix of every current cache key. Bump it when the key schema changes;
+# entries under older keys are then only found through the legacy read.
+CLIP_KEY_VERSION = "v2"
+
+
+def normalize_prompt(prompt):
+    """
+    Canonicalises a clip prompt for the cache key: Unicode is
+    NFKC-normalised, case is folded, whitespace collapsed and a trailing
+    full stop dropped.
+    """
+    text = unicodedata.normalize("NFKC", str(prompt))
+    text = re.sub(r"\s+", " ", text.casefold()).strip()
+    return text[:-1].rstrip() if text.endswith(".") else text
+
+
+def clip_variant(provider, model, parameters=None):
+    """
+    Fingerprints how a clip is generated: the provider, the model and the
+    generation parameters (seed, duration, resolution, ...).
+
+    Returns:
+        str: A short hex digest.
+    """
+    variant = {"provider": provider, "model": model, "parameters": parameters or {}}
+    return hashlib.sha256(json.dumps(variant, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def clip_cache_key(prompt, variant):
+    """
+    Returns the versioned cache key of a prompt generated as `variant`.
+    """
+    digest = hashlib.sha256(f"{variant}\n{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+    return f"{CLIP_KEY_VERSION}#{digest}"
+
+
+def legacy_clip_cache_key(prompt):
+    """
+    Returns the key entries were stored under before keys were versioned:
+    the SHA-256 of the raw prompt.
+    """
+    return hashlib.sha256(prompt.encode()).hexdigest()
+
+
+class ClipCache(CacheEntries):
+    """
+    The ClipCacheTable, keyed on the prompt and how the clip was generated.
+
+    A clip is only reused for a route (provider and model) and generation
+    parameters it was generated with, so models can be switched or run side
+    by side without serving each other's clips. Entries written before keys
+    were versioned were all generated by one route; while `legacy_route` is
+    configured and no generation parameters are set, they are still read
+    and copied forward under their versioned key on first use.
+
+    Concurrent misses on the same prompt are coordinated through a lease
+    item in the same table (see `claim_or_wait`), so only one job pays for
+    the generation.
+
+    Entries are kept and counted like every other entry in the table (see
+    `cache_entries.CacheEntries`); lookups are not counted for the
+    pre-warming job (see `prewarm`).
+
+    Args:
+        table: A boto3 DynamoDB Table resource keyed on 'promptHash'.
+        parameters (dict): The generation parameters passed to every provider.
+        legacy_route (str): The 'provider:model' that generated unversioned
+                            entries, or None to ignore them.
+        ttl_seconds (float): How long an unused entry is kept, 0 for ever.
+        count_lookups (bool): Whether `record` counts lookup outcomes.
+    """
+
+    def __init__(self, table, parameters=None, legacy_route=None, ttl_seconds=0, clock=time.time,
+                 count_lookups=True):
+        super().__init__(table, ttl_seconds=ttl_seconds, clock=clock, count_lookups=count_lookups)
+        self.parameters = parameters or {}
+        self.legacy_route = legacy_route
+
+    def variant(self, route):
+        return clip_variant(route.provider, route.model, self.parameters)
+
+    def _reads_legacy(self, routes):
+        return bool(self.legacy_route) and not self.parameters and any(
+            route.name == self.legacy_route for route in routes
+        )
+
+    def accepted_variants(self, routes):
+        """
+        Returns the variants a clip may have to be served for these routes;
+        None stands for unversioned (legacy) entries.
+        """
+        variants = {self.variant(route) for route in routes}
+        if self._reads_legacy(routes):
+            variants.add(None)
+        return variants
+
+    def get(self, prompt, routes):
+        """
+        Returns the cached entry of a prompt generated by any of the routes,
+        preferring them in order, or None.
+        """
+        for route in routes:
+            item = self.touch(clip_cache_key(prompt, self.variant(route)))
+            if item:
+                return item
+        if not self._reads_legacy(routes):
+            return None
+
+        legacy_key = legacy_clip_cache_key(prompt)
+        item = self.table.get_item(Key={"promptHash": legacy_key}).get("Item")
+        if not item:
+            return None
+        provider, _, model = self.legacy_route.partition(":")
+        now = int(self.clock())
+        migrated = {
+            **self.entry(prompt, provider, model, item["s3_uri"]),
+            **self._expiry(now),
+            "createdAt": item.get("createdAt", now),
+            "lastAccessedAt": now,
+            "hitCount": 1,
+            "migratedFrom": legacy_key,
+        }
+        self.table.put_item(Item=migrated)
+        print(f"Migrated legacy clip cache entry {legacy_key} to {migrated['promptHash']}.")
+        return migrated
+
+    def peek(self, prompt, routes):
+        """
+        Tells whether a lookup of the prompt would hit, without recording a
+        hit or migrating a legacy entry.
+        """
+        keys = [clip_cache_key(prompt, self.variant(route)) for route in routes]
+        if self._reads_legacy(routes):
+            keys.append(legacy_clip_cache_key(prompt))
+        return any(self.is_live(self.table.get_item(Key={"promptHash": key}).get("Item")) for key in keys)
+
+    def entry(self, prompt, provider, model, s3_uri):
+        """
+        Returns the cache entry of a clip, keyed on how it was generated.
+        """
+        variant = clip_variant(provider, model, self.parameters)
+        return {
+            "promptHash": clip_cache_key(prompt, variant),
+            "promptText": prompt,
+            "s3_uri": s3_uri,
+            "provider": provider,
+            "model": model,
+            "parameters": json.dumps(self.parameters, sort_keys=True),
+            "variant": variant,
+            "keyVersion": CLIP_KEY_VERSION,
+        }
+
+    def lease_key(self, prompt, routes):
+        """
+        Returns the key of the lease item of a prompt. It lives in the same
+        table, derived from the preferred route's cache key, so every job
+        with the same routes and parameters contends for the same lease.
+        """
+        digest = clip_cache_key(prompt, self.variant(routes[0])).split("#", 1)[1]
+        return f"lease#{digest}"
+
+    def acquire_lease(self, prompt, routes, owner, lease_seconds):
+        """
+        Claims the generation of a prompt with a conditional write. The claim
+        succeeds if nobody holds the lease or the holder's lease expired.
+
+        Returns:
+            bool: Whether `owner` now holds the lease.
+        """
+        now = int(self.clock())
+        try:
+            self.table.put_item(
+                Item={
+                    "promptHash": self.lease_key(prompt, routes),
+                    "leaseOwner": owner,
+                    "leaseExpiresAt": now + int(lease_seconds),
+                    # Leases left behind by a crashed job are removed by the table's TTL
+                    "expiresAt": now + int(lease_seconds) + 24 * 3600,
+                },
+                ConditionExpression="attribute_not_exists(promptHash) OR leaseExpiresAt < :now",
+                ExpressionAttributeValues={":now": now},
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def renew_lease(self, prompt, routes, owner, lease_seconds):
+        """
+        Extends the lease by `lease_seconds` from now, if `owner` still holds it.
+
+        Returns:
+            bool: Whether the lease was renewed.
+        """
+        now = int(self.clock())
+        try:
+            self.table.update_item(
+                Key={"promptHash": self.lease_key(prompt, routes)},
+                UpdateExpression="SET leaseExpiresAt = :until, expiresAt = :expires",
+                ConditionExpression="leaseOwner = :owner",
+                ExpressionAttributeValues={
+                    ":owner": owner,
+                    ":until": now + int(lease_seconds),
+                    ":expires": now + int(lease_seconds) + 24 * 3600,
+                },
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return False
+        return True
+
+    def release_lease(self, prompt, routes, owner):
+        """
+        Deletes the lease if `owner` still holds it, so waiting jobs read the
+        clip (or, after a failure, take over) without waiting for it to expire.
+        """
+        try:
+            self.table.delete_item(
+                Key={"promptHash": self.lease_key(prompt, routes)},
+                ConditionExpression="leaseOwner = :owner",
+                ExpressionAttributeValues={":owner": owner},
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    def put(self, prompt, route, s3_uri, size_bytes=None):
+        """
+        Stores a newly generated clip.
+
+        Returns:
+            dict: The stored entry.
+        """
+        entry = self.entry(prompt, route.provider, route.model, s3_uri)
+        self.store(entry, size_bytes)
+        return entry
+
+
+async def claim_or_wait(cache, prompt, routes, owner, lease_seconds, poll_seconds=2.0):
+    """
+    Single-flight coordination of a cache miss: either claims the lease to
+    generate the clip, or waits for the job holding it and returns its clip.
+    If the holder fails (releases the lease without a clip) or its lease
+    expires, the lease is taken over.
+
+    Returns:
+        dict: The cache entry another job generated, or None once `owner`
+              holds the lease and should generate the clip itself (see
+              `holding_lease`).
+    """
+    waited = 0.0
+    while not await aws_call(cache.acquire_lease, prompt, routes, owner, lease_seconds):
+        if not waited:
+            print(f"Clip for prompt: {prompt[:30]}... is being generated by another job, waiting.")
+        await asyncio.sleep(poll_seconds)
+        waited += poll_seconds
+        item = await aws_call(cache.get, prompt, routes)
+        if item:
+            print(f"Received the clip for prompt: {prompt[:30]}... after waiting {waited:.0f}s.")
+            return item
+    # A holder may have stored the clip and released the lease between our
+    # cache miss and the claim
+    item = await aws_call(cache.get, prompt, routes)
+    if item:
+        await aws_call(cache.release_lease, prompt, routes, owner)
+        return item
+    return None
+
+
+@contextlib.asynccontextmanager
+async def holding_lease(cache, prompt, routes, owner, lease_seconds, renew_seconds=None):
+    """
+    Keeps a claimed lease alive while the clip is generated, renewing it
+    every third of `lease_seconds` (or every `renew_seconds`), so a
+    generation that takes longer than the lease is not duplicated by a
+    waiter taking it over. Only a holder that stops renewing (e.g. its
+    container died) loses the lease. The lease is released on exit.
+    """
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(renew_seconds or lease_seconds / 3)
+            try:
+                if not await aws_call(cache.renew_lease, prompt, routes, owner, lease_seconds):
+                    print(f"Lost the lease on prompt: {prompt[:30]}... to another job.")
+                    return
+            except Exception as e:
+                print(f"Could not renew the lease on prompt: {prompt[:30]}...: {e}")
+
+    renewing = asyncio.create_task(heartbeat())
+    try:
+        yield
+    finally:
+        renewing.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await renewing
+        await aws_call(cache.release_lease, prompt, routes, owner)
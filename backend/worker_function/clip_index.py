@@ -0,0 +1,246 @@
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+DEFAULT_DIMENSIONS = 1024
+
+# S3 user metadata on both index files naming the build they belong to
+VERSION_METADATA = "index-version"
+
+# Words that carry no visual content. The framing words are the ones the
+# blueprint prompt asks the LLM to use ('a view of', 'a scene showing').
+STOP_WORDS = frozenset("""
+    a an the of and or in on at to for with from by into onto over under its their his her
+    is are be being while as this that these those
+    view scene showing shows shown depicting featuring moment shot close closeup
+""".split())
+
+
+def tokenize(prompt):
+    """
+    Lower-cases a clip prompt and returns its content words, with plural
+    's' stripped so 'TVs' and 'TV' match.
+    """
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", str(prompt).lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 2 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def embed(prompt, dimensions=DEFAULT_DIMENSIONS):
+    """
+    Embeds a prompt with a signed hashing vectoriser over its content words
+    and word bigrams (weighted half).
+
+    Returns:
+        numpy.ndarray: A float32 unit vector (all zeros for an empty prompt).
+    """
+    tokens = tokenize(prompt)
+    features = [(token, 1.0) for token in tokens]
+    features += [(f"{a} {b}", 0.5) for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dimensions] += weight if h & 0x80000000 else -weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class ClipIndex:
+    """
+    Similarity index over the prompts of cached clips.
+
+    The vectors are one float32 matrix (one unit vector per row), saved as a
+    `.npy` file and memory-mapped when loaded, with the cache entries in a
+    `.json` sidecar. Clips added after loading are kept in memory.
+
+    Args:
+        vectors (numpy.ndarray): An (n, dimensions) matrix of unit vectors.
+        entries (list): The cache entry of each row ('promptHash', 's3_uri',
+                        'promptText' and, for versioned entries, 'variant').
+    """
+
+    def __init__(self, vectors=None, entries=None, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions if vectors is None else vectors.shape[1]
+        self.vectors = vectors if vectors is not None else np.zeros((0, self.dimensions), dtype=np.float32)
+        self.entries = list(entries or [])
+        self.added_vectors = []
+        self.added_entries = []
+
+    def __len__(self):
+        return len(self.entries) + len(self.added_entries)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved with `save`, memory-mapping its matrix.
+        """
+        vectors = np.load(f"{path}.npy", mmap_mode="r")
+        with open(f"{path}.json", encoding="utf-8") as f:
+            entries = json.load(f)
+        return cls(vectors, entries)
+
+    def save(self, path):
+        """
+        Writes the index (including added clips) to '<path>.npy' and '<path>.json'.
+        """
+        vectors = self.vectors
+        if self.added_vectors:
+            vectors = np.vstack([vectors, *self.added_vectors])
+        np.save(f"{path}.npy", np.ascontiguousarray(vectors, dtype=np.float32))
+        with open(f"{path}.json", "w", encoding="utf-8") as f:
+            json.dump(self.entries + self.added_entries, f, ensure_ascii=False)
+
+    def add(self, entry):
+        """
+        Adds a cache entry, embedding its 'promptText'.
+        """
+        self.added_vectors.append(embed(entry["promptText"], self.dimensions))
+        self.added_entries.append(entry)
+
+    def search(self, prompt, threshold, variants=None):
+        """
+        Finds the cached clip whose prompt is most similar to `prompt`.
+
+        Args:
+            prompt (str): The clip prompt.
+            threshold (float): The cosine similarity a match needs.
+            variants (set): Only consider entries whose 'variant' (see
+                            `clip_cache.clip_variant`) is in the set; None
+                            in the set stands for entries without one.
+
+        Returns:
+            tuple: The matching entry (None when the best score is below the
+                   threshold) and the best score (0.0 if nothing qualifies).
+        """
+        query = embed(prompt, self.dimensions)
+        scores = np.asarray(self.vectors @ query)
+        if self.added_vectors:
+            scores = np.concatenate([scores, np.stack(self.added_vectors) @ query])
+        entries = self.entries + self.added_entries
+        if variants is not None and len(scores):
+            allowed = np.fromiter((entry.get("variant") in variants for entry in entries), dtype=bool, count=len(entries))
+            scores = np.where(allowed, scores, -np.inf)
+        if not len(scores) or not np.isfinite(scores.max()):
+            return None, 0.0
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        return (entries[best] if score >= threshold else None), score
+
+
+class ClipIndexStore:
+    """
+    The clip index in S3 ('<key>.npy' and '<key>.json', built by
+    `tools/build_clip_index.py`), downloaded to local storage once per
+    container and memory-mapped from there.
+
+    The matrix is revalidated at most every `refresh_seconds` with an
+    ETag-conditional GET. Clips added in the container are carried over when
+    a newer index is loaded, unless it already has them. The two files are
+    downloaded separately, so a rebuild can be uploaded in between; files
+    from different builds (different version metadata, or a row count that
+    does not match the entries) are not loaded, and the current index is
+    kept until the next refresh.
+
+    Args:
+        s3_client: A boto3 S3 client.
+        bucket (str): The bucket holding the index.
+        key (str): The S3 key of the index, without extension.
+        local_dir (str): Where the index files are downloaded.
+        refresh_seconds (float): How long a loaded index is trusted without
+                                 revalidating it.
+    """
+
+    def __init__(self, s3_client, bucket, key="clip_index/prompts", local_dir="/tmp",
+                 refresh_seconds=300.0, clock=time.monotonic):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.local_path = os.path.join(local_dir, key.replace("/", "_"))
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self.index = None
+        self.etag = None
+        self.checked_at = None
+        self.lock = threading.Lock()
+
+    def _download(self, extension, **request):
+        response = self.s3.get_object(Bucket=self.bucket, Key=f"{self.key}.{extension}", **request)
+        # Written next to the old file and renamed over it, so a matrix that
+        # is still memory-mapped keeps its own (unlinked) file
+        path = f"{self.local_path}.{extension}"
+        with open(f"{path}.part", "wb") as f:
+            for chunk in iter(lambda: response["Body"].read(1024 * 1024), b""):
+                f.write(chunk)
+        os.replace(f"{path}.part", path)
+        return response.get("ETag"), response.get("Metadata", {}).get(VERSION_METADATA)
+
+    def _refresh(self):
+        request = {"IfNoneMatch": self.etag} if self.etag else {}
+        try:
+            etag, version = self._download("npy", **request)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("304", "NotModified"):
+                self.checked_at = self.clock()
+                return
+            if code not in ("NoSuchKey", "404") or self.index is not None:
+                raise
+            # No index has been built yet: start empty and fill it in memory
+            self.index = ClipIndex()
+            self.checked_at = self.clock()
+            return
+
+        _, entries_version = self._download("json")
+        index = ClipIndex.load(self.local_path)
+        if version != entries_version or index.vectors.shape[0] != len(index.entries):
+            print(f"Clip index files are from different builds ({version} and {entries_version}); "
+                  f"keeping the current index until the next refresh.")
+            if self.index is None:
+                self.index = ClipIndex()
+            self.checked_at = self.clock()
+            return
+        if self.index is not None:
+            known = {entry["promptHash"] for entry in index.entries}
+            for entry in self.index.added_entries:
+                if entry["promptHash"] not in known:
+                    index.add(entry)
+        self.index = index
+        self.etag = etag
+        self.checked_at = self.clock()
+        print(f"Loaded clip index with {len(index)} prompts (ETag {etag}).")
+
+    def get(self):
+        """
+        Returns the current index, refreshing it first if it is due.
+        """
+        with self.lock:
+            if self.index is None or self.clock() - self.checked_at >= self.refresh_seconds:
+                self._refresh()
+            return self.index
+
+    def search(self, prompt, threshold, variants=None):
+        """
+        Thread-safe `ClipIndex.search` on the current index.
+        """
+        index = self.get()
+        with self.lock:
+            return index.search(prompt, threshold, variants)
+
+    def add(self, entry):
+        """
+        Adds a newly cached clip to the in-memory index.
+        """
+        index = self.get()
+        with self.lock:
+            index.add(entry)
@@ -0,0 +1,94 @@
+import json
+
+
+class JsonArrayStreamParser:
+    """
+    Incrementally parses a JSON object that arrives in chunks (e.g. a
+    streamed LLM completion) and returns the elements of one of its top-level
+    arrays as soon as each element is complete.
+
+    Example:
+        parser = JsonArrayStreamParser("acts")
+        parser.feed('{"acts": ["a view of')   # -> []
+        parser.feed(' a beach", "a scene')    # -> ["a view of a beach"]
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.buffer = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None
+        self.current_key = None
+        self.in_array = False
+        self.element_start = None
+        self.done = False
+
+    def _element(self, start, end):
+        return json.loads(self.buffer[start:end])
+
+    def feed(self, text):
+        """
+        Adds a chunk of the streamed document.
+
+        Args:
+            text (str): The next chunk of the JSON text.
+
+        Returns:
+            list: The array elements that were completed by this chunk.
+        """
+        self.buffer += text
+        elements = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = json.loads(self.buffer[self.string_start:self.pos + 1])
+                    elif self.in_array and self.depth == 2:
+                        elements.append(self._element(self.string_start, self.pos + 1))
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch in "{[":
+                self.depth += 1
+                if self.depth == 2 and ch == "[" and self.current_key == self.key and not self.done:
+                    self.in_array = True
+                elif self.in_array and self.depth == 3:
+                    self.element_start = self.pos
+            elif ch in "}]":
+                if self.in_array and self.depth == 3:
+                    elements.append(self._element(self.element_start, self.pos + 1))
+                    self.element_start = None
+                elif self.in_array and self.depth == 2:
+                    elements.extend(self._flush_scalar())
+                    self.in_array = False
+                    self.done = True
+                self.depth -= 1
+            elif ch == ":" and self.depth == 1:
+                self.current_key = self.last_string
+            elif self.in_array and self.depth == 2:
+                if ch == ",":
+                    elements.extend(self._flush_scalar())
+                elif not ch.isspace() and self.element_start is None:
+                    # Start of a number, true, false or null element
+                    self.element_start = self.pos
+
+            self.pos += 1
+        return elements
+
+    def _flush_scalar(self):
+        if self.element_start is None:
+            return []
+        element = self._element(self.element_start, self.pos)
+        self.element_start = None
+        return [element]
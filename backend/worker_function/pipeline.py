@@ -0,0 +1,399 @@
+import asyncio
+import inspect
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelineError(Exception):
+    """
+    Raised when a stage of the pipeline fails. Keeps track of which stage
+    failed so the worker can report it back in the job's error message.
+    """
+
+    def __init__(self, stage_name, error):
+        super().__init__(f"Stage '{stage_name}' failed: {error}")
+        self.stage_name = stage_name
+        self.error = error
+
+
+class Stage:
+    """
+    A single unit of work in the pipeline.
+
+    Args:
+        name (str): Unique name of the stage (e.g. 'blueprint', 'clip_0').
+        func (callable): The function to run. It receives the results of its
+                         input stages as positional arguments, in the order
+                         they are declared in `inputs`.
+        inputs (tuple): Names of the stages (or stage outputs) this stage
+                        depends on.
+        checkpoint (bool): Whether the result of the stage is persisted so a
+                           retried job can skip it.
+        outputs (dict): Optional partial results the stage can publish before
+                        it finishes, mapped to a function that extracts each
+                        one from the stage's final result.
+    """
+
+    def __init__(self, name, func, inputs=(), checkpoint=False, outputs=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.checkpoint = checkpoint
+        self.outputs = dict(outputs or {})
+
+
+class Pipeline:
+    """
+    A small dependency-graph (DAG) executor for the worker.
+
+    Every stage declares the stages it needs; a stage is started as soon as
+    all of its inputs are available, so independent stages (e.g. the video
+    clips and the voiceover) overlap. At most `max_workers` stages run at the
+    same time. The start and end timestamps of every stage are recorded so
+    the critical path of a job can be inspected afterwards.
+
+    A stage that declares `outputs` is called with an extra `emit(name, value)`
+    keyword argument. Emitting an output makes it available to the stages
+    that depend on it straight away, while the producing stage keeps running
+    (e.g. each act of a streamed blueprint). Outputs that were not emitted
+    are extracted from the stage's result when it finishes.
+
+    Results of checkpointed stages are handed to `on_checkpoint(name, result)`
+    as soon as they finish. Results passed in `completed` (e.g. loaded from a
+    previous attempt of the same job) are reused instead of running the
+    stage again, and stages that no remaining stage needs are skipped.
+
+    A stage that used an early output of a checkpointed stage is only
+    checkpointed once that stage's own checkpoint is saved: if the producer
+    fails, a retry produces new outputs, and the dependent stage must run
+    again with them. For the same reason its result in `completed` is not
+    reused unless the producer's is too.
+    """
+
+    def __init__(self, max_workers=4, completed=None, on_checkpoint=None):
+        self.max_workers = max(1, int(max_workers))
+        self.stages = {}
+        self.producers = {}
+        self.results = {}
+        self.timings = {}
+        self.completed = dict(completed or {})
+        self.on_checkpoint = on_checkpoint
+        self._saved = set()
+        self._deferred = {}
+        self._checkpoint_lock = threading.Lock()
+
+    def add_stage(self, name, func, inputs=(), checkpoint=False, outputs=None):
+        """
+        Registers a new stage in the graph.
+
+        Args:
+            name (str): Unique name of the stage.
+            func (callable): The function to run for this stage.
+            inputs (tuple): Names of the stages (or outputs) whose results `func` needs.
+            checkpoint (bool): Whether to persist the result of the stage.
+            outputs (dict): Partial results the stage may emit early, mapped to
+                            their extractor from the final result.
+
+        Returns:
+            Stage: The registered stage.
+        """
+        stage = Stage(name, func, inputs, checkpoint, outputs)
+        for output in (name, *stage.outputs):
+            if output in self.stages or output in self.producers:
+                raise ValueError(f"Stage or output '{output}' is already defined.")
+        self.stages[name] = stage
+        for output in stage.outputs:
+            self.producers[output] = name
+        return stage
+
+    def _producer(self, name):
+        return self.producers.get(name, name)
+
+    def validate(self):
+        """
+        Checks that every input refers to a known stage or output and that
+        the graph has no cycles.
+        """
+        for stage in self.stages.values():
+            for dependency in stage.inputs:
+                if self._producer(dependency) not in self.stages:
+                    raise ValueError(
+                        f"Stage '{stage.name}' depends on unknown stage '{dependency}'."
+                    )
+
+        visited = set()
+        visiting = set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Cycle detected at stage '{name}'.")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(self._producer(dependency))
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def _store_result(self, stage, result):
+        self.results[stage.name] = result
+        for output, extract in stage.outputs.items():
+            if output not in self.results:
+                self.results[output] = extract(result)
+
+    def _unsaved_producers(self, stage):
+        """
+        Returns the checkpointed stages whose early outputs `stage` uses and
+        whose own checkpoint is not saved (yet).
+        """
+        producers = {self.producers[dependency] for dependency in stage.inputs if dependency in self.producers}
+        return sorted(name for name in producers if self.stages[name].checkpoint and name not in self._saved)
+
+    def _defer_checkpoint(self, name, result):
+        """
+        Holds back the checkpoint of a stage until the producers of its early
+        outputs are checkpointed. Returns whether it was held back.
+        """
+        with self._checkpoint_lock:
+            waiting_on = self._unsaved_producers(self.stages[name])
+            if waiting_on:
+                self._deferred.setdefault(waiting_on[0], []).append((name, result))
+            return bool(waiting_on)
+
+    def _checkpoint_saved(self, name):
+        """
+        Records that a stage's checkpoint is saved and returns the held back
+        checkpoints that were waiting for it.
+        """
+        with self._checkpoint_lock:
+            self._saved.add(name)
+            return self._deferred.pop(name, [])
+
+    def _checkpoint(self, name, result):
+        if self._defer_checkpoint(name, result):
+            return
+        self.on_checkpoint(name, result)
+        for waiting in self._checkpoint_saved(name):
+            self._checkpoint(*waiting)
+
+    async def _checkpoint_async(self, name, result):
+        if self._defer_checkpoint(name, result):
+            return
+        saved = self.on_checkpoint(name, result)
+        if inspect.isawaitable(saved):
+            await saved
+        for waiting in self._checkpoint_saved(name):
+            await self._checkpoint_async(*waiting)
+
+    def _pending_stages(self):
+        """
+        Seeds the results with checkpointed stages that already completed and
+        returns the names of the stages that still have to run: every
+        unfinished stage without dependents, plus whatever they need.
+        """
+        self._saved = {name for name, stage in self.stages.items() if stage.checkpoint and name in self.completed}
+        for name in sorted(self._saved):
+            waiting_on = self._unsaved_producers(self.stages[name])
+            if waiting_on:
+                print(f"Ignoring the checkpoint of stage '{name}': '{waiting_on[0]}' was not checkpointed.")
+                self._saved.discard(name)
+        for name, stage in self.stages.items():
+            if name in self._saved:
+                self._store_result(stage, self.completed[name])
+
+        dependents = {
+            self._producer(dependency)
+            for stage in self.stages.values()
+            for dependency in stage.inputs
+        }
+        required = set()
+
+        def require(name):
+            if name in self.results:
+                return
+            stage_name = self._producer(name)
+            if stage_name in required:
+                return
+            required.add(stage_name)
+            for dependency in self.stages[stage_name].inputs:
+                require(dependency)
+
+        for name in self.stages:
+            if name not in dependents:
+                require(name)
+        return [name for name in self.stages if name in required]
+
+    def _ready_stages(self, pending):
+        return [
+            name
+            for name in pending
+            if all(dependency in self.results for dependency in self.stages[name].inputs)
+        ]
+
+    def _call(self, stage, args, publish):
+        if not stage.outputs:
+            return stage.func(*args)
+
+        def emit(output, value):
+            if output not in stage.outputs:
+                raise ValueError(f"Stage '{stage.name}' has no output '{output}'.")
+            publish(("emit", output, value, None))
+
+        return stage.func(*args, emit=emit)
+
+    def _handle_event(self, event, running, failure):
+        """
+        Applies an 'emit' or 'done' event to the results and returns the
+        (possibly new) pipeline failure.
+        """
+        kind, name, value, error = event
+        if kind == "emit":
+            if failure is None and name not in self.results:
+                self.results[name] = value
+            return failure
+
+        running.discard(name)
+        if error is not None:
+            print(f"Pipeline stage '{name}' failed: {error}")
+            return failure or PipelineError(name, error)
+        self._store_result(self.stages[name], value)
+        return failure
+
+    def _execute(self, stage, args, events):
+        start = time.time()
+        self.timings[stage.name] = {"start": start}
+        try:
+            result = self._call(stage, args, events.put)
+        finally:
+            end = time.time()
+            self.timings[stage.name].update({"end": end, "duration": end - start})
+        if stage.checkpoint and self.on_checkpoint:
+            self._checkpoint(stage.name, result)
+        return result
+
+    def run(self):
+        """
+        Runs every stage of the graph on a thread pool.
+
+        Once a stage fails no new stages are started; stages that are already
+        running are allowed to finish before the error is raised.
+
+        Returns:
+            dict: The result of every stage, keyed by stage name.
+        """
+        self.validate()
+        pending = self._pending_stages()
+        running = set()
+        events = queue.Queue()
+        failure = None
+
+        def work(stage, args):
+            try:
+                events.put(("done", stage.name, self._execute(stage, args, events), None))
+            except Exception as e:
+                events.put(("done", stage.name, None, e))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while running or (pending and failure is None):
+                if failure is None:
+                    for name in self._ready_stages(pending):
+                        stage = self.stages[name]
+                        args = [self.results[dependency] for dependency in stage.inputs]
+                        pool.submit(work, stage, args)
+                        running.add(name)
+                        pending.remove(name)
+
+                failure = self._handle_event(events.get(), running, failure)
+
+        if failure is not None:
+            raise failure
+        return self.results
+
+    async def _execute_async(self, stage, args, semaphore, events):
+        async with semaphore:
+            start = time.time()
+            self.timings[stage.name] = {"start": start}
+            try:
+                result = self._call(stage, args, events.put_nowait)
+                if inspect.isawaitable(result):
+                    result = await result
+            finally:
+                end = time.time()
+                self.timings[stage.name].update({"end": end, "duration": end - start})
+        if stage.checkpoint and self.on_checkpoint:
+            await self._checkpoint_async(stage.name, result)
+        return result
+
+    async def run_async(self):
+        """
+        Runs every stage of the graph as asyncio tasks on the current loop.
+
+        Stage functions may return awaitables (e.g. an `async def` provider
+        call), which are awaited; plain results are used as they are, so
+        stage functions must not block. The failure semantics are the same
+        as `run`.
+
+        Returns:
+            dict: The result of every stage, keyed by stage name.
+        """
+        self.validate()
+        semaphore = asyncio.Semaphore(self.max_workers)
+        pending = self._pending_stages()
+        running = set()
+        events = asyncio.Queue()
+        tasks = set()
+        failure = None
+
+        async def work(stage, args):
+            try:
+                result = await self._execute_async(stage, args, semaphore, events)
+                events.put_nowait(("done", stage.name, result, None))
+            except Exception as e:
+                events.put_nowait(("done", stage.name, None, e))
+
+        while running or (pending and failure is None):
+            if failure is None:
+                for name in self._ready_stages(pending):
+                    stage = self.stages[name]
+                    args = [self.results[dependency] for dependency in stage.inputs]
+                    # Keep a reference so the task is not garbage collected mid-flight
+                    task = asyncio.ensure_future(work(stage, args))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                    running.add(name)
+                    pending.remove(name)
+
+            failure = self._handle_event(await events.get(), running, failure)
+
+        if failure is not None:
+            raise failure
+        return self.results
+
+    def critical_path(self):
+        """
+        Works out the chain of stages that determined the total wall time.
+
+        Starting from the stage that finished last, it walks back through the
+        input that finished last until it reaches a stage without inputs.
+        Inputs that are early outputs are attributed to their producing stage.
+
+        Returns:
+            list: Stage names along the critical path, in execution order.
+        """
+        finished = {name: t for name, t in self.timings.items() if "end" in t}
+        if not finished:
+            return []
+
+        path = []
+        current = max(finished, key=lambda name: finished[name]["end"])
+        while current is not None:
+            path.append(current)
+            inputs = {self._producer(d) for d in self.stages[current].inputs}
+            inputs = [name for name in inputs if name in finished]
+            current = max(inputs, key=lambda name: finished[name]["end"]) if inputs else None
+        return list(reversed(path))
@@ -0,0 +1,343 @@
+import asyncio
+import os
+import time
+
+import app
+from aio import aws_call, run_sync
+from blueprint_cache import blueprint_cache_key
+from clip_cache import normalize_prompt
+from voiceover_cache import VoiceoverCache, voiceover_cache_key
+
+PREWARM_LOOKBACK_DAYS = int(os.environ.get("PREWARM_LOOKBACK_DAYS", "14"))
+# Campaigns and prompts need at least this many recent jobs or hits
+PREWARM_MIN_DEMAND = int(os.environ.get("PREWARM_MIN_DEMAND", "2"))
+# Estimated spend per day, and the estimated cost of each kind of generation
+PREWARM_BUDGET_USD = float(os.environ.get("PREWARM_BUDGET_USD", "0"))
+PREWARM_CLIP_COST_USD = float(os.environ.get("PREWARM_CLIP_COST_USD", "0.50"))
+PREWARM_VOICEOVER_COST_USD = float(os.environ.get("PREWARM_VOICEOVER_COST_USD", "0.05"))
+PREWARM_BLUEPRINT_COST_USD = float(os.environ.get("PREWARM_BLUEPRINT_COST_USD", "0.01"))
+PREWARM_CONCURRENCY = int(os.environ.get("PREWARM_CONCURRENCY", "3"))
+# No new generation is started this close to the invocation's timeout
+PREWARM_SAFETY_SECONDS = float(os.environ.get("PREWARM_SAFETY_SECONDS", "180"))
+
+
+def cents(usd):
+    return int(round(usd * 100))
+
+
+def scan_since(table, attribute, since):
+    """
+    Returns every item of a table whose `attribute` is at least `since`.
+    """
+    items = []
+    kwargs = {
+        "FilterExpression": "#since >= :since",
+        "ExpressionAttributeNames": {"#since": attribute},
+        "ExpressionAttributeValues": {":since": int(since)},
+    }
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def campaign_demand(jobs, min_demand):
+    """
+    Groups jobs by campaign: the same SKU, normalised brief and language
+    (the blueprint cache key).
+
+    Returns:
+        list: The campaigns with at least `min_demand` jobs, most requested
+              first, each with its 'sku', 'user_context', 'language', number
+              of 'jobs' and the 'blueprint' of its latest job (or None).
+    """
+    campaigns = {}
+    for job in sorted(jobs, key=lambda job: int(job.get("createdAt") or 0)):
+        body = job.get("requestBody") or {}
+        if not body.get("sku"):
+            continue
+        language = body.get("language", "English")
+        key = blueprint_cache_key(body["sku"], body.get("user_context"), language, app.BLUEPRINT_PROMPT_VERSION)
+        campaign = campaigns.setdefault(key, {
+            "key": key, "sku": body["sku"], "user_context": body.get("user_context"), "language": language,
+            "jobs": 0, "blueprint": None,
+        })
+        campaign["jobs"] += 1
+        campaign["blueprint"] = (job.get("checkpoints") or {}).get("blueprint") or campaign["blueprint"]
+    ranked = [campaign for campaign in campaigns.values() if campaign["jobs"] >= min_demand]
+    return sorted(ranked, key=lambda campaign: -campaign["jobs"])
+
+
+def hot_prompts(entries, min_demand):
+    """
+    Returns the (prompt, hit count) of the cached clips hit at least
+    `min_demand` times, most hit first.
+    """
+    hits = {}
+    for entry in entries:
+        if entry.get("promptText") and entry.get("s3_uri"):
+            prompt = entry["promptText"]
+            hits[prompt] = max(hits.get(prompt, 0), int(entry.get("hitCount") or 0))
+    return sorted(((prompt, count) for prompt, count in hits.items() if count >= min_demand), key=lambda p: -p[1])
+
+
+class Budget:
+    """
+    The spend still available to this run, in cents.
+    """
+
+    def __init__(self, limit_cents, spent_cents=0):
+        self.limit_cents = limit_cents
+        self.spent_cents = spent_cents
+
+    @property
+    def remaining_cents(self):
+        return max(0, self.limit_cents - self.spent_cents)
+
+    def reserve(self, cost_cents):
+        """
+        Books an estimated cost if it fits the budget.
+        """
+        if cost_cents > self.remaining_cents:
+            return False
+        self.spent_cents += cost_cents
+        return True
+
+    def release(self, cost_cents):
+        """
+        Returns a booked cost that was not spent after all.
+        """
+        self.spent_cents -= cost_cents
+
+
+class Prewarmer:
+    """
+    Plans and runs one off-peak pre-warming pass of the clip and voiceover
+    caches, so peak-hour jobs for popular campaigns mostly hit them.
+
+    Candidates come from the recent demand: the blueprints of frequently
+    requested campaigns (see `campaign_demand`) and frequently hit clip
+    prompts that are not cached for the current routes and parameters
+    (see `hot_prompts`). Those already cached are skipped; the rest are
+    generated in order of demand through the worker's own cache paths, so
+    keys, leases and rate limits are shared with running jobs, until the
+    budget is used up or the deadline has passed. Clips are only warmed
+    when the worker generates them (WORKER_MODE 'full'). A campaign whose
+    blueprint cannot be loaded or generated is counted as failed and
+    skipped. Pre-warming lookups are not counted in the cache statistics.
+
+    Args:
+        bucket_name (str): The S3 bucket holding the caches.
+        cache_table: The ClipCacheTable resource.
+        secrets (dict): The provider API keys, as from `app.load_secrets_async('full')`.
+        budget (Budget): What this run may spend.
+        deadline (float): When no new generation may start any more.
+    """
+
+    def __init__(self, bucket_name, cache_table, secrets, budget, deadline=float("inf"), clock=time.time):
+        self.bucket_name = bucket_name
+        self.cache_table = cache_table
+        self.secrets = secrets
+        self.budget = budget
+        self.deadline = deadline
+        self.clock = clock
+        self.clip_cache = app.get_clip_cache(cache_table, count_lookups=False)
+        self.voiceover_cache = VoiceoverCache(
+            cache_table, ttl_seconds=app.CLIP_CACHE_TTL_SECONDS, count_lookups=False
+        )
+        self.report = {"campaigns": 0, "blueprints": 0, "clips": 0, "voiceovers": 0,
+                       "warm": 0, "overBudget": 0, "pastDeadline": 0, "failed": 0, "spentCents": 0}
+
+    def charge(self, cost_cents):
+        if not self.budget.reserve(cost_cents):
+            self.report["overBudget"] += 1
+            return False
+        self.report["spentCents"] += cost_cents
+        return True
+
+    async def blueprint_for(self, campaign, dry_run=False):
+        """
+        Returns the campaign's blueprint: the cached one, a newly generated
+        one (stored in the blueprint cache) when it expired, or the latest
+        job's when there is no blueprint cache, no budget or on a dry run.
+        """
+        if app.blueprint_cache:
+            cached = await aws_call(app.blueprint_cache.get, campaign["key"])
+            if cached is not None:
+                return cached
+            if not dry_run and self.charge(cents(PREWARM_BLUEPRINT_COST_USD)):
+                product_data = await app.load_product_async(self.bucket_name, campaign["sku"])
+                blueprint = await app.get_ad_blueprint_async(
+                    campaign["sku"], product_data, campaign["user_context"],
+                    self.secrets["openrouter"], campaign["language"],
+                )
+                self.report["blueprints"] += 1
+                return blueprint
+        return campaign["blueprint"]
+
+    async def plan(self, campaigns, prompts, dry_run=False):
+        """
+        Collects the clips and voiceovers the campaigns and hot prompts need
+        that are not cached yet.
+
+        Returns:
+            list: (demand, kind, arguments) tuples, most demanded first.
+        """
+        # Jobs in the other modes never generate clips, so warming them would be wasted
+        warm_clips = app.WORKER_MODE == "full"
+        clips, voiceovers = {}, {}
+        for campaign in campaigns:
+            try:
+                blueprint = await self.blueprint_for(campaign, dry_run)
+            except Exception as e:
+                # A blueprint that failed may still be billed, so its estimate stays booked
+                self.report["failed"] += 1
+                print(f"Could not get the blueprint of campaign {campaign['sku']} ({campaign['key'][:12]}): {e}")
+                continue
+            if not blueprint:
+                continue
+            self.report["campaigns"] += 1
+            acts = blueprint.get("acts", [])[:app.NUM_ACTS] if warm_clips else []
+            for act in acts:
+                prompt = app.act_prompt(act)
+                demand, _ = clips.get(normalize_prompt(prompt), (0, prompt))
+                clips[normalize_prompt(prompt)] = (demand + campaign["jobs"], prompt)
+            if blueprint.get("voiceover_script") and blueprint.get("voice_id"):
+                voice = (blueprint["voiceover_script"], blueprint["voice_id"])
+                voiceovers[voice] = voiceovers.get(voice, 0) + campaign["jobs"]
+        for prompt, hits in prompts if warm_clips else ():
+            demand, _ = clips.get(normalize_prompt(prompt), (0, prompt))
+            clips[normalize_prompt(prompt)] = (max(demand, hits), prompt)
+
+        needed = []
+        routes = app.video_router.routes
+        for demand, prompt in clips.values():
+            if await aws_call(self.clip_cache.peek, prompt, routes):
+                self.report["warm"] += 1
+            else:
+                needed.append((demand, "clip", (prompt,)))
+        for (script, voice_id), demand in voiceovers.items():
+            key = voiceover_cache_key(script, voice_id, app.ELEVENLABS_MODEL_ID, app.ELEVENLABS_VOICE_SETTINGS)
+            if await aws_call(self.voiceover_cache.peek, key):
+                self.report["warm"] += 1
+            else:
+                needed.append((demand, "voiceover", (script, voice_id)))
+        return sorted(needed, key=lambda item: -item[0])
+
+    async def generate(self, kind, arguments):
+        if kind == "clip":
+            await app.generate_video_clip_async(
+                arguments[0], self.secrets["hf"], self.bucket_name, self.cache_table, count_lookups=False
+            )
+        else:
+            await app.generate_voiceover_async(
+                *arguments, self.secrets["elevenlabs"], self.bucket_name, self.cache_table, count_lookups=False
+            )
+        self.report[f"{kind}s"] += 1
+
+    async def run(self, campaigns, prompts, dry_run=False):
+        """
+        Plans the pass and generates what fits the budget, most demanded
+        first, `PREWARM_CONCURRENCY` at a time.
+
+        Returns:
+            dict: What was warmed, skipped and spent.
+        """
+        needed = await self.plan(campaigns, prompts, dry_run)
+        costs = {"clip": cents(PREWARM_CLIP_COST_USD), "voiceover": cents(PREWARM_VOICEOVER_COST_USD)}
+        selected = [(kind, arguments) for _, kind, arguments in needed if self.charge(costs[kind])]
+        print(f"Pre-warming {len(selected)} of {len(needed)} missing assets "
+              f"({self.report['spentCents'] / 100:.2f} USD of {self.budget.limit_cents / 100:.2f} USD).")
+        if dry_run:
+            for kind, arguments in selected:
+                print(f"  {kind}: {arguments[0][:70]!r}")
+            return self.report
+
+        semaphore = asyncio.Semaphore(max(1, PREWARM_CONCURRENCY))
+
+        async def warm(kind, arguments):
+            async with semaphore:
+                if self.clock() >= self.deadline:
+                    self.budget.release(costs[kind])
+                    self.report["spentCents"] -= costs[kind]
+                    self.report["pastDeadline"] += 1
+                    return
+                try:
+                    await self.generate(kind, arguments)
+                except Exception as e:
+                    # A failed generation may still be billed, so its estimate stays booked
+                    self.report["failed"] += 1
+                    print(f"Pre-warming the {kind} {arguments[0][:30]}... failed: {e}")
+
+        await asyncio.gather(*(warm(kind, arguments) for kind, arguments in selected))
+        return self.report
+
+
+def spent_today(cache_table, now):
+    """
+    Returns the cents pre-warming already spent today.
+    """
+    item = cache_table.get_item(Key={"promptHash": f"stats#{time.strftime('%Y-%m-%d', time.gmtime(now))}"})
+    return int((item.get("Item") or {}).get("prewarmSpentCents", 0))
+
+
+def record_spend(cache_table, report, now):
+    """
+    Adds this run's spend and generations to today's statistics item.
+    """
+    cache_table.update_item(
+        Key={"promptHash": f"stats#{time.strftime('%Y-%m-%d', time.gmtime(now))}"},
+        UpdateExpression="ADD prewarmSpentCents :spent, prewarmClips :clips, prewarmVoiceovers :voiceovers",
+        ExpressionAttributeValues={
+            ":spent": report["spentCents"], ":clips": report["clips"], ":voiceovers": report["voiceovers"],
+        },
+    )
+
+
+async def prewarm_async(options, remaining_seconds, now=None):
+    """
+    Mines the recent demand and runs one pre-warming pass.
+
+    Args:
+        options (dict): Optional 'budgetUsd' and 'dryRun' overrides.
+        remaining_seconds (float): Time left in the invocation.
+
+    Returns:
+        dict: The run's report.
+    """
+    limit = cents(float(options.get("budgetUsd", PREWARM_BUDGET_USD)))
+    if not limit:
+        print("Pre-warming is disabled: no budget.")
+        return {}
+    now = now or time.time()
+    since = now - PREWARM_LOOKBACK_DAYS * 86400
+    jobs_table = app.dynamodb.Table(app.JOBS_TABLE_NAME)
+    cache_table = app.dynamodb.Table(app.CLIP_CACHE_TABLE_NAME)
+
+    jobs = await aws_call(scan_since, jobs_table, "createdAt", since)
+    entries = await aws_call(scan_since, cache_table, "lastAccessedAt", since)
+    campaigns = campaign_demand(jobs, PREWARM_MIN_DEMAND)
+    prompts = hot_prompts(entries, PREWARM_MIN_DEMAND)
+    print(f"Pre-warming from {len(jobs)} recent jobs: {len(campaigns)} campaigns and {len(prompts)} hot prompts.")
+
+    budget = Budget(limit, await aws_call(spent_today, cache_table, now))
+    secrets = await app.load_secrets_async("full")
+    prewarmer = Prewarmer(
+        app.PRODUCT_DB_BUCKET, cache_table, secrets, budget, deadline=time.time() + remaining_seconds - PREWARM_SAFETY_SECONDS
+    )
+    dry_run = bool(options.get("dryRun", False))
+    report = await prewarmer.run(campaigns, prompts, dry_run=dry_run)
+    if not dry_run:
+        await aws_call(record_spend, cache_table, report, now)
+    print(f"Pre-warming done: {report}")
+    return report
+
+
+def lambda_handler(options, context):
+    """
+    Runs one pre-warming pass within the invocation's remaining time.
+    """
+    remaining_seconds = context.get_remaining_time_in_millis() / 1000 if context else 900
+    return run_sync(prewarm_async(options or {}, remaining_seconds))
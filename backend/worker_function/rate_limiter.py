@@ -0,0 +1,183 @@
+import asyncio
+import random
+import threading
+import time
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from aio import aws_call
+
+# How long to back off after losing a race for the same bucket to another worker
+CONTENTION_RETRY_SECONDS = 0.05
+
+
+def parse_budgets(spec):
+    """
+    Parses per-provider budgets of the form 'name=per_minute:burst', e.g.
+    'openrouter=60:10,elevenlabs=30:5'. The burst defaults to the per-minute
+    rate divided by 6 (ten seconds' worth), and at least 1.
+
+    Returns:
+        dict: Provider name mapped to a (tokens per second, capacity) tuple.
+    """
+    budgets = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, limit = entry.partition("=")
+        per_minute, _, burst = limit.partition(":")
+        try:
+            per_minute = float(per_minute)
+            burst = float(burst) if burst else max(1.0, per_minute / 6)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{entry}', expected 'name=per_minute:burst'.")
+        if per_minute <= 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{entry}', rate and burst must be positive.")
+        budgets[name.strip()] = (per_minute / 60, burst)
+    return budgets
+
+
+def refill(tokens, updated_at, now, rate, capacity):
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryTokenBucketStore:
+    """
+    Token buckets kept in process memory. Stands in for the DynamoDB store in
+    tests and local runs, where there is only one worker.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def try_acquire(self, key, rate, capacity, tokens, now):
+        """
+        Takes `tokens` from the bucket if it has them.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds
+                   until the bucket will have refilled enough.
+        """
+        with self.lock:
+            available, updated_at = self.buckets.get(key, (capacity, now))
+            available = refill(available, updated_at, now, rate, capacity)
+            if available < tokens:
+                self.buckets[key] = (available, now)
+                return (tokens - available) / rate
+            self.buckets[key] = (available - tokens, now)
+            return 0.0
+
+
+class DynamoTokenBucketStore:
+    """
+    Token buckets shared by every worker container, one DynamoDB item per
+    provider ('bucketKey', 'tokens', 'updatedAt').
+
+    The bucket is refilled lazily from the time since its last update, and
+    every update is conditional on 'updatedAt' being unchanged since it was
+    read, so two workers can never take the same tokens.
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def try_acquire(self, key, rate, capacity, tokens, now):
+        """
+        Takes `tokens` from the bucket if it has them.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds
+                   to wait before trying again.
+        """
+        item = self.table.get_item(Key={'bucketKey': key}, ConsistentRead=True).get('Item')
+        if item:
+            available = refill(float(item['tokens']), float(item['updatedAt']), now, rate, capacity)
+        else:
+            available = capacity
+        if available < tokens:
+            return (tokens - available) / rate
+
+        update = {
+            'Key': {'bucketKey': key},
+            'UpdateExpression': "SET tokens = :tokens, updatedAt = :now",
+            'ExpressionAttributeValues': {
+                ':tokens': Decimal(str(round(available - tokens, 6))),
+                ':now': Decimal(str(round(now, 6))),
+            },
+        }
+        if item:
+            update['ConditionExpression'] = "updatedAt = :previous"
+            update['ExpressionAttributeValues'][':previous'] = item['updatedAt']
+        else:
+            update['ConditionExpression'] = "attribute_not_exists(bucketKey)"
+        try:
+            self.table.update_item(**update)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return CONTENTION_RETRY_SECONDS
+        return 0.0
+
+
+class RateLimitTimeout(Exception):
+    """
+    Raised when a provider has had no capacity for longer than the limiter's
+    `max_wait`.
+    """
+
+
+class RateLimiter:
+    """
+    Per-provider token-bucket rate limiter.
+
+    Every provider call first acquires a token for its provider. When the
+    budget is exhausted, the caller sleeps until the bucket is expected to
+    have refilled (plus some jitter, so waiting workers do not all retry at
+    the same moment) instead of sending the request and getting a 429.
+    Providers without a configured budget are not limited.
+
+    Args:
+        store: A `DynamoTokenBucketStore` (shared across workers) or a
+               `MemoryTokenBucketStore`.
+        budgets (dict): Provider name mapped to (tokens per second, capacity),
+                        see `parse_budgets`.
+        max_wait (float): The longest a single acquire may wait, in seconds.
+    """
+
+    def __init__(self, store, budgets, max_wait=120.0, clock=time.time, sleep=asyncio.sleep):
+        self.store = store
+        self.budgets = dict(budgets)
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+
+    async def acquire(self, provider, tokens=1):
+        """
+        Waits until `tokens` requests to `provider` are within its budget.
+
+        Returns:
+            float: The number of seconds spent waiting.
+        """
+        if provider not in self.budgets:
+            return 0.0
+        rate, capacity = self.budgets[provider]
+        if tokens > capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of {capacity}.")
+
+        waited = 0.0
+        while True:
+            wait = await aws_call(self.store.try_acquire, provider, rate, capacity, tokens, self.clock())
+            if wait <= 0:
+                if waited:
+                    print(f"Rate limit for {provider}: waited {waited:.2f}s for capacity.")
+                return waited
+            wait *= 1 + random.random() * 0.25
+            if waited + wait > self.max_wait:
+                raise RateLimitTimeout(
+                    f"No {provider} capacity within {self.max_wait:.0f}s of waiting."
+                )
+            await self.sleep(wait)
+            waited += wait
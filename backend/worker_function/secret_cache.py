@@ -0,0 +1,118 @@
+import threading
+import time
+
+# get_parameters accepts at most 10 names per call
+MAX_NAMES_PER_CALL = 10
+
+
+class SecretCache:
+    """
+    Container-level cache of Parameter Store secrets.
+
+    All configured parameters are fetched together with batched
+    `get_parameters` calls, so a cold container pays one round trip instead
+    of one per secret, and a warm container pays none. Once a value is older
+    than `ttl_seconds` it is still served, while a background thread fetches
+    a fresh copy; only values older than `max_stale_seconds` (e.g. after the
+    container sat idle for a long time) are refreshed before returning.
+
+    Args:
+        ssm_client: A boto3 SSM client.
+        names (list): The parameter names to load in every batch.
+        ttl_seconds (float): How long a value is served without refreshing it.
+        max_stale_seconds (float): How long a value may be served while it is
+                                   refreshed in the background. Defaults to
+                                   twice the TTL.
+    """
+
+    def __init__(self, ssm_client, names=(), ttl_seconds=300.0, max_stale_seconds=None,
+                 clock=time.monotonic):
+        self.ssm = ssm_client
+        self.names = [name for name in names if name]
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds if max_stale_seconds is not None else 2 * ttl_seconds
+        self.clock = clock
+        self.values = {}
+        self.loaded_at = None
+        self.lock = threading.Lock()
+        self.refreshing = False
+
+    def _fetch(self, names):
+        """
+        Returns the values of the parameters that exist and the names of
+        those that do not.
+        """
+        values, invalid = {}, []
+        for i in range(0, len(names), MAX_NAMES_PER_CALL):
+            batch = names[i:i + MAX_NAMES_PER_CALL]
+            response = self.ssm.get_parameters(Names=batch, WithDecryption=True)
+            invalid.extend(response.get("InvalidParameters", []))
+            for parameter in response["Parameters"]:
+                values[parameter["Name"]] = parameter["Value"]
+        return values, invalid
+
+    def refresh(self, names=()):
+        """
+        Fetches every configured parameter (plus `names`) and replaces the
+        cache. Parameters that do not exist (e.g. the keys of a mode this
+        worker does not run in) are left out; only asking for one fails.
+        """
+        wanted = list(dict.fromkeys([*self.names, *names, *self.values]))
+        values, invalid = self._fetch(wanted)
+        with self.lock:
+            self.values.update(values)
+            for name in invalid:
+                self.values.pop(name, None)
+            self.loaded_at = self.clock()
+        print(f"Loaded {len(values)} secrets from Parameter Store.")
+        if invalid:
+            print(f"Parameters not found: {', '.join(invalid)}")
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def refresh():
+            try:
+                self.refresh()
+            except Exception as e:
+                # The cached values keep being served; the next call retries
+                print(f"Background secret refresh failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing = False
+
+        threading.Thread(target=refresh, name="secret-refresh", daemon=True).start()
+
+    def get_many(self, names):
+        """
+        Returns the values of the given parameters.
+
+        Args:
+            names (list): The parameter names.
+
+        Returns:
+            dict: The decrypted values, keyed by parameter name.
+
+        Raises:
+            KeyError: If one of `names` is not in Parameter Store.
+        """
+        age = None if self.loaded_at is None else self.clock() - self.loaded_at
+        missing = [name for name in names if name not in self.values]
+        if missing or age is None or age >= self.max_stale_seconds:
+            self.refresh(missing)
+        not_found = [name for name in names if name not in self.values]
+        if not_found:
+            raise KeyError(f"Parameters not found: {', '.join(not_found)}")
+        values = {name: self.values[name] for name in names}
+        if not missing and age is not None and self.ttl_seconds <= age < self.max_stale_seconds:
+            self._refresh_in_background()
+        return values
+
+    def get(self, name):
+        """
+        Returns the value of a single parameter.
+        """
+        return self.get_many([name])[name]
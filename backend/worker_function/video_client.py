@@ -0,0 +1,169 @@
+import asyncio
+from urllib.parse import urlparse
+
+import aiohttp
+
+from aio import get_session, raise_for_status
+
+HF_HUB_URL = "https://huggingface.co"
+HF_ROUTER_URL = "https://router.huggingface.co"
+
+# Where each provider is called when the token is the provider's own key
+# instead of a Hugging Face token
+PROVIDER_BASE_URLS = {
+    "replicate": "https://api.replicate.com",
+    "fal-ai": "https://queue.fal.run",
+}
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Hub model id -> {provider: provider model id}, shared by every client
+_provider_models = {}
+
+
+class TextToVideoClient:
+    """
+    A minimal text-to-video client for the Replicate and Fal providers.
+
+    It speaks the same HTTP protocol as `huggingface_hub`'s
+    `AsyncInferenceClient.text_to_video` (through the Hugging Face router
+    when the token is an 'hf_' token, directly otherwise), on the worker's
+    pooled aiohttp sessions, so the worker does not ship huggingface_hub
+    and its dependencies.
+
+    Args:
+        provider (str): 'replicate' or 'fal-ai'.
+        token (str): A Hugging Face token or the provider's own API key.
+        timeout (float): The timeout of each request, in seconds.
+        base_url (str): Overrides the provider URL (e.g. for a local stand-in).
+        hub_url (str): Overrides the Hugging Face Hub URL used to map model ids.
+    """
+
+    def __init__(self, provider, token, timeout=120.0, base_url=None, hub_url=HF_HUB_URL,
+                 poll_interval=0.5):
+        if provider not in PROVIDER_BASE_URLS:
+            raise ValueError(f"Unsupported text-to-video provider '{provider}'.")
+        self.provider = provider
+        self.token = token
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.hub_url = hub_url
+        self.poll_interval = poll_interval
+        self.via_router = token.startswith("hf_")
+        if base_url:
+            self.base_url = base_url.rstrip("/")
+        elif self.via_router:
+            self.base_url = f"{HF_ROUTER_URL}/{provider}"
+        else:
+            self.base_url = PROVIDER_BASE_URLS[provider]
+
+    def _headers(self):
+        if self.provider == "fal-ai" and not self.via_router:
+            return {"Authorization": f"Key {self.token}"}
+        return {"Authorization": f"Bearer {self.token}"}
+
+    async def provider_model_id(self, model):
+        """
+        Looks up the provider's id for a Hub model (cached per container).
+        """
+        if model not in _provider_models:
+            url = f"{self.hub_url}/api/models/{model}?expand[]=inferenceProviderMapping"
+            async with get_session("huggingface").get(
+                url, headers={"Authorization": f"Bearer {self.token}"}, timeout=self.timeout
+            ) as response:
+                await raise_for_status(response, "Hugging Face Hub")
+                mapping = (await response.json()).get("inferenceProviderMapping") or {}
+            if isinstance(mapping, list):
+                mapping = {entry["provider"]: entry for entry in mapping}
+            _provider_models[model] = {
+                provider: entry["providerId"] for provider, entry in mapping.items()
+            }
+        provider_model = _provider_models[model].get(self.provider)
+        if not provider_model:
+            raise ValueError(f"Model '{model}' is not served by provider '{self.provider}'.")
+        return provider_model
+
+    async def _replicate_output_url(self, prompt, provider_model, parameters):
+        payload = {"input": {"prompt": prompt, **parameters}}
+        if ":" in provider_model:
+            payload["version"] = provider_model.split(":", 1)[1]
+            url = f"{self.base_url}/v1/predictions"
+        else:
+            url = f"{self.base_url}/v1/models/{provider_model}/predictions"
+        headers = {**self._headers(), "Prefer": "wait"}
+        async with get_session(self.provider).post(
+            url, json=payload, headers=headers, timeout=self.timeout
+        ) as response:
+            await raise_for_status(response, "Replicate", expected=(200, 201))
+            prediction = await response.json()
+        output = prediction.get("output")
+        if output is None:
+            raise TimeoutError(
+                f"Inference request timed out. No output generated for model {prediction.get('model')}. "
+                "The model might be in cold state or starting up. Please try again later."
+            )
+        return output if isinstance(output, str) else output[0]
+
+    async def _fal_output_url(self, prompt, provider_model, parameters):
+        session = get_session(self.provider)
+        headers = self._headers()
+        query = "?_subdomain=queue" if self.via_router else ""
+        async with session.post(
+            f"{self.base_url}/{provider_model}{query}",
+            json={"prompt": prompt, **parameters},
+            headers=headers,
+            timeout=self.timeout,
+        ) as response:
+            await raise_for_status(response, "Fal")
+            queued = await response.json()
+        if not queued.get("request_id"):
+            raise ValueError("No request ID found in the Fal response.")
+
+        # The status and result live under the path Fal reports back, which
+        # may differ from the model id the request was sent to
+        parsed = urlparse(self.base_url)
+        root = f"{parsed.scheme}://{parsed.netloc}{'/fal-ai' if self.via_router else ''}"
+        result_path = urlparse(queued.get("response_url")).path
+        status = queued.get("status")
+        while status != "COMPLETED":
+            await asyncio.sleep(self.poll_interval)
+            async with session.get(
+                f"{root}{result_path}/status{query}", headers=headers, timeout=self.timeout
+            ) as response:
+                await raise_for_status(response, "Fal", expected=(200, 202))
+                status = (await response.json()).get("status")
+        async with session.get(f"{root}{result_path}{query}", headers=headers, timeout=self.timeout) as response:
+            await raise_for_status(response, "Fal")
+            return (await response.json())["video"]["url"]
+
+    async def _output_url(self, prompt, model, parameters):
+        provider_model = await self.provider_model_id(model)
+        if self.provider == "replicate":
+            return await self._replicate_output_url(prompt, provider_model, parameters)
+        return await self._fal_output_url(prompt, provider_model, parameters)
+
+    async def text_to_video_into(self, sink, prompt, model, **parameters):
+        """
+        Generates a video and streams its download into `sink` (anything
+        with a `write(bytes)` method, e.g. an `asset_store.SpooledAsset`),
+        so the clip never has to be held in memory as a whole.
+
+        Returns:
+            The sink.
+        """
+        video_url = await self._output_url(prompt, model, parameters)
+        async with get_session(self.provider).get(video_url, timeout=self.timeout) as response:
+            await raise_for_status(response, self.provider)
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                sink.write(chunk)
+        return sink
+
+    async def text_to_video(self, prompt, model, **parameters):
+        """
+        Generates a video and returns its bytes, like
+        `AsyncInferenceClient.text_to_video`.
+        """
+        class Buffer(bytearray):
+            def write(self, chunk):
+                self.extend(chunk)
+
+        return bytes(await self.text_to_video_into(Buffer(), prompt, model, **parameters))
@@ -0,0 +1,395 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+
+class VideoRoute:
+    """
+    One text-to-video backend: an inference provider and the model it serves.
+
+    Args:
+        provider (str): The Hugging Face inference provider (e.g. 'replicate').
+        model (str): The model id (e.g. 'Wan-AI/Wan2.2-T2V-A14B').
+    """
+
+    def __init__(self, provider, model):
+        self.provider = provider
+        self.model = model
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+    def __repr__(self):
+        return f"VideoRoute({self.name!r})"
+
+
+def parse_routes(spec):
+    """
+    Parses a comma-separated list of 'provider:model' routes, in order of
+    preference, e.g. 'replicate:Wan-AI/Wan2.2-T2V-A14B,fal-ai:Wan-AI/Wan2.2-T2V-A14B'.
+
+    Returns:
+        list: The `VideoRoute`s.
+    """
+    routes = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        provider, _, model = entry.partition(":")
+        if not model:
+            raise ValueError(f"Invalid video route '{entry}', expected 'provider:model'.")
+        routes.append(VideoRoute(provider.strip(), model.strip()))
+    if not routes:
+        raise ValueError("At least one video route must be configured.")
+    return routes
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to a route after `failure_threshold` consecutive
+    failures. After `reset_seconds` one trial request is let through
+    (half-open): if it succeeds the breaker closes again, otherwise it stays
+    open for another `reset_seconds`.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, reset_seconds=60.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def available(self):
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self.trial_running)
+
+    def allow(self):
+        """
+        Returns True if a request may be sent now, reserving the trial
+        request when the breaker is half-open.
+        """
+        if not self.available:
+            return False
+        if self.state == self.HALF_OPEN:
+            self.trial_running = True
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_running or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.trial_running = False
+
+
+class RouteStats:
+    """
+    Rolling latency and error statistics of a route over its last `window` requests.
+    """
+
+    def __init__(self, window=20):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.failures = 0
+
+    def record(self, latency, ok):
+        self.requests += 1
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.failures += 1
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def percentile(self, q):
+        """
+        Returns the q-th percentile (0-100) of the successful latencies in
+        the window, or None if there are none yet.
+        """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+def release(result):
+    """
+    Frees a result that is not used, e.g. closes the spool of a clip that
+    lost a hedge race. Results without a `close` method are left as they are.
+    """
+    close = getattr(result, "close", None)
+    if close is not None:
+        close()
+
+
+class VideoRouter:
+    """
+    Sends each text-to-video request to the healthiest configured route and
+    falls back to the next one when it fails.
+
+    Routes are ranked by their rolling median latency, inflated by their
+    recent error rate; routes without history keep their configured order
+    and are tried before slower known routes so new providers get sampled.
+    Routes whose circuit breaker is open are skipped. If every breaker is
+    open the routes are tried anyway, so a job is never failed without at
+    least one attempt.
+
+    The router lives at module level in the worker, so its statistics carry
+    over between warm invocations of the same container. Every attempt is
+    logged as a CloudWatch embedded metric (namespace `AdForge/VideoRouter`).
+    """
+
+    def __init__(self, routes, window=20, failure_threshold=3, reset_seconds=60.0,
+                 clock=time.monotonic):
+        self.routes = list(routes)
+        self.clock = clock
+        self.stats = {route.name: RouteStats(window) for route in self.routes}
+        self.breakers = {
+            route.name: CircuitBreaker(failure_threshold, reset_seconds, clock)
+            for route in self.routes
+        }
+        self.decisions = {route.name: 0 for route in self.routes}
+
+    def score(self, route):
+        median = self.stats[route.name].percentile(50)
+        if median is None:
+            return 0.0
+        return median * (1 + 4 * self.stats[route.name].error_rate)
+
+    def ranked(self):
+        """
+        Returns the routes to try, best first.
+        """
+        order = {route.name: i for i, route in enumerate(self.routes)}
+        ranked = sorted(self.routes, key=lambda route: (self.score(route), order[route.name]))
+        available = [route for route in ranked if self.breakers[route.name].available]
+        return available or ranked
+
+    def record(self, route, latency, ok):
+        """
+        Records the outcome of one request to a route.
+        """
+        self.stats[route.name].record(latency, ok)
+        breaker = self.breakers[route.name]
+        if ok:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        emit_metrics(
+            {"Provider": route.provider, "Model": route.model},
+            {"ClipLatency": (latency, "Seconds"), "ClipFailure": (0 if ok else 1, "Count")},
+        )
+
+    async def _attempt(self, route, request):
+        self.decisions[route.name] += 1
+        print(f"Routing clip to {route.name} (circuit {self.breakers[route.name].state}).")
+        start = self.clock()
+        try:
+            result = await request(route)
+        except asyncio.CancelledError:
+            # Lost a hedge race: neither a success nor a failure of the route
+            self.breakers[route.name].trial_running = False
+            raise
+        except Exception as e:
+            self.record(route, self.clock() - start, ok=False)
+            print(f"Video route {route.name} failed: {e}")
+            raise
+        self.record(route, self.clock() - start, ok=True)
+        return result, route
+
+    async def call(self, request):
+        """
+        Runs a request against the best route, falling back on failure.
+
+        Args:
+            request (callable): Takes a `VideoRoute` and returns an awaitable
+                                of the result (e.g. the clip's bytes).
+
+        Returns:
+            tuple: The result and the route that produced it.
+        """
+        routes = self.ranked()
+        forced = not any(self.breakers[route.name].available for route in routes)
+        last_error = None
+        for route in routes:
+            # Another request may have taken a half-open route's trial slot meanwhile
+            if not self.breakers[route.name].allow() and not forced:
+                continue
+            try:
+                return await self._attempt(route, request)
+            except Exception as e:
+                last_error = e
+        raise last_error or RuntimeError("No video route was available.")
+
+    def hedge_delay(self, route, percentile, min_samples=5):
+        """
+        Returns how long to wait for a route before hedging: the given
+        percentile of its recent latencies, or None while there is too
+        little history to tell what a slow request is.
+        """
+        stats = self.stats[route.name]
+        if len(stats.latencies) < min_samples:
+            return None
+        return stats.percentile(percentile)
+
+    def expected_latency_beyond(self, route, elapsed):
+        """
+        Estimates how long a request to `route` that is still running after
+        `elapsed` seconds would have taken in total: the mean of its recent
+        latencies that were longer than that.
+        """
+        slower = [latency for latency in self.stats[route.name].latencies if latency > elapsed]
+        return sum(slower) / len(slower) if slower else elapsed
+
+    async def call_hedged(self, request, percentile=None, min_samples=5, report=None):
+        """
+        Like `call`, but if the request is still running after `percentile`
+        of the chosen route's historical latency, a duplicate is sent to the
+        next best route whose breaker allows it (or the same route if none
+        other does; no duplicate if that is not allowed either). The first
+        successful result wins and the other request is cancelled, or its
+        result released (see `release`) if it finished at the same time.
+
+        Args:
+            request (callable): Takes a `VideoRoute` and returns an awaitable.
+            percentile (float): The latency percentile (0-100) after which to
+                                hedge. Hedging is disabled when it is falsy.
+            min_samples (int): The latency history a route needs before it is hedged.
+            report (HedgeReport): Collects the hedging statistics of the job.
+
+        Returns:
+            tuple: The result and the route that produced it.
+        """
+        routes = self.ranked()
+        delay = self.hedge_delay(routes[0], percentile, min_samples) if percentile else None
+        if delay is None:
+            return await self.call(request)
+
+        start = self.clock()
+        primary = asyncio.ensure_future(self.call(request))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        alternate = next(
+            (route for route in routes[1:] + routes[:1] if self.breakers[route.name].allow()), None
+        )
+        if alternate is None:
+            print(f"Clip still running after {delay:.1f}s, but no route is available to hedge on.")
+            return await primary
+        print(f"Clip still running after {delay:.1f}s, hedging on {alternate.name}.")
+        hedge = asyncio.ensure_future(self._attempt(alternate, request))
+        if report is not None:
+            report.hedges += 1
+
+        pending = {primary, hedge}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = []
+                for task in (primary, hedge):
+                    if task not in done:
+                        continue
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    else:
+                        succeeded.append(task)
+                if not succeeded:
+                    continue
+                winner, *losers = succeeded
+                # Both finished in the same batch: the primary wins, the hedge's clip is dropped
+                for task in losers:
+                    release(task.result()[0])
+                if winner is hedge and report is not None:
+                    elapsed = self.clock() - start
+                    report.wins += 1
+                    report.saved_seconds += max(0.0, self.expected_latency_beyond(routes[0], elapsed) - elapsed)
+                return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise error
+
+    def snapshot(self):
+        """
+        Returns the current health of every route, e.g. for the job item or logs.
+        """
+        return {
+            route.name: {
+                "state": self.breakers[route.name].state,
+                "decisions": self.decisions[route.name],
+                "requests": self.stats[route.name].requests,
+                "failures": self.stats[route.name].failures,
+                "errorRate": self.stats[route.name].error_rate,
+                "p50": self.stats[route.name].percentile(50),
+                "p95": self.stats[route.name].percentile(95),
+            }
+            for route in self.routes
+        }
+
+
+class HedgeReport:
+    """
+    Hedging statistics of one job: how many clip requests were hedged, how
+    many of them the hedge won, and the estimated tail latency that saved.
+    """
+
+    def __init__(self):
+        self.hedges = 0
+        self.wins = 0
+        self.saved_seconds = 0.0
+
+    def as_dict(self):
+        return {"hedges": self.hedges, "wins": self.wins, "savedSeconds": round(self.saved_seconds, 3)}
+
+
+def emit_metrics(dimensions, metrics, namespace="AdForge/VideoRouter"):
+    """
+    Prints metrics in CloudWatch Embedded Metric Format, which Lambda turns
+    into CloudWatch metrics straight from the logs.
+
+    Args:
+        dimensions (dict): Dimension names mapped to their values.
+        metrics (dict): Metric names mapped to a (value, unit) tuple.
+    """
+    print(json.dumps({
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [list(dimensions)],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+    }))
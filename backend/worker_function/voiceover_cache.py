@@ -0,0 +1,61 @@
+import hashlib
+import json
+from cache_entries import CacheEntries
+
+
+def voiceover_cache_key(script, voice_id, model_id, voice_settings):
+    """
+    Returns the cache key of a synthesised voiceover: everything that
+    changes the audio ElevenLabs returns.
+
+    Returns:
+        str: 'tts#' followed by a hex SHA-256 digest.
+    """
+    request = {
+        "text": script.strip(),
+        "voice_id": voice_id,
+        "model_id": model_id,
+        "voice_settings": voice_settings,
+    }
+    digest = hashlib.sha256(json.dumps(request, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+    return f"tts#{digest}"
+
+
+class VoiceoverCache(CacheEntries):
+    """
+    Caches synthesised voiceovers next to the clips in the ClipCacheTable,
+    under 'tts#' keys, so a script that was already spoken with the same
+    voice, model and settings is served from S3 without calling ElevenLabs.
+
+    Entries have the same bookkeeping as clip entries (size, last access,
+    hit count and the optional TTL, see `cache_entries.CacheEntries`), so
+    `tools/clip_cache_admin.py` evicts and garbage-collects them with the
+    clips.
+    """
+
+    def get(self, key):
+        """
+        Returns the 's3://' reference of a cached voiceover (recording the
+        hit), or None.
+        """
+        item = self.touch(key)
+        self.record("voiceoverHits" if item else "voiceoverMisses")
+        return item["s3_uri"] if item else None
+
+    def peek(self, key):
+        """
+        Tells whether a voiceover is cached, without recording a hit.
+        """
+        return self.is_live(self.table.get_item(Key={"promptHash": key}).get("Item"))
+
+    def put(self, key, s3_uri, size_bytes, script, voice_id, model_id):
+        """
+        Stores a newly synthesised voiceover.
+        """
+        self.store({
+            "promptHash": key,
+            "s3_uri": s3_uri,
+            "scriptText": script,
+            "voiceId": voice_id,
+            "modelId": model_id,
+        }, size_bytes)
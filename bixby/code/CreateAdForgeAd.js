@@ -4,14 +4,21 @@ import http from 'http';
 export default function createAdForgeAd(product, marketingContext) {
   // --- 1. Prepare the Data ---
 
-  // Map the Bixby product concepts to the SKUs your backend understands.
-  const productSKUMap = {
-    'GalaxyS24Ultra': 'PROD-S24ULTRA',
-    'NeoQLED8KTV': 'PROD-QN900D-TV',
-    'BespokeAIWasher': 'PROD-WW12T504DAB'
-  };
+  // Resolve the product name to a SKU with the backend's product resolver,
+  // so new products do not need a capsule update.
+  // IMPORTANT: Replace this with your actual AWS API Gateway URL.
+  const resolveUrl = 'https://7i5316q6o2.execute-api.ap-south-1.amazonaws.com/Prod/products/resolve';
 
-  const sku = productSKUMap[product.name.toString()]; // Use .toString() for safety.
+  const productName = product.name.toString(); // Use .toString() for safety.
+  let sku = product.sku ? product.sku.toString() : undefined;
+  if (!sku) {
+    try {
+      const resolved = http.getUrl(resolveUrl + '?limit=1&q=' + encodeURIComponent(productName), { format: 'json' });
+      sku = resolved.matches && resolved.matches.length > 0 ? resolved.matches[0].sku : undefined;
+    } catch (error) {
+      // Leave the SKU unset; the forge endpoint rejects the request with a clear message.
+    }
+  }
 
   // Create the JSON payload to send to your API.
   const requestPayload = {